@@ -7,6 +7,7 @@ Production-ready configuration with network access and i18n support
 """
 
 from flask import Flask, session
+from flask.json.provider import DefaultJSONProvider
 import os
 from datetime import timedelta
 from config import Config
@@ -15,10 +16,23 @@ import socket
 # Import i18n configuration
 from i18n_config import I18nConfig, _, format_datetime_i18n, format_date_i18n
 
-def create_app():
+class PortalJSONProvider(DefaultJSONProvider):
+    """JSON provider that also serializes database Row objects"""
+
+    @staticmethod
+    def default(o):
+        from database.connection import Row
+        if isinstance(o, Row):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
+def create_app(start_background=True):
     # ... (function remains unchanged) ...
     app = Flask(__name__)
     
+    # jsonify() and the |tojson filter both go through this provider
+    app.json = PortalJSONProvider(app)
+    
     # Configuration
     app.secret_key = Config.SECRET_KEY
     app.permanent_session_lifetime = timedelta(hours=Config.SESSION_HOURS)
@@ -44,9 +58,27 @@ def create_app():
     
     # Initialize database
     initialize_database()
-    
+
+    # Pass start_background=False in a process that will not serve requests
+    if start_background:
+        start_background_services()
+
     return app
 
+def start_background_services():
+    """Start the background refreshers and the scheduled MRP runs (each once per process)"""
+    # Keep local copies of the ERP datasets fresh (no-op unless enabled)
+    from database.erp_snapshot import erp_snapshots
+    erp_snapshots.start()
+
+    # Answer the downtime job picker from memory instead of one ERP query per line
+    from database.open_jobs_index import open_jobs_index
+    open_jobs_index.start()
+
+    # Run the MRP in the background so the MRP pages never wait on it
+    from database.mrp_results import mrp_result_cache
+    mrp_result_cache.start()
+
 # dangquyenbui-dotcom/downtime_tracker/downtime_tracker-5bb4163f1c166071f5c302dee6ed03e0344576eb/app.py
 # ... (imports and create_app function are the same) ...
 
@@ -69,6 +101,7 @@ def register_blueprints(app):
     from routes.admin.shifts import admin_shifts_bp
     from routes.admin.users import admin_users_bp
     from routes.admin.capacity import admin_capacity_bp 
+    from routes.admin.performance import admin_performance_bp
     
     # Register blueprints
     app.register_blueprint(main_bp)
@@ -90,6 +123,7 @@ def register_blueprints(app):
     app.register_blueprint(admin_shifts_bp, url_prefix='/admin')
     app.register_blueprint(admin_users_bp, url_prefix='/admin')
     app.register_blueprint(admin_capacity_bp, url_prefix='/admin')
+    app.register_blueprint(admin_performance_bp, url_prefix='/admin')
 
 # ... (rest of app.py remains the same) ...
 
@@ -101,6 +135,9 @@ def initialize_database():
     db = DatabaseConnection()
     if db.test_connection():
         print("✅ Database: Connected and ready!")
+        # Load table/column metadata once instead of on every request
+        from database.schema_cache import schema_cache
+        schema_cache.load()
     else:
         print("❌ Database: Connection failed!")
         print("   Run database initialization script")
@@ -129,6 +166,14 @@ def test_services():
     else:
         print("❌ Database: Not connected")
     
+    # Resolve the ERP ODBC driver once; every pooled connection reuses it
+    from database.erp_connection import get_erp_pool
+    erp_driver = get_erp_pool().resolve_driver()
+    if erp_driver:
+        print(f"✅ ERP Database: Connected (driver {erp_driver})")
+    else:
+        print("❌ ERP Database: Not connected")
+    
     if not Config.TEST_MODE:
         from auth.ad_auth import test_ad_connection
         if test_ad_connection():
@@ -157,7 +202,13 @@ if __name__ == '__main__':
     
     test_services()
     
-    app = create_app()
+    debug = True  # Enables detailed error messages and auto-reloading
+    
+    # With auto-reloading, this process only watches the files and runs the
+    # server in a child process (WERKZEUG_RUN_MAIN set); start the background
+    # threads there only, or every ERP refresh and MRP run would happen twice.
+    # Without the reloader this process is the server and starts them itself
+    app = create_app(start_background=not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
     
     # --- MODIFIED: Reverted to HTTP ---
     print("\n" + "="*60)
@@ -175,5 +226,5 @@ if __name__ == '__main__':
     app.run(
         host='0.0.0.0',
         port=5000,
-        debug=True # Enables detailed error messages and auto-reloading
+        debug=debug
     )
\ No newline at end of file
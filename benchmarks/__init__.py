@@ -0,0 +1,3 @@
+"""
+Performance benchmarks run against a local ERP stand-in
+"""
@@ -0,0 +1,398 @@
+"""
+Local SQLite stand-in for the ERP database
+Mirrors the ERP tables the portal reads, fills them with synthetic data scaled
+by order and part count, and runs ErpService's T-SQL against them after a small
+dialect translation, so ErpService and MRPService can be timed without the
+production ERP. Timings are comparable between runs of the stand-in, not with
+SQL Server.
+"""
+
+import math
+import os
+import random
+import re
+import sqlite3
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from database.query_stats import query_stats
+
+SCHEMA = """
+    CREATE TABLE dmware (wa_id INTEGER PRIMARY KEY, wa_name TEXT);
+    CREATE TABLE dmcats (ca_id INTEGER PRIMARY KEY, ca_name TEXT);
+    CREATE TABLE dmunit (un_id INTEGER PRIMARY KEY, un_name TEXT, un_factor REAL);
+    CREATE TABLE dmpr1 (p1_id INTEGER PRIMARY KEY, p1_name TEXT);
+    CREATE TABLE dmvend (ve_id INTEGER PRIMARY KEY, ve_name TEXT);
+    CREATE TABLE dmsman (sm_id INTEGER PRIMARY KEY, sm_lname TEXT);
+    CREATE TABLE dmsman2 (s2_recid INTEGER, s2_table TEXT, s2_smid INTEGER);
+    CREATE TABLE dmd1 (d1_id INTEGER PRIMARY KEY, d1_table TEXT, d1_field TEXT);
+    CREATE TABLE dmd3 (d3_id INTEGER PRIMARY KEY, d3_d1id INTEGER, d3_value TEXT);
+    CREATE TABLE dtd2 (d2_recid INTEGER, d2_d1id INTEGER, d2_value TEXT);
+    CREATE TABLE dmprod (
+        pr_id INTEGER PRIMARY KEY, pr_codenum TEXT, pr_descrip TEXT, pr_active INTEGER,
+        pr_caid INTEGER, pr_unid INTEGER, pr_user3 TEXT, pr_user5 INTEGER, pr_lispric REAL,
+        pr_reorder REAL, pr_minquant REAL, pr_orddays INTEGER,
+        pr_stocked INTEGER, pr_make INTEGER, pr_purable INTEGER
+    );
+    CREATE TABLE dmbom (
+        bo_bomfor INTEGER, bo_prid INTEGER, bo_reid INTEGER, bo_seq INTEGER, bo_unid INTEGER,
+        bo_quant REAL, bo_scrap REAL, bo_overage REAL, bo_overissue REAL, bo_incqty REAL,
+        bo_uselot INTEGER, bo_useexp INTEGER, bo_bomcalc TEXT, bo_costonly INTEGER,
+        bo_byproduct INTEGER, bo_subtot INTEGER, bo_reqseq INTEGER, bo_shelfdays INTEGER,
+        bo_shelfpct REAL, bo_minage INTEGER, bo_maxage INTEGER, bo_desig TEXT, bo_notes TEXT
+    );
+    CREATE TABLE dtfifo (
+        fi_id INTEGER PRIMARY KEY, fi_prid INTEGER, fi_waid INTEGER, fi_type TEXT, fi_qc TEXT,
+        fi_action TEXT, fi_quant REAL, fi_balance REAL, fi_lotnum TEXT, fi_userlot TEXT,
+        fi_date TEXT, fi_lotdate TEXT, fi_postref TEXT
+    );
+    CREATE TABLE dtqcfreq (qf_id INTEGER PRIMARY KEY, qf_date TEXT);
+    CREATE TABLE dtqcfreqassgn (qa_lotnum TEXT, qa_qfid INTEGER);
+    CREATE TABLE dttpur (tp_purnum INTEGER PRIMARY KEY, tp_ordtype TEXT, tp_recevd TEXT, tp_veid INTEGER);
+    CREATE TABLE dtpur (
+        pu_purnum INTEGER, pu_ourcode TEXT, pu_quant REAL, pu_recman REAL,
+        pu_promise TEXT, pu_wanted TEXT
+    );
+    CREATE TABLE dttord (
+        to_id INTEGER PRIMARY KEY, to_ordnum INTEGER, to_billpo TEXT, to_ordtype TEXT,
+        to_status TEXT, to_shipped TEXT, to_wanted TEXT, to_promise TEXT, to_orddate TEXT,
+        to_dueship TEXT, to_s1id INTEGER, to_biid INTEGER, to_notes TEXT, to_waid INTEGER
+    );
+    CREATE TABLE dtord (
+        or_toid INTEGER, or_ordnum INTEGER, or_prid INTEGER, or_quant REAL,
+        or_price REAL, or_shipquant REAL
+    );
+    CREATE TABLE dtjob (jo_jobnum INTEGER PRIMARY KEY, jo_type TEXT, jo_closed TEXT, jo_waid INTEGER);
+    CREATE TABLE dtljob (
+        lj_id INTEGER PRIMARY KEY, lj_jobnum INTEGER, lj_linenum INTEGER,
+        lj_ordnum INTEGER, lj_prid INTEGER, lj_quant REAL
+    );
+    CREATE TABLE dtjob4 (j4_jobnum INTEGER, j4_ljid INTEGER, j4_quant REAL);
+
+    CREATE INDEX ix_dmprod_codenum ON dmprod (pr_codenum);
+    CREATE INDEX ix_dmbom_bomfor ON dmbom (bo_bomfor, bo_reid);
+    CREATE INDEX ix_dtfifo_prid ON dtfifo (fi_prid);
+    CREATE INDEX ix_dtfifo_lotnum ON dtfifo (fi_lotnum);
+    CREATE INDEX ix_dtpur_purnum ON dtpur (pu_purnum);
+    CREATE INDEX ix_dttord_ordnum ON dttord (to_ordnum, to_id);
+    CREATE INDEX ix_dtord_toid ON dtord (or_toid, or_ordnum);
+    CREATE INDEX ix_dtord_ordnum ON dtord (or_ordnum, or_prid);
+    CREATE INDEX ix_dtljob_jobnum ON dtljob (lj_jobnum);
+    CREATE INDEX ix_dtjob4_jobnum ON dtjob4 (j4_jobnum);
+    CREATE INDEX ix_dtd2_recid ON dtd2 (d2_recid, d2_d1id);
+    CREATE INDEX ix_dmsman2_recid ON dmsman2 (s2_recid);
+"""
+
+# Custom field ids used by ErpService (dmd1.d1_id)
+LINE_FIELD = 5
+WIP_SO_FIELD = 31
+RISK_FIELDS = {101: 'u_No_Risk', 102: 'u_Low_Risk', 103: 'u_High_Risk', 104: 'u_Schedule_Note'}
+
+FACILITIES = {1: 'IRWINDALE', 2: 'DUARTE', 3: 'AREA_3'}
+LINES = ['LINE 1', 'LINE 2', 'LINE 3', 'LINE 4', 'STICK PACK 1', 'STICK PACK 2']
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+# --- T-SQL -> SQLite translation ---
+
+def _is_numeric(value):
+    if value is None:
+        return 0
+    try:
+        float(value)
+        return 1
+    except (TypeError, ValueError):
+        return 0
+
+
+def _parse_date(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(str(value)[:19], DATE_FORMAT)
+
+
+def _convert_varchar(value, style=None):
+    """CONVERT(VARCHAR, value[, style]); style 101 is mm/dd/yyyy"""
+    if value is None:
+        return None
+    if style == 101:
+        return _parse_date(value).strftime('%m/%d/%Y')
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _register_functions(connection):
+    connection.create_function('ISNUMERIC', 1, _is_numeric, deterministic=True)
+    connection.create_function('FLOOR', 1, lambda v: None if v is None else math.floor(v), deterministic=True)
+    connection.create_function('GETDATE', 0, lambda: datetime.now().strftime(DATE_FORMAT))
+    connection.create_function('MONTH', 1, lambda v: None if v is None else _parse_date(v).month, deterministic=True)
+    connection.create_function('YEAR', 1, lambda v: None if v is None else _parse_date(v).year, deterministic=True)
+    connection.create_function('CONVERT_VARCHAR', 1, _convert_varchar, deterministic=True)
+    connection.create_function('CONVERT_VARCHAR', 2, _convert_varchar, deterministic=True)
+
+
+def _closing_paren(sql, start):
+    """Index of the ')' that closes the group `start` sits in, or len(sql)"""
+    depth = 0
+    quote = None
+    for index in range(start, len(sql)):
+        char = sql[index]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"', '['):
+            quote = ']' if char == '[' else char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            if depth == 0:
+                return index
+            depth -= 1
+    return len(sql)
+
+
+def translate(sql):
+    """Rewrite the T-SQL constructs ErpService uses into SQLite"""
+    sql = re.sub(r'\bISNULL\s*\(', 'IFNULL(', sql, flags=re.IGNORECASE)
+    sql = re.sub(r'\bCONVERT\s*\(\s*VARCHAR\s*,\s*', 'CONVERT_VARCHAR(', sql, flags=re.IGNORECASE)
+
+    # SELECT TOP n ... -> SELECT ... LIMIT n, at the end of the enclosing group
+    while True:
+        match = re.search(r'\bSELECT\s+TOP\s+(\d+)\s+', sql, flags=re.IGNORECASE)
+        if not match:
+            break
+        end = _closing_paren(sql, match.end())
+        body = sql[match.end():end].rstrip()
+        if end == len(sql) and body.endswith(';'):
+            body = body[:-1]
+        sql = f"{sql[:match.start()]}SELECT {body} LIMIT {match.group(1)}{sql[end:]}"
+    return sql
+
+
+class SQLiteERPConnection:
+    """
+    Drop-in for ERPConnection backed by a stand-in SQLite file: same
+    execute_query / iter_query / last_error behaviour, and statements are
+    recorded in query_stats under the 'erp' source like the real thing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.last_error = None
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        _register_functions(connection)
+        return connection
+
+    @staticmethod
+    def _params(params):
+        return [value.strftime(DATE_FORMAT) if isinstance(value, datetime) else value
+                for value in (params or [])]
+
+    def execute_query(self, sql, params=None):
+        return list(self.iter_query(sql, params))
+
+    def iter_query(self, sql, params=None, batch_size=500):
+        self.last_error = None
+        started = time.perf_counter()
+        rows_streamed = 0
+        failed = False
+        connection = self._connect()
+        try:
+            cursor = connection.execute(translate(sql), self._params(params))
+            if not cursor.description:
+                return
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                rows_streamed += len(rows)
+                for row in rows:
+                    yield dict(zip(columns, row))
+        except sqlite3.Error as e:
+            failed = True
+            self.last_error = e
+            print(f"❌ [ERP_STANDIN] Query failed: {e}")
+            traceback.print_exc()
+        finally:
+            connection.close()
+            query_stats.record('erp', sql, params, rows_streamed,
+                               (time.perf_counter() - started) * 1000, failed)
+
+
+# --- Synthetic data ---
+
+def _date(value):
+    return value.strftime(DATE_FORMAT) if value else None
+
+
+def generate(path, orders=1000, parts=800, seed=42):
+    """
+    Create a stand-in database at `path` with about `orders` open sales orders
+    and `parts` raw material parts (plus one finished good per five parts).
+    The same arguments always produce the same data.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    insert = connection.executemany
+
+    insert("INSERT INTO dmware VALUES (?, ?)", FACILITIES.items())
+    insert("INSERT INTO dmcats VALUES (?, ?)", [(1, 'Stick Pack'), (2, 'Powder'), (3, 'Raw Material')])
+    insert("INSERT INTO dmunit VALUES (?, ?, ?)", [(1, 'EA', 1), (2, 'LB', 1), (3, 'CS', 12)])
+    insert("INSERT INTO dmpr1 VALUES (?, ?)", [(i, f"CUSTOMER {i:03d}") for i in range(1, 41)])
+    insert("INSERT INTO dmvend VALUES (?, ?)", [(i, f"VENDOR {i:03d}") for i in range(1, 31)])
+    reps = [(1, 'HOUSE ACCOUNT')] + [(i, f"REP {i:02d}") for i in range(2, 9)]
+    insert("INSERT INTO dmsman VALUES (?, ?)", reps)
+    insert("INSERT INTO dmd1 VALUES (?, ?, ?)",
+           [(LINE_FIELD, 'dtjob', 'u_Line'), (WIP_SO_FIELD, 'dtjob', 'u_WIP_SO')]
+           + [(d1_id, 'dttord', field) for d1_id, field in RISK_FIELDS.items()])
+    insert("INSERT INTO dmd3 VALUES (?, ?, ?)",
+           [(index + 1, LINE_FIELD, f" {name} " if index % 2 else name) for index, name in enumerate(LINES)])
+
+    # Products: components C00001.. and finished goods T00001..
+    products = []
+    components = []
+    for i in range(1, parts + 1):
+        pr_id = len(products) + 1
+        products.append((pr_id, f"C{i:05d}", f"Component {i}", 1, 3, rng.choice([1, 2]), '', None,
+                         round(rng.uniform(0.1, 20), 2), rng.randint(0, 500), rng.choice([1, 50, 100]),
+                         rng.randint(3, 60), 1, 0, 1))
+        components.append(pr_id)
+    finished_goods = []
+    for i in range(1, max(1, parts // 5) + 1):
+        pr_id = len(products) + 1
+        products.append((pr_id, f"T{i:05d}", f"Finished good {i}", 1, rng.choice([1, 2]), 3,
+                         str(rng.choice([6, 12, 24])), rng.randint(1, 40), round(rng.uniform(5, 80), 2),
+                         0, 1, 0, 1, 1, 0))
+        finished_goods.append(pr_id)
+    insert("INSERT INTO dmprod VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", products)
+    codes = {row[0]: row[1] for row in products}
+
+    # BOMs: 3-8 components per finished good, some with an older revision
+    boms = []
+    for fg in finished_goods:
+        revisions = [1, 2] if rng.random() < 0.2 else [1]
+        for revision in revisions:
+            for seq, comp in enumerate(rng.sample(components, min(len(components), rng.randint(3, 8))), 1):
+                boms.append((fg, comp, revision, seq, 1, round(rng.uniform(0.01, 4), 4),
+                             rng.choice([0, 0, 1, 2.5]), 0, 0, 0, 1, rng.randint(0, 1), 'Q', 0, 0, 0, 0,
+                             None, None, None, None, None, None))
+    insert(f"INSERT INTO dmbom VALUES ({', '.join('?' * 23)})", boms)
+
+    # Inventory lots: components and finished goods
+    fifo = []
+    pending_lots = []
+    for pr_id in components + finished_goods:
+        for _ in range(rng.randint(1, 4)):
+            fi_id = len(fifo) + 1
+            kind = rng.choices(['stock', 'job', 'staging', 'quarantine'], [80, 8, 8, 4])[0]
+            qc = 'Pending' if rng.random() < 0.1 else None
+            quantity = round(rng.uniform(10, 5000), 2)
+            lot_date = today - timedelta(days=rng.randint(0, 120))
+            lot = f"L{fi_id:07d}"
+            if qc:
+                pending_lots.append(lot)
+            fifo.append((fi_id, pr_id, rng.choice([1, 2]), kind, qc,
+                         'Issued inventory' if kind == 'job' else 'Received',
+                         quantity, round(quantity * rng.uniform(0.2, 1), 2), lot, f"U{fi_id}",
+                         _date(lot_date), _date(lot_date), f"REF{fi_id}"))
+    insert(f"INSERT INTO dtfifo VALUES ({', '.join('?' * 13)})", fifo)
+    insert("INSERT INTO dtqcfreq VALUES (?, ?)", [(i, _date(today)) for i in range(1, 11)])
+    insert("INSERT INTO dtqcfreqassgn VALUES (?, ?)", [(lot, rng.randint(1, 10)) for lot in pending_lots])
+
+    # Purchase orders for about 40% of components
+    po_headers = []
+    po_lines = []
+    for comp in components:
+        if rng.random() < 0.4:
+            purnum = 500000 + len(po_headers)
+            po_headers.append((purnum, 'p', None, rng.randint(1, 30)))
+            ordered = round(rng.uniform(100, 10000))
+            po_lines.append((purnum, codes[comp], ordered, round(ordered * rng.choice([0, 0, 0.5])),
+                             _date(today + timedelta(days=rng.randint(1, 60))),
+                             _date(today + timedelta(days=rng.randint(1, 60)))))
+    insert("INSERT INTO dttpur VALUES (?, ?, ?, ?)", po_headers)
+    insert("INSERT INTO dtpur VALUES (?, ?, ?, ?, ?, ?)", po_lines)
+
+    # Sales orders: one header row per revision, lines on the latest revision
+    headers = []
+    lines = []
+    fields = []
+    sales_reps = []
+    jobs = []
+    job_lines = []
+    job_production = []
+    for i in range(orders):
+        base = 100000 + i * 100
+        bill_to = rng.randint(1, 40)
+        sales_reps.append((bill_to, 'dmbill', rng.randint(1, 8)))
+        order_lines = [(fg, round(rng.uniform(100, 20000)), round(rng.uniform(1, 60), 2))
+                       for fg in rng.sample(finished_goods, min(len(finished_goods), rng.randint(1, 3)))]
+        shipped = rng.random() < 0.1
+        ordered = today - timedelta(days=rng.randint(1, 90))
+        due = today + timedelta(days=rng.randint(-10, 90))
+        for revision in range(rng.choice([1, 1, 1, 2])):
+            if rng.random() < 0.2:
+                # Earlier status row of the same order number, superseded below
+                headers.append((len(headers) + 1, base + revision, f"PO-{i}", 's', 'o', None, _date(due),
+                                _date(due), _date(ordered), _date(due), 1, bill_to, None, 1))
+            to_id = len(headers) + 1
+            headers.append((to_id, base + revision, f"PO-{i}", rng.choice(['s', 's', 's', 'h', 'm', 'l']),
+                            'c' if shipped else 'o', _date(due) if shipped else None, _date(due),
+                            _date(due), _date(ordered), _date(due), rng.randint(1, 8), bill_to,
+                            None, rng.choice([1, 2])))
+            for fg, quantity, price in order_lines:
+                lines.append((to_id, base + revision, fg, quantity + revision * 100, price,
+                              quantity if shipped else 0))
+            if rng.random() < 0.3:
+                for d1_id, value in zip(RISK_FIELDS, (rng.randint(0, 500), rng.randint(0, 500),
+                                                      rng.randint(0, 500), 'Expedite')):
+                    fields.append((to_id, d1_id, str(value)))
+        if not shipped and rng.random() < 0.3:
+            jobnum = 700000 + len(jobs)
+            jobs.append((jobnum, 'a', None, rng.choice([1, 2])))
+            fields.append((jobnum, LINE_FIELD, str(rng.randint(1, len(LINES)))))
+            for linenum, (fg, quantity, _) in enumerate(order_lines, 1):
+                lj_id = len(job_lines) + 1
+                job_lines.append((lj_id, jobnum, linenum, base, fg, quantity))
+                if rng.random() < 0.5:
+                    job_production.append((jobnum, lj_id, round(quantity * rng.uniform(0, 0.8))))
+    insert(f"INSERT INTO dttord VALUES ({', '.join('?' * 14)})", headers)
+    insert("INSERT INTO dtord VALUES (?, ?, ?, ?, ?, ?)", lines)
+    insert("INSERT INTO dtd2 VALUES (?, ?, ?)", fields)
+    insert("INSERT INTO dmsman2 VALUES (?, ?, ?)", sales_reps)
+    insert("INSERT INTO dtjob VALUES (?, ?, ?, ?)", jobs)
+    insert("INSERT INTO dtljob VALUES (?, ?, ?, ?, ?, ?)", job_lines)
+    insert("INSERT INTO dtjob4 VALUES (?, ?, ?)", job_production)
+
+    connection.commit()
+    connection.execute("ANALYZE")
+    connection.close()
+    return {
+        'sales_orders': orders, 'order_rows': len(headers), 'order_lines': len(lines),
+        'components': len(components), 'finished_goods': len(finished_goods),
+        'bom_lines': len(boms), 'lots': len(fifo), 'purchase_orders': len(po_lines), 'jobs': len(jobs)
+    }
+
+
+@contextmanager
+def use_standin(path):
+    """Point ErpService at the stand-in database for the duration of the block"""
+    from database import erp_connection
+    original = erp_connection.get_erp_db
+    erp_connection.get_erp_db = lambda: SQLiteERPConnection(path)
+    try:
+        yield
+    finally:
+        erp_connection.get_erp_db = original
@@ -0,0 +1,193 @@
+"""
+ERP / MRP benchmark runner
+Builds (or reuses) a synthetic stand-in ERP database, times every ErpService
+dataset method and a full MRP run against it, and optionally compares the
+medians with a saved baseline so slowdowns show up before deploy.
+
+Usage (from the project root):
+    python -m benchmarks.run_erp_benchmarks --orders 2000 --parts 1500
+    python -m benchmarks.run_erp_benchmarks --save baseline.json
+    python -m benchmarks.run_erp_benchmarks --baseline baseline.json --threshold 25
+
+Exits with status 1 when a benchmark is slower than the baseline by more than
+--threshold percent. The portal database is not needed; MRP line capacities
+come from --capacity instead of the ProductionCapacity table.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import statistics
+import sys
+import time
+import traceback
+from datetime import datetime
+from config import Config
+from database.erp_connection import get_erp_service
+from database.query_stats import query_stats
+from .erp_standin import generate, use_standin, FACILITIES, LINES
+
+# The package re-exports the mrp_service instance under the module's name
+mrp_module = importlib.import_module('database.mrp_service')
+
+
+class FixedCapacities:
+    """Stands in for ProductionCapacityDB with one capacity for every line"""
+
+    def __init__(self, capacity_per_shift):
+        self.capacity_per_shift = capacity_per_shift
+
+    def get_all(self):
+        return [{'line_id': index + 1, 'capacity_per_shift': self.capacity_per_shift, 'line_name': name}
+                for index, name in enumerate(LINES)]
+
+
+def benchmarks(erp, mrp):
+    """Name -> callable for every timed operation"""
+    return {
+        'erp.get_open_order_schedule': erp.get_open_order_schedule,
+        'erp.get_bom_data': erp.get_bom_data,
+        'erp.get_raw_material_inventory': erp.get_raw_material_inventory,
+        'erp.get_on_hand_inventory': erp.get_on_hand_inventory,
+        'erp.get_purchase_order_data': erp.get_purchase_order_data,
+        'erp.get_dated_purchase_order_data': erp.get_dated_purchase_order_data,
+        'erp.get_detailed_purchase_order_data': erp.get_detailed_purchase_order_data,
+        'erp.get_open_production_jobs': erp.get_open_production_jobs,
+        'erp.get_open_jobs_by_line': lambda: erp.get_open_jobs_by_line(FACILITIES[1], LINES[0]),
+        'erp.get_all_open_jobs_by_line': erp.get_all_open_jobs_by_line,
+        'erp.get_qc_pending_data': erp.get_qc_pending_data,
+        'erp.get_split_fg_on_hand_value': erp.get_split_fg_on_hand_value,
+        'erp.get_shipped_for_current_month': erp.get_shipped_for_current_month,
+        'mrp.calculate_mrp_suggestions': lambda: mrp.calculate_mrp_suggestions('python'),
+        'mrp.calculate_mrp_suggestions[numpy]': lambda: mrp.calculate_mrp_suggestions('numpy'),
+    }
+
+
+def _size(result):
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return 1 if result is not None else 0
+
+
+def run(names, repeat, warmup):
+    """Time each benchmark `repeat` times after `warmup` untimed calls"""
+    erp = get_erp_service()
+    mrp = mrp_module.mrp_service
+    available = benchmarks(erp, mrp)
+    results = {}
+    for name in names or available:
+        fetch = available[name]
+        timings = []
+        rows = 0
+        errors = 0
+        for attempt in range(warmup + repeat):
+            started = time.perf_counter()
+            try:
+                rows = _size(fetch())
+            except Exception as e:
+                errors += 1
+                print(f"❌ {name} failed: {e}")
+                traceback.print_exc()
+                continue
+            if attempt >= warmup:
+                timings.append((time.perf_counter() - started) * 1000)
+        results[name] = {
+            'median_ms': statistics.median(timings) if timings else None,
+            'min_ms': min(timings) if timings else None,
+            'max_ms': max(timings) if timings else None,
+            'rows': rows,
+            'errors': errors
+        }
+        median = results[name]['median_ms']
+        print(f"  {name:<42} {median:>10.1f} ms  ({rows} rows)" if median is not None
+              else f"  {name:<42} {'failed':>10}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the change against a baseline; returns the names that regressed"""
+    regressions = []
+    print(f"\nCompared with baseline ({baseline.get('created_at', 'unknown date')}):")
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name, {}).get('median_ms')
+        after = result['median_ms']
+        if before is None or after is None:
+            print(f"  {name:<42} {'n/a':>10}")
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  <-- REGRESSION'
+            regressions.append(name)
+        print(f"  {name:<42} {before:>9.1f} -> {after:>9.1f} ms  {change:+6.1f}%{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark ErpService and MRPService against a local ERP stand-in')
+    parser.add_argument('--orders', type=int, default=1000, help='Open sales orders to generate')
+    parser.add_argument('--parts', type=int, default=800, help='Raw material parts to generate')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', default=os.path.join('data', 'erp_standin.db'), help='Stand-in database file')
+    parser.add_argument('--reuse', action='store_true', help='Reuse an existing stand-in database')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--capacity', type=int, default=5000, help='Capacity per shift for every line')
+    parser.add_argument('--only', action='append', help='Run only this benchmark (repeatable)')
+    parser.add_argument('--save', help='Write results to this JSON file')
+    parser.add_argument('--baseline', help='Compare with results saved by an earlier --save')
+    parser.add_argument('--threshold', type=float, default=20.0, help='Regression threshold in percent')
+    args = parser.parse_args(argv)
+
+    directory = os.path.dirname(args.db)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if args.reuse and os.path.exists(args.db):
+        print(f"Using existing stand-in database {args.db}")
+        dataset = None
+    else:
+        started = time.perf_counter()
+        dataset = generate(args.db, orders=args.orders, parts=args.parts, seed=args.seed)
+        print(f"Generated {args.db} in {time.perf_counter() - started:.1f}s: "
+              + ', '.join(f"{key}={value}" for key, value in dataset.items()))
+
+    # Time the queries themselves: no result cache, no delta sync, no snapshots
+    Config.ERP_CACHE_TTLS = {name: 0 for name in Config.ERP_CACHE_TTLS}
+    Config.ERP_DELTA_SYNC_ENABLED = False
+    Config.ERP_SNAPSHOT_ENABLED = False
+    mrp_module.capacity_db = FixedCapacities(args.capacity)
+    query_stats.reset()
+
+    print(f"\nRunning benchmarks ({args.warmup} warm-up, {args.repeat} timed runs each):")
+    with use_standin(args.db):
+        results = run(args.only, args.repeat, args.warmup)
+
+    print("\nSlowest statements:")
+    for statement in query_stats.top(5):
+        print(f"  {statement['avg_ms']:>9.1f} ms avg  x{statement['count']:<4} {statement['fingerprint'][:90]}")
+
+    if args.save:
+        with open(args.save, 'w') as handle:
+            json.dump({
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'arguments': {'orders': args.orders, 'parts': args.parts, 'seed': args.seed},
+                'dataset': dataset,
+                'results': results
+            }, handle, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    failed = [name for name, result in results.items() if result['median_ms'] is None]
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as handle:
+            regressions = compare(results, json.load(handle), args.threshold)
+
+    if failed or regressions:
+        print(f"\n❌ {len(failed)} failed, {len(regressions)} slower than the baseline by more than {args.threshold:.0f}%")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -43,6 +43,18 @@ class Config:
     DB_USE_WINDOWS_AUTH = os.getenv('DB_USE_WINDOWS_AUTH', 'False').lower() == 'true'
     DB_USERNAME = os.getenv('DB_USERNAME')
     DB_PASSWORD = os.getenv('DB_PASSWORD')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '20'))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '15'))
+    # Pooled connections idle longer than this are probed before reuse
+    DB_VALIDATE_IDLE_SECONDS = int(os.getenv('DB_VALIDATE_IDLE_SECONDS', '30'))
+    
+    # --- Query instrumentation ---
+    # Statements slower than this are written to the slow-query log
+    SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', '500'))
+    SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'logs/slow_queries.log')
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+    SLOW_QUERY_LOG_BACKUPS = int(os.getenv('SLOW_QUERY_LOG_BACKUPS', '5'))
+    QUERY_STATS_MAX_ENTRIES = int(os.getenv('QUERY_STATS_MAX_ENTRIES', '500'))
     
     # --- ERP Database (Deacom) ---
     ERP_DB_SERVER = os.getenv('ERP_DB_SERVER')
@@ -52,6 +64,91 @@ class Config:
     ERP_DB_PORT = os.getenv('ERP_DB_PORT', '1433')
     ERP_DB_DRIVER = os.getenv('ERP_DB_DRIVER', 'ODBC Driver 17 for SQL Server')
     ERP_DB_TIMEOUT = int(os.getenv('ERP_DB_TIMEOUT', '30'))
+    ERP_DB_POOL_SIZE = int(os.getenv('ERP_DB_POOL_SIZE', '8'))
+    ERP_DB_POOL_TIMEOUT = int(os.getenv('ERP_DB_POOL_TIMEOUT', '30'))
+    ERP_DB_VALIDATE_IDLE_SECONDS = int(os.getenv('ERP_DB_VALIDATE_IDLE_SECONDS', '30'))
+    # Pooled ERP connections are recycled after this many seconds
+    ERP_DB_MAX_LIFETIME = int(os.getenv('ERP_DB_MAX_LIFETIME', '1800'))
+    # Seconds before the driver cancels a running ERP statement (0 = no limit)
+    ERP_QUERY_TIMEOUT = int(os.getenv('ERP_QUERY_TIMEOUT', '120'))
+    # Circuit breaker: after this many consecutive ERP failures (0 disables),
+    # ERP queries fail immediately for ERP_BREAKER_RESET_SECONDS, then one trial runs
+    ERP_BREAKER_FAILURES = int(os.getenv('ERP_BREAKER_FAILURES', '5'))
+    ERP_BREAKER_RESET_SECONDS = int(os.getenv('ERP_BREAKER_RESET_SECONDS', '30'))
+    # Optional session isolation level for ERP reads, e.g. 'SNAPSHOT' if enabled on the ERP database
+    ERP_DB_ISOLATION_LEVEL = os.getenv('ERP_DB_ISOLATION_LEVEL', '')
+    
+    # ERP result cache: seconds each dataset is served from memory (0 disables)
+    ERP_CACHE_TTLS = {
+        'get_open_order_schedule': int(os.getenv('ERP_CACHE_TTL_OPEN_ORDERS', '300')),
+        'get_bom_data': int(os.getenv('ERP_CACHE_TTL_BOM', '900')),
+        'get_raw_material_inventory': int(os.getenv('ERP_CACHE_TTL_RAW_MATERIALS', '300')),
+        'get_on_hand_inventory': int(os.getenv('ERP_CACHE_TTL_ON_HAND', '300')),
+        'get_purchase_order_data': int(os.getenv('ERP_CACHE_TTL_PURCHASE_ORDERS', '300')),
+        'get_dated_purchase_order_data': int(os.getenv('ERP_CACHE_TTL_PURCHASE_ORDERS', '300')),
+    }
+    # How long past its TTL a result may still be served while it refreshes in the background
+    ERP_CACHE_STALE_SECONDS = int(os.getenv('ERP_CACHE_STALE_SECONDS', '600'))
+    
+    # Delta sync: open orders and raw material inventory are kept as local
+    # aggregates and only the orders/parts changed since the last pull are re-queried
+    ERP_DELTA_SYNC_ENABLED = os.getenv('ERP_DELTA_SYNC_ENABLED', 'False').lower() == 'true'
+    # Seconds between full reloads, which also pick up changes the delta misses
+    # (production entries, risk fields)
+    ERP_DELTA_FULL_INTERVAL = int(os.getenv('ERP_DELTA_FULL_INTERVAL', '1800'))
+    
+    # Open jobs index behind the downtime job picker: rebuilt every INTERVAL
+    # seconds (0 disables the background refresh), reloaded in the background by
+    # a lookup when older than MAX_AGE, and a client-forced refresh runs at most
+    # every MIN_REFRESH
+    OPEN_JOBS_INDEX_INTERVAL = int(os.getenv('OPEN_JOBS_INDEX_INTERVAL', '120'))
+    OPEN_JOBS_INDEX_MAX_AGE = int(os.getenv('OPEN_JOBS_INDEX_MAX_AGE', '600'))
+    OPEN_JOBS_MIN_REFRESH = int(os.getenv('OPEN_JOBS_MIN_REFRESH', '15'))
+    
+    # MRP input queries run concurrently on this many worker threads; one per
+    # input source (8 with MRP_TIME_PHASED) so no fetch queues behind another
+    MRP_FETCH_WORKERS = int(os.getenv('MRP_FETCH_WORKERS', '8'))
+    # Seconds to wait for the MRP inputs before continuing without a slow source
+    MRP_FETCH_TIMEOUT = int(os.getenv('MRP_FETCH_TIMEOUT', '120'))
+    # Explode sub-assemblies that have their own BOM down to purchased parts.
+    # Sub-assembly stock on hand is NOT netted first, so only enable this where
+    # sub-assemblies are built to order; False keeps the single-level explosion
+    # (sub-assemblies allocated from their own stock like purchased parts)
+    MRP_MULTI_LEVEL_BOM = os.getenv('MRP_MULTI_LEVEL_BOM', 'False').lower() == 'true'
+    # Allocation engine: 'python' (reference), 'numpy' (vectorized, needs numpy)
+    # or 'compare' (runs both, logs any difference, returns the python results)
+    MRP_ENGINE = os.getenv('MRP_ENGINE', 'python')
+    # With the python engine, rerun only the orders whose row, BOM, stock or POs
+    # changed since the last run - and the later orders sharing that stock
+    MRP_INCREMENTAL = os.getenv('MRP_INCREMENTAL', 'True').lower() == 'true'
+    # Net each order's component need against stock and the POs promised by its
+    # ship date, in 'day' or 'week' buckets
+    MRP_TIME_PHASED = os.getenv('MRP_TIME_PHASED', 'True').lower() == 'true'
+    MRP_TIME_BUCKET = os.getenv('MRP_TIME_BUCKET', 'day')
+    # The MRP pages share the last run until its inputs change; the inputs are
+    # re-fetched and compared at most every CHECK_SECONDS
+    MRP_RESULT_CHECK_SECONDS = int(os.getenv('MRP_RESULT_CHECK_SECONDS', '30'))
+    # Past runs kept in the MRP run table and listed on the admin performance page
+    MRP_RESULT_HISTORY = int(os.getenv('MRP_RESULT_HISTORY', '20'))
+    # Background MRP runner: checks the inputs every RUN_INTERVAL seconds and
+    # recomputes when they changed (0 disables the schedule). Each check fetches
+    # every MRP input from the ERP (or the snapshots, when enabled) whether or
+    # not anyone has the MRP pages open, so the default is hourly; the pages
+    # still re-check on view every RESULT_CHECK_SECONDS. Runs are recorded in a
+    # local SQLite file; the newest RUN_KEEP runs keep their results.
+    MRP_RUN_INTERVAL = int(os.getenv('MRP_RUN_INTERVAL', '3600'))
+    MRP_RUN_STORE_PATH = os.getenv('MRP_RUN_STORE_PATH', 'data/mrp_runs.db')
+    MRP_RUN_KEEP = int(os.getenv('MRP_RUN_KEEP', '2'))
+    
+    # Local ERP snapshot store: ERP datasets are copied into a SQLite file on a
+    # schedule and MRP, scheduling, BOM and PO pages read from the latest copy
+    ERP_SNAPSHOT_ENABLED = os.getenv('ERP_SNAPSHOT_ENABLED', 'False').lower() == 'true'
+    ERP_SNAPSHOT_PATH = os.getenv('ERP_SNAPSHOT_PATH', 'data/erp_snapshots.db')
+    ERP_SNAPSHOT_INTERVAL = int(os.getenv('ERP_SNAPSHOT_INTERVAL', '300'))
+    # Snapshots older than this are ignored and the ERP is queried directly
+    ERP_SNAPSHOT_MAX_AGE = int(os.getenv('ERP_SNAPSHOT_MAX_AGE', '3600'))
+    # Versions kept per dataset
+    ERP_SNAPSHOT_KEEP = int(os.getenv('ERP_SNAPSHOT_KEEP', '3'))
 
     # Email settings (Optional)
     SMTP_SERVER = os.getenv('SMTP_SERVER', 'mail.wepackitall.local')
@@ -65,30 +65,34 @@ class AuditDB:
         if not self.audit_enabled:
             return True
         
+        # Ensure table exists
+        self.ensure_table()
+        
         with self.db.get_connection() as conn:
-            # Ensure table exists
-            self.ensure_table()
-            
             try:
                 if changes:
-                    # Log each field change separately
+                    # One row per field change, sent to the server as a single batch
+                    rows = []
                     for field_name, values in changes.items():
                         old_value = str(values.get('old', '')) if values.get('old') is not None else None
                         new_value = str(values.get('new', '')) if values.get('new') is not None else None
-                        
-                        query = """
-                            INSERT INTO AuditLog (
-                                table_name, record_id, action_type, field_name,
-                                old_value, new_value, changed_by, changed_date,
-                                user_ip, user_agent, additional_notes
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, GETDATE(), ?, ?, ?)
-                        """
-                        
-                        conn.execute_query(query, (
+                        rows.append((
                             table_name, record_id, action_type, field_name,
                             old_value, new_value, username or 'system',
                             ip, user_agent, notes
                         ))
+                    
+                    query = """
+                        INSERT INTO AuditLog (
+                            table_name, record_id, action_type, field_name,
+                            old_value, new_value, changed_by, changed_date,
+                            user_ip, user_agent, additional_notes
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, GETDATE(), ?, ?, ?)
+                    """
+                    
+                    # Not inside a transaction, so a driver that rejects the batch
+                    # (NVARCHAR(MAX) columns) gets the row-by-row fallback
+                    logged = conn.execute_many(query, rows)
                 else:
                     # For actions without field changes
                     query = """
@@ -98,17 +102,57 @@ class AuditDB:
                         ) VALUES (?, ?, ?, ?, GETDATE(), ?, ?, ?)
                     """
                     
-                    conn.execute_query(query, (
+                    logged = conn.execute_query(query, (
                         table_name, record_id, action_type, 
                         username or 'system', ip, user_agent, notes
                     ))
                 
-                print(f"✅ Audit logged: {action_type} on {table_name} ID {record_id} by {username}")
-                return True
-                
             except Exception as e:
                 print(f"❌ Audit logging failed: {str(e)}")
                 return False
+        
+        if not logged:
+            print(f"❌ Audit logging failed: {action_type} on {table_name} ID {record_id}")
+            return False
+        
+        print(f"✅ Audit logged: {action_type} on {table_name} ID {record_id} by {username}")
+        return True
+    
+    def _history_query(self, table_name=None, record_id=None, username=None, days=30):
+        """Build the filtered audit history query and its parameters"""
+        query = """
+            SELECT 
+                audit_id,
+                table_name,
+                record_id,
+                action_type,
+                field_name,
+                old_value,
+                new_value,
+                changed_by,
+                changed_date,
+                user_ip,
+                additional_notes
+            FROM AuditLog
+            WHERE changed_date >= DATEADD(day, ?, GETDATE())
+        """
+        
+        params = [-days]
+        
+        if table_name:
+            query += " AND table_name = ?"
+            params.append(table_name)
+        
+        if record_id:
+            query += " AND record_id = ?"
+            params.append(record_id)
+        
+        if username:
+            query += " AND changed_by = ?"
+            params.append(username)
+        
+        query += " ORDER BY changed_date DESC"
+        return query, params
     
     def get_history(self, table_name=None, record_id=None, username=None, days=30):
         """
@@ -129,41 +173,20 @@ class AuditDB:
                 self.ensure_table()
                 return []
             
-            query = """
-                SELECT 
-                    audit_id,
-                    table_name,
-                    record_id,
-                    action_type,
-                    field_name,
-                    old_value,
-                    new_value,
-                    changed_by,
-                    changed_date,
-                    user_ip,
-                    additional_notes
-                FROM AuditLog
-                WHERE changed_date >= DATEADD(day, ?, GETDATE())
-            """
-            
-            params = [-days]
-            
-            if table_name:
-                query += " AND table_name = ?"
-                params.append(table_name)
-            
-            if record_id:
-                query += " AND record_id = ?"
-                params.append(record_id)
-            
-            if username:
-                query += " AND changed_by = ?"
-                params.append(username)
-            
-            query += " ORDER BY changed_date DESC"
-            
+            query, params = self._history_query(table_name, record_id, username, days)
             return conn.execute_query(query, params)
     
+    def iter_history(self, table_name=None, record_id=None, username=None, days=30):
+        """
+        Stream audit history with the same filters as get_history,
+        fetching rows in batches instead of loading the whole result
+        """
+        if not self.db.check_table_exists('AuditLog'):
+            return
+        
+        query, params = self._history_query(table_name, record_id, username, days)
+        yield from self.db.iter_query(query, params)
+    
     def get_record_history(self, table_name, record_id):
         """Get complete history for a specific record"""
         with self.db.get_connection() as conn:
@@ -0,0 +1,195 @@
+"""
+Multi-level BOM explosion
+Builds a parent -> component graph from get_bom_data rows and flattens each
+parent into per-unit requirements of its purchased (leaf) components, walking
+through sub-assemblies that have their own BOM. Scrap % compounds level by
+level. Sub-assembly stock is not netted: the whole requirement is exploded,
+which suits sub-assemblies built to order (hence MRP_MULTI_LEVEL_BOM is off by
+default). Flattened results are memoized per parent and, when the BOM data is
+reloaded, only parents whose BOM changed - and the parents above them - are
+recalculated.
+"""
+
+import threading
+import time
+from datetime import datetime
+from config import Config
+
+
+def _qty_per_unit(row):
+    """Component quantity per parent unit including its scrap allowance"""
+    return (row.get('Quantity') or 0) * (1 + ((row.get('Scrap %') or 0) / 100))
+
+
+class BomExplosion:
+    """Thread-safe memoized BOM flattener over the latest BOM revisions"""
+
+    def __init__(self, multi_level=None):
+        self.multi_level = Config.MRP_MULTI_LEVEL_BOM if multi_level is None else multi_level
+        self._lock = threading.RLock()
+        self._children = {}  # parent -> [(component, qty_per_unit)] in BOM sequence
+        self._signatures = {}  # parent -> tuple used to spot BOM revisions
+        self._descriptions = {}  # part -> description
+        self._cut = set()  # (parent, component) edges dropped to break cycles
+        self._flat = {}  # parent -> tuple of (part, qty_per_unit, description)
+        self.stats = {'loads': 0, 'invalidated': 0, 'hits': 0, 'misses': 0,
+                      'cycles': [], 'loaded_at': None, 'load_ms': None}
+
+    def load(self, boms):
+        """
+        Take a fresh set of BOM rows. Memoized explosions survive unless the
+        parent's own BOM, or a BOM anywhere below it, changed.
+        """
+        started = time.perf_counter()
+        rows_by_parent = {}
+        descriptions = {}
+        for row in boms:
+            parent = (row.get('Parent Part Number') or '').strip()
+            part = (row.get('Part Number') or '').strip()
+            if not parent or not part:
+                continue
+            rows_by_parent.setdefault(parent, []).append(row)
+            descriptions[part] = row.get('Description')
+            descriptions.setdefault(parent, row.get('Parent Description'))
+
+        children = {}
+        signatures = {}
+        for parent, rows in rows_by_parent.items():
+            children[parent] = [
+                (row['Part Number'].strip(), _qty_per_unit(row)) for row in rows
+            ]
+            signatures[parent] = tuple(
+                (row.get('Revision ID'), part, qty) for (part, qty), row in zip(children[parent], rows)
+            )
+        cut, cycles = self._find_cycles(children)
+
+        with self._lock:
+            new_cycles = [cycle for cycle in cycles if cycle not in self.stats['cycles']]
+            changed = {
+                parent for parent in set(signatures) | set(self._signatures)
+                if signatures.get(parent) != self._signatures.get(parent)
+            }
+            changed.update(parent for parent, _ in cut ^ self._cut)
+            if changed and self._flat:
+                # Parents that use a changed BOM, through the old or the new graph
+                stale = self._ancestors(changed, self._children) | self._ancestors(changed, children)
+                for parent in stale:
+                    if self._flat.pop(parent, None) is not None:
+                        self.stats['invalidated'] += 1
+            self._children = children
+            self._signatures = signatures
+            self._descriptions = descriptions
+            self._cut = cut
+            self.stats['loads'] += 1
+            self.stats['cycles'] = cycles
+            self.stats['loaded_at'] = datetime.now()
+            self.stats['load_ms'] = (time.perf_counter() - started) * 1000
+
+        for cycle in new_cycles:
+            print(f"⚠️  [BOM] Cycle in BOM data, treating {cycle[-1]} as purchased under {cycle[-2]}: "
+                  f"{' -> '.join(cycle)}")
+
+    @staticmethod
+    def _find_cycles(children):
+        """
+        Depth-first search over the BOM graph in part-number order. Returns the
+        back edges that close a cycle (dropped from the explosion) and each
+        cycle as a list of part numbers.
+        """
+        visiting, done = set(), set()
+        cut, cycles = set(), []
+        for root in sorted(children):
+            if root in done:
+                continue
+            path = [root]
+            stack = [iter(children[root])]
+            visiting.add(root)
+            while stack:
+                step = next(stack[-1], None)
+                if step is None:
+                    stack.pop()
+                    node = path.pop()
+                    visiting.discard(node)
+                    done.add(node)
+                    continue
+                part = step[0]
+                if part in visiting:
+                    cut.add((path[-1], part))
+                    cycles.append(path[path.index(part):] + [part])
+                elif part not in done and part in children:
+                    visiting.add(part)
+                    path.append(part)
+                    stack.append(iter(children[part]))
+        return cut, cycles
+
+    @staticmethod
+    def _ancestors(parts, children):
+        """`parts` plus every parent that reaches one of them in `children`"""
+        used_by = {}
+        for parent, components in children.items():
+            for part, _ in components:
+                used_by.setdefault(part, set()).add(parent)
+        found = set(parts)
+        pending = list(parts)
+        while pending:
+            for parent in used_by.get(pending.pop(), ()):
+                if parent not in found:
+                    found.add(parent)
+                    pending.append(parent)
+        return found
+
+    def has_bom(self, part_number):
+        """True when the part has BOM rows, even if none has a positive quantity"""
+        with self._lock:
+            return part_number in self._children
+
+    def requirements(self, part_number):
+        """
+        Per-unit requirements for one parent as a tuple of
+        (part, qty_per_unit, description), in BOM sequence order of first use.
+        Empty when the part has no BOM, and also when every row has a zero
+        quantity - use has_bom to tell the two apart. With multi_level off only
+        the direct components are returned, as before.
+        """
+        with self._lock:
+            if part_number not in self._children:
+                return ()
+            if not self.multi_level:
+                return tuple(
+                    (part, qty, self._descriptions.get(part))
+                    for part, qty in self._children[part_number] if qty > 0
+                )
+            cached = self._flat.get(part_number)
+            if cached is not None:
+                self.stats['hits'] += 1
+                return cached
+            self.stats['misses'] += 1
+            return self._flatten(part_number)
+
+    def _flatten(self, parent):
+        """Explode `parent`, memoizing it and every sub-assembly on the way (lock held)"""
+        cached = self._flat.get(parent)
+        if cached is not None:
+            return cached
+        totals = {}
+        for part, qty in self._children[parent]:
+            if qty <= 0:
+                continue
+            if part in self._children and (parent, part) not in self._cut:
+                for leaf, leaf_qty, _ in self._flatten(part):
+                    totals[leaf] = totals.get(leaf, 0) + qty * leaf_qty
+            else:
+                totals[part] = totals.get(part, 0) + qty
+        flat = tuple((part, qty, self._descriptions.get(part)) for part, qty in totals.items())
+        self._flat[parent] = flat
+        return flat
+
+    def status(self):
+        """Graph size and memo counters for the admin panel"""
+        with self._lock:
+            return dict(self.stats, parents=len(self._children), memoized=len(self._flat),
+                        multi_level=self.multi_level)
+
+
+# Shared by every MRP run so explosions carry over between runs
+bom_explosion = BomExplosion()
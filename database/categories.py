@@ -5,6 +5,7 @@ FIXED: Better error handling for deactivation
 """
 
 from .connection import get_db
+from .schema_cache import schema_cache
 from datetime import datetime
 
 class CategoriesDB:
@@ -21,13 +22,7 @@ class CategoriesDB:
                 return []
             
             # Check which columns exist
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'DowntimeCategories'
-            """
-            columns_result = conn.execute_query(columns_query)
-            existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+            existing_columns = schema_cache.columns('DowntimeCategories')
             
             # Build query based on available columns
             base_fields = ['category_id', 'category_name', 'description', 'is_active']
@@ -73,12 +68,7 @@ class CategoriesDB:
         """Get categories organized hierarchically (main categories with their subcategories)"""
         with self.db.get_connection() as conn:
             # Check if parent_id column exists
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'DowntimeCategories' AND COLUMN_NAME = 'parent_id'
-            """
-            has_hierarchy = len(conn.execute_query(columns_query)) > 0
+            has_hierarchy = schema_cache.has_column('DowntimeCategories', 'parent_id')
             
             if not has_hierarchy:
                 # Return flat list if no hierarchy support
@@ -146,13 +136,7 @@ class CategoriesDB:
                 return False, "Category code already exists", None
             
             # Check which columns exist
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'DowntimeCategories'
-            """
-            columns_result = conn.execute_query(columns_query)
-            existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+            existing_columns = schema_cache.columns('DowntimeCategories')
             
             # Build INSERT query based on available columns
             fields = ['category_name', 'description', 'is_active']
@@ -222,13 +206,7 @@ class CategoriesDB:
                 changes['description'] = {'old': old_desc, 'new': new_desc}
             
             # Check which columns exist
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'DowntimeCategories'
-            """
-            columns_result = conn.execute_query(columns_query)
-            existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+            existing_columns = schema_cache.columns('DowntimeCategories')
             
             # Handle optional columns
             if 'color_code' in existing_columns:
@@ -296,13 +274,7 @@ class CategoriesDB:
                     return False, "Category is already deactivated"
                 
                 # Check if category has subcategories (if hierarchy is supported)
-                columns_query = """
-                    SELECT COLUMN_NAME 
-                    FROM INFORMATION_SCHEMA.COLUMNS 
-                    WHERE TABLE_NAME = 'DowntimeCategories' AND COLUMN_NAME = 'parent_id'
-                """
-                columns_result = conn.execute_query(columns_query)
-                has_hierarchy = columns_result and len(columns_result) > 0
+                has_hierarchy = schema_cache.has_column('DowntimeCategories', 'parent_id')
                 
                 if has_hierarchy:
                     subcategories_query = """
@@ -328,12 +300,7 @@ class CategoriesDB:
                     has_downtimes = False
                 
                 # Check which columns exist for update
-                columns_result = conn.execute_query("""
-                    SELECT COLUMN_NAME 
-                    FROM INFORMATION_SCHEMA.COLUMNS 
-                    WHERE TABLE_NAME = 'DowntimeCategories'
-                """)
-                existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+                existing_columns = schema_cache.columns('DowntimeCategories')
                 
                 # Deactivate
                 if 'modified_by' in existing_columns:
@@ -396,12 +363,7 @@ class CategoriesDB:
                         return False, "Cannot reactivate subcategory when parent category is inactive"
                 
                 # Check which columns exist for update
-                columns_result = conn.execute_query("""
-                    SELECT COLUMN_NAME 
-                    FROM INFORMATION_SCHEMA.COLUMNS 
-                    WHERE TABLE_NAME = 'DowntimeCategories'
-                """)
-                existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+                existing_columns = schema_cache.columns('DowntimeCategories')
                 
                 # Reactivate
                 if 'modified_by' in existing_columns:
@@ -0,0 +1,103 @@
+"""
+Circuit breaker for the ERP connection
+After repeated ERP failures, further ERP queries fail immediately instead of
+each tying up a web thread until the driver times out. After a cool-down one
+trial query is let through (half-open); its outcome closes or re-opens the
+circuit.
+"""
+
+import threading
+import time
+from datetime import datetime
+from config import Config
+
+
+class CircuitOpenError(Exception):
+    """Raised in place of a query while the circuit is open"""
+
+
+class CircuitBreaker:
+    """Thread-safe closed / open / half-open breaker with counters for the admin panel"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, name, failure_threshold=None, reset_seconds=None):
+        self.name = name
+        self.failure_threshold = Config.ERP_BREAKER_FAILURES if failure_threshold is None else failure_threshold
+        self.reset_seconds = Config.ERP_BREAKER_RESET_SECONDS if reset_seconds is None else reset_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._opened = 0.0
+        self._trial_running = False
+        self._failures = 0  # Consecutive failures
+        self.stats = {'opened': 0, 'rejected': 0, 'failures': 0, 'trials': 0,
+                      'last_error': None, 'last_failure_at': None, 'state_since': datetime.now()}
+
+    def _set_state(self, state):
+        if self._state != state:
+            print(f"ℹ️  [BREAKER] {self.name}: {self._state} -> {state}")
+            self._state = state
+            self.stats['state_since'] = datetime.now()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow(self):
+        """True if a call may go ahead; counts and refuses it otherwise"""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened >= self.reset_seconds:
+                self._set_state(self.HALF_OPEN)
+            if self._state == self.HALF_OPEN and not self._trial_running:
+                # Let exactly one trial call through
+                self._trial_running = True
+                self.stats['trials'] += 1
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self, error):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            self.stats['failures'] += 1
+            self.stats['last_error'] = str(error)
+            self.stats['last_failure_at'] = datetime.now()
+            if self._state == self.HALF_OPEN or (
+                    self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._opened = time.monotonic()
+                self.stats['opened'] += 1
+                self._set_state(self.OPEN)
+
+    def reset(self):
+        """Close the circuit by hand"""
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            self._set_state(self.CLOSED)
+
+    def status(self):
+        with self._lock:
+            retry_in = None
+            if self._state == self.OPEN:
+                retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self._opened))
+            return dict(self.stats, state=self._state, consecutive_failures=self._failures,
+                        failure_threshold=self.failure_threshold, reset_seconds=self.reset_seconds,
+                        retry_in=retry_in)
+
+
+# Guards every ERP query in the process
+erp_breaker = CircuitBreaker('ERP')
@@ -5,18 +5,255 @@ FIXED: Better connection persistence and case-insensitive column names
 """
 
 import pyodbc
+import threading
+import time
+from collections import deque
 from config import Config
 from contextlib import contextmanager
+from .query_stats import query_stats
+
+# SQLSTATE codes pyodbc reports when the server side of a connection is gone
+DISCONNECT_SQLSTATES = {'08S01', '08S02', '08001', '08003', '08004', '08007'}
+
+
+def is_disconnect_error(error):
+    """Return True if a pyodbc error means the connection itself was lost"""
+    return bool(getattr(error, 'args', None)) and error.args[0] in DISCONNECT_SQLSTATES
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of pyodbc connections.
+    Connections are checked out for the duration of a request block and
+    returned afterwards, so worker threads never share a connection or cursor.
+    Idle connections are only probed with "SELECT 1" once they have sat unused
+    longer than `validate_after` seconds; anything fresher is trusted and a
+    dropped connection is instead caught by the caller's disconnect retry.
+    With `max_lifetime` set, connections older than that many seconds are
+    closed instead of being reused.
+    """
+
+    def __init__(self, connection_string, max_size=20, timeout=15, validate_after=30,
+                 max_lifetime=None):
+        self._connection_string = connection_string
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.validate_after = validate_after
+        self.max_lifetime = max_lifetime
+        self._idle = deque()  # (connection, time returned to the pool)
+        self._opened_at = {}  # connection -> time it was opened
+        self._size = 0  # Open connections, idle + checked out
+        self._cond = threading.Condition()
+        self._stats = {
+            'created': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'discarded': 0,
+            'expired': 0,
+            'probes': 0,
+            'probes_skipped': 0,
+            'reconnects': 0
+        }
+
+    def _create_connection(self):
+        """Open a new pyodbc connection, falling back to ODBC Driver 17"""
+        try:
+            return pyodbc.connect(self._connection_string)
+        except pyodbc.Error as e:
+            # Try with ODBC Driver 17 if SQL Server driver fails
+            if "SQL Server" in str(e) and "ODBC Driver 17" not in self._connection_string:
+                alt_connection_string = self._connection_string.replace(
+                    "SQL Server", "ODBC Driver 17 for SQL Server"
+                )
+                connection = pyodbc.connect(alt_connection_string)
+                # Update the connection string for future use
+                self._connection_string = alt_connection_string
+                return connection
+            raise
+
+    def _is_alive(self, connection):
+        """Check that an idle connection is still usable"""
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _close(self, connection):
+        with self._cond:
+            self._opened_at.pop(connection, None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _expired(self, connection):
+        """True if the connection has outlived `max_lifetime`"""
+        if not self.max_lifetime:
+            return False
+        with self._cond:
+            opened_at = self._opened_at.get(connection)
+        return opened_at is not None and time.monotonic() - opened_at > self.max_lifetime
+
+    def acquire(self):
+        """
+        Check out a connection, waiting up to `timeout` seconds when the pool
+        is exhausted. Raises TimeoutError if no connection frees up in time.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection = None
+            with self._cond:
+                while True:
+                    if self._idle:
+                        connection, released_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise TimeoutError(
+                            f"No database connection available within {self.timeout}s "
+                            f"(pool size {self.max_size})"
+                        )
+                    self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+
+            if connection is not None:
+                if self._expired(connection):
+                    self._discard(connection, expired=True)
+                    continue
+                # Reused idle connection - only probe it if it sat idle long
+                # enough for the server or a firewall to have dropped it
+                if time.monotonic() - released_at < self.validate_after:
+                    with self._cond:
+                        self._stats['checkouts'] += 1
+                        self._stats['probes_skipped'] += 1
+                    return connection
+                alive = self._is_alive(connection)
+                with self._cond:
+                    self._stats['probes'] += 1
+                    if alive:
+                        self._stats['checkouts'] += 1
+                if alive:
+                    return connection
+                self._discard(connection)
+                continue
+
+            # A slot was reserved above; open the connection outside the lock
+            try:
+                connection = self._create_connection()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._opened_at[connection] = time.monotonic()
+                self._stats['created'] += 1
+                self._stats['checkouts'] += 1
+            return connection
+
+    def release(self, connection, discard=False):
+        """Return a connection to the pool, or close it if it is broken"""
+        if discard or self._expired(connection):
+            self._discard(connection, expired=not discard)
+            return
+        try:
+            # Never hand an open transaction to the next borrower
+            connection.rollback()
+        except Exception:
+            self._discard(connection)
+            return
+        with self._cond:
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def replace(self, connection):
+        """Discard a connection that lost its server and check out a new one"""
+        self._discard(connection)
+        with self._cond:
+            self._stats['reconnects'] += 1
+        return self.acquire()
+
+    def _discard(self, connection, expired=False):
+        self._close(connection)
+        with self._cond:
+            self._size -= 1
+            self._stats['expired' if expired else 'discarded'] += 1
+            self._cond.notify()
+
+    def close_idle(self):
+        """Close every idle connection (checked-out connections are untouched)"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for connection, _ in idle:
+            self._close(connection)
+
+    def stats(self):
+        """Snapshot of pool usage counters"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['max_size'] = self.max_size
+            stats['open'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            return stats
+
+
+# Pools are shared by every DatabaseConnection using the same connection string
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _get_pool(connection_string):
+    with _pools_lock:
+        pool = _pools.get(connection_string)
+        if pool is None:
+            pool = ConnectionPool(
+                connection_string,
+                max_size=Config.DB_POOL_SIZE,
+                timeout=Config.DB_POOL_TIMEOUT,
+                validate_after=Config.DB_VALIDATE_IDLE_SECONDS
+            )
+            _pools[connection_string] = pool
+        return pool
+
+
+class Transaction:
+    """
+    Handle yielded by DatabaseConnection.transaction().
+    Proxies the query methods of the connection; `failed` is set when any
+    statement in the block fails or the final commit does not go through.
+    """
+    
+    def __init__(self, db):
+        self._db = db
+        self.failed = False
+    
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
 
 class DatabaseConnection:
-    """Database connection handler"""
+    """
+    Database connection handler
+    Each thread checks out its own pooled connection and cursor; nested
+    get_connection() blocks on the same thread reuse the outer checkout.
+    """
     
     def __init__(self):
-        self.connection = None
-        self.cursor = None
         self._connection_string = self._build_connection_string()
-        # Connect immediately
-        self.connect()
+        self.pool = _get_pool(self._connection_string)
+        self._local = threading.local()
     
     def _build_connection_string(self):
         """Build the database connection string"""
@@ -36,53 +273,29 @@ class DatabaseConnection:
                 f"PWD={Config.DB_PASSWORD};"
             )
     
+    @property
+    def connection(self):
+        """The connection checked out by the current thread, if any"""
+        return getattr(self._local, 'connection', None)
+    
+    @property
+    def cursor(self):
+        """The cursor belonging to the current thread's connection, if any"""
+        return getattr(self._local, 'cursor', None)
+    
     def connect(self):
-        """Establish database connection"""
+        """Verify that a pooled database connection can be established"""
         try:
-            # Only connect if not already connected
-            if self.connection and self.cursor:
-                try:
-                    # Test if connection is still alive
-                    self.cursor.execute("SELECT 1")
-                    return True
-                except:
-                    # Connection is dead, close it properly
-                    self.disconnect()
-            
-            self.connection = pyodbc.connect(self._connection_string)
-            self.cursor = self.connection.cursor()
-            return True
-        except pyodbc.Error as e:
-            # Try with ODBC Driver 17 if SQL Server driver fails
-            if "SQL Server" in str(e):
-                try:
-                    alt_connection_string = self._connection_string.replace(
-                        "SQL Server", "ODBC Driver 17 for SQL Server"
-                    )
-                    self.connection = pyodbc.connect(alt_connection_string)
-                    self.cursor = self.connection.cursor()
-                    # Update the connection string for future use
-                    self._connection_string = alt_connection_string
-                    return True
-                except Exception as e2:
-                    print(f"Database connection failed with alternate driver: {str(e2)}")
-                    self.connection = None
-                    self.cursor = None
-                    return False
+            with self.get_connection():
+                return self.connection is not None
+        except Exception as e:
             print(f"Database connection failed: {str(e)}")
-            self.connection = None
-            self.cursor = None
             return False
     
     def disconnect(self):
-        """Close database connection"""
+        """Close idle pooled database connections"""
         try:
-            if self.cursor:
-                self.cursor.close()
-                self.cursor = None
-            if self.connection:
-                self.connection.close()
-                self.connection = None
+            self.pool.close_idle()
             return True
         except Exception as e:
             print(f"Error disconnecting: {str(e)}")
@@ -91,111 +304,286 @@ class DatabaseConnection:
     def test_connection(self):
         """Test database connection"""
         try:
-            if self.connect():
+            with self.get_connection():
+                if not self.cursor:
+                    return False
                 self.cursor.execute("SELECT 1")
                 result = self.cursor.fetchone()
-                # Keep connection alive after test
                 return result is not None
         except:
             return False
-        return False
+    
+    def get_pool_stats(self):
+        """Get connection pool usage statistics"""
+        return self.pool.stats()
+    
+    def _mark_broken(self):
+        """Flag the current thread's connection so it is discarded on release"""
+        self._local.broken = True
+    
+    def _current_transaction(self):
+        """The transaction() block open on this thread, if any"""
+        return getattr(self._local, 'transaction', None)
+    
+    def _commit(self):
+        """Commit now, unless an open transaction() block will commit at its end"""
+        if self._current_transaction() is None:
+            self.connection.commit()
+    
+    def _handle_error(self, error=None):
+        """Roll back after a failed statement (or flag the open transaction)"""
+        transaction = self._current_transaction()
+        if transaction is not None:
+            # The whole block is rolled back when it exits
+            transaction.failed = True
+        else:
+            try:
+                self.connection.rollback()
+            except:
+                self._mark_broken()
+        if isinstance(error, pyodbc.Error) and is_disconnect_error(error):
+            self._mark_broken()
+    
+    def _reconnect(self):
+        """Swap the current thread's dead connection for a fresh pooled one"""
+        local = self._local
+        try:
+            local.cursor.close()
+        except Exception:
+            pass
+        local.cursor = None
+        dead, local.connection = local.connection, None
+        local.connection = self.pool.replace(dead)
+        local.cursor = local.connection.cursor()
+    
+    def _execute(self, query, params=None):
+        """
+        Execute on the current thread's cursor, retrying once on a fresh
+        connection if the server dropped the old one
+        """
+        try:
+            if params:
+                return self.cursor.execute(query, params)
+            return self.cursor.execute(query)
+        except pyodbc.Error as e:
+            # Inside a transaction the earlier statements died with the
+            # connection, so there is nothing safe to retry
+            if not is_disconnect_error(e) or self._current_transaction() is not None:
+                raise
+            print(f"Database connection lost ({e.args[0]}), reconnecting...")
+            self._reconnect()
+            if params:
+                return self.cursor.execute(query, params)
+            return self.cursor.execute(query)
     
     def execute_query(self, query, params=None):
         """
         Execute a query and return results
-        For SELECT queries, returns list of dictionaries with case-insensitive keys
+        For SELECT queries, returns list of Row objects with case-insensitive keys
         For INSERT/UPDATE/DELETE, returns True/False
         """
-        # Ensure we have a connection
-        if not self.cursor or not self.connection:
-            if not self.connect():
-                print("Failed to establish database connection")
-                if query.strip().upper().startswith('SELECT'):
-                    return []
-                return False
+        is_select = query.strip().upper().startswith('SELECT')
         
+        with self.get_connection():
+            # Ensure we have a connection
+            if not self.cursor:
+                print("Failed to establish database connection")
+                return [] if is_select else False
+            
+            started = time.perf_counter()
+            rows = None
+            failed = False
+            try:
+                self._execute(query, params)
+                
+                # If it's a SELECT query, return results
+                if is_select:
+                    if not self.cursor.description:
+                        return []
+                    # One shared column map for the whole result set
+                    columns = RowColumns(column[0] for column in self.cursor.description)
+                    results = [Row(columns, tuple(row)) for row in self.cursor.fetchall()]
+                    rows = len(results)
+                    return results
+                else:
+                    # For INSERT, UPDATE, DELETE
+                    rows = self.cursor.rowcount
+                    self._commit()
+                    return True
+                    
+            except pyodbc.Error as e:
+                failed = True
+                print(f"Query execution failed: {str(e)}")
+                print(f"Query: {query}")
+                print(f"Params: {params}")
+                self._handle_error(e)
+                # Return empty list for SELECT queries, False for others
+                return [] if is_select else False
+            except Exception as e:
+                failed = True
+                print(f"Unexpected error in execute_query: {str(e)}")
+                self._handle_error(e)
+                return [] if is_select else False
+            finally:
+                query_stats.record('app', query, params, rows,
+                                   (time.perf_counter() - started) * 1000, failed)
+    
+    def iter_query(self, query, params=None, batch_size=500):
+        """
+        Stream a SELECT as Row objects, fetching `batch_size` rows at a time.
+        Uses its own pooled connection for the life of the generator so other
+        queries can run on this thread while the results are being consumed.
+        """
         try:
-            # Test connection is alive
-            self.cursor.execute("SELECT 1")
-            self.cursor.fetchone()
-        except:
-            # Connection died, reconnect
-            if not self.connect():
-                print("Failed to reconnect to database")
-                if query.strip().upper().startswith('SELECT'):
-                    return []
-                return False
+            connection = self.pool.acquire()
+        except Exception as e:
+            print(f"Failed to establish database connection: {str(e)}")
+            return
         
+        cursor = None
+        broken = False
+        # Only time spent waiting on the database counts, not the consumer
+        elapsed = 0.0
+        rows_streamed = 0
+        failed = False
         try:
-            if params:
-                self.cursor.execute(query, params)
-            else:
-                self.cursor.execute(query)
+            for attempt in range(2):
+                started = time.perf_counter()
+                try:
+                    cursor = connection.cursor()
+                    if params:
+                        cursor.execute(query, params)
+                    else:
+                        cursor.execute(query)
+                    break
+                except pyodbc.Error as e:
+                    if attempt or not is_disconnect_error(e):
+                        raise
+                    print(f"Database connection lost ({e.args[0]}), reconnecting...")
+                    dead, connection = connection, None
+                    connection = self.pool.replace(dead)
+                finally:
+                    elapsed += time.perf_counter() - started
             
-            # If it's a SELECT query, return results
-            if query.strip().upper().startswith('SELECT'):
-                columns = [column[0] for column in self.cursor.description] if self.cursor.description else []
-                results = []
-                for row in self.cursor.fetchall():
-                    # Create case-insensitive dictionary
-                    row_dict = CaseInsensitiveDict()
-                    for i, col in enumerate(columns):
-                        row_dict[col] = row[i]
-                    results.append(row_dict)
-                return results
-            else:
-                # For INSERT, UPDATE, DELETE
-                self.connection.commit()
-                return True
-                
+            if not cursor.description:
+                return
+            columns = RowColumns(column[0] for column in cursor.description)
+            while True:
+                started = time.perf_counter()
+                rows = cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - started
+                if not rows:
+                    break
+                rows_streamed += len(rows)
+                for row in rows:
+                    yield Row(columns, tuple(row))
         except pyodbc.Error as e:
-            print(f"Query execution failed: {str(e)}")
+            print(f"Streaming query failed: {str(e)}")
             print(f"Query: {query}")
             print(f"Params: {params}")
-            if self.connection:
+            broken = is_disconnect_error(e)
+            failed = True
+        finally:
+            query_stats.record('app', query, params, rows_streamed, elapsed * 1000, failed)
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    broken = True
+            if connection is not None:
+                self.pool.release(connection, discard=broken)
+    
+    def execute_many(self, query, seq_of_params):
+        """
+        Execute one INSERT/UPDATE/DELETE for many parameter sets.
+        Uses pyodbc fast_executemany so the whole batch goes to the server in
+        a single round trip, and commits once at the end (or leaves the commit
+        to an enclosing transaction() block). Returns True/False.
+        """
+        seq_of_params = [tuple(params) for params in seq_of_params]
+        if not seq_of_params:
+            return True
+        
+        with self.get_connection():
+            # Ensure we have a connection
+            if not self.cursor:
+                print("Failed to establish database connection")
+                return False
+            
+            started = time.perf_counter()
+            failed = False
+            try:
                 try:
+                    self._executemany(query, seq_of_params, fast=True)
+                except pyodbc.Error as e:
+                    # Rolling back to retry would also undo the rest of an
+                    # open transaction, so only fall back outside one
+                    if is_disconnect_error(e) or self._current_transaction() is not None:
+                        raise
+                    # Some drivers reject array binding for certain types (e.g. old
+                    # NVARCHAR(MAX) handling) - fall back to the regular path
+                    print(f"fast_executemany failed, retrying row by row: {str(e)}")
                     self.connection.rollback()
-                except:
-                    pass
-            # Return empty list for SELECT queries, False for others
-            if query.strip().upper().startswith('SELECT'):
-                return []
-            return False
-        except Exception as e:
-            print(f"Unexpected error in execute_query: {str(e)}")
-            if query.strip().upper().startswith('SELECT'):
-                return []
-            return False
+                    self._executemany(query, seq_of_params, fast=False)
+                self._commit()
+                return True
+            except pyodbc.Error as e:
+                failed = True
+                print(f"Batch execution failed: {str(e)}")
+                print(f"Query: {query}")
+                print(f"Rows: {len(seq_of_params)}")
+                self._handle_error(e)
+                return False
+            except Exception as e:
+                failed = True
+                print(f"Unexpected error in execute_many: {str(e)}")
+                self._handle_error(e)
+                return False
+            finally:
+                query_stats.record('app', query, seq_of_params[0], len(seq_of_params),
+                                   (time.perf_counter() - started) * 1000, failed)
+    
+    def _executemany(self, query, seq_of_params, fast):
+        """executemany on the current thread's cursor, retrying once on disconnect"""
+        for attempt in range(2):
+            cursor = self.cursor
+            cursor.fast_executemany = fast
+            try:
+                cursor.executemany(query, seq_of_params)
+                return
+            except pyodbc.Error as e:
+                if attempt or not is_disconnect_error(e) or self._current_transaction() is not None:
+                    raise
+                print(f"Database connection lost ({e.args[0]}), reconnecting...")
+                self._reconnect()
+            finally:
+                cursor.fast_executemany = False
     
     def execute_scalar(self, query, params=None):
         """Execute a query and return a single value"""
-        # Ensure we have a connection
-        if not self.cursor or not self.connection:
-            if not self.connect():
+        with self.get_connection():
+            # Ensure we have a connection
+            if not self.cursor:
                 print("Failed to establish database connection")
                 return None
-        
-        try:
-            # Test connection is alive
-            self.cursor.execute("SELECT 1")
-            self.cursor.fetchone()
-        except:
-            # Connection died, reconnect
-            if not self.connect():
-                return None
-        
-        try:
-            if params:
-                self.cursor.execute(query, params)
-            else:
-                self.cursor.execute(query)
-            
-            result = self.cursor.fetchone()
-            return result[0] if result else None
             
-        except Exception as e:
-            print(f"Scalar query failed: {str(e)}")
-            return None
+            started = time.perf_counter()
+            result = None
+            failed = False
+            try:
+                self._execute(query, params)
+                
+                result = self.cursor.fetchone()
+                return result[0] if result else None
+                
+            except Exception as e:
+                failed = True
+                print(f"Scalar query failed: {str(e)}")
+                self._handle_error(e)
+                return None
+            finally:
+                query_stats.record('app', query, params, 1 if result else 0,
+                                   (time.perf_counter() - started) * 1000, failed)
     
     def check_table_exists(self, table_name):
         """Check if a table exists in the database"""
@@ -211,27 +599,232 @@ class DatabaseConnection:
             print(f"Table check failed: {str(e)}")
             return False
     
+    @contextmanager
+    def transaction(self):
+        """
+        Run several statements as one transaction. Writes inside the block are
+        not committed individually; the block commits once when it exits, or
+        rolls everything back if a statement failed or the block raised.
+        Nested transaction() blocks join the outer one. Check `failed` on the
+        yielded handle after the block to learn the outcome.
+        Note: iter_query() streams on its own connection, outside the transaction.
+        """
+        outer = self._current_transaction()
+        if outer is not None:
+            yield outer
+            return
+        
+        with self.get_connection():
+            local = self._local
+            transaction = Transaction(self)
+            local.transaction = transaction
+            try:
+                yield transaction
+            except BaseException:
+                transaction.failed = True
+                raise
+            finally:
+                local.transaction = None
+                if self.connection is None:
+                    transaction.failed = True
+                elif transaction.failed:
+                    print("Transaction rolled back")
+                    try:
+                        self.connection.rollback()
+                    except:
+                        self._mark_broken()
+                else:
+                    try:
+                        self.connection.commit()
+                    except pyodbc.Error as e:
+                        print(f"Transaction commit failed: {str(e)}")
+                        transaction.failed = True
+                        self._handle_error(e)
+    
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections - maintains persistent connection"""
+        """
+        Context manager that checks a pooled connection out for the current
+        thread and returns it to the pool when the outermost block exits
+        """
+        local = self._local
+        if getattr(local, 'depth', 0) > 0:
+            # Already inside a block on this thread - reuse its connection
+            local.depth += 1
+            try:
+                yield self
+            finally:
+                local.depth -= 1
+            return
+        
+        connection = None
         try:
-            # Ensure connection is alive
-            if not self.cursor or not self.connection:
-                self.connect()
-            else:
-                # Test if connection is still alive
-                try:
-                    self.cursor.execute("SELECT 1")
-                    self.cursor.fetchone()
-                except:
-                    # Connection died, reconnect
-                    self.connect()
-            
-            yield self
+            connection = self.pool.acquire()
+            local.connection = connection
+            local.cursor = connection.cursor()
         except Exception as e:
             print(f"Error in connection context manager: {str(e)}")
+            if connection is not None:
+                self.pool.release(connection, discard=True)
+                connection = None
+            local.connection = None
+            local.cursor = None
+        
+        local.depth = 1
+        local.broken = False
+        try:
             yield self
-        # Don't disconnect when leaving context to maintain persistence
+        finally:
+            local.depth = 0
+            cursor = local.cursor
+            # A disconnect retry may have swapped the connection mid-block
+            connection = local.connection
+            local.cursor = None
+            local.connection = None
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    local.broken = True
+            if connection is not None:
+                self.pool.release(connection, discard=local.broken)
+
+
+class RowColumns:
+    """
+    Column layout shared by every Row of one result set.
+    Maps both the original and the case-folded column names to tuple indexes.
+    """
+    __slots__ = ('names', 'index')
+    
+    def __init__(self, names):
+        self.names = tuple(names)
+        index = {}
+        for i, name in enumerate(self.names):
+            # Duplicate column names resolve to the last one, as a dict would
+            index[name] = i
+            index[name.lower()] = i
+        self.index = index
+    
+    def find(self, key):
+        """Return the tuple index for a column name (any casing), or None"""
+        i = self.index.get(key)
+        if i is None and isinstance(key, str):
+            i = self.index.get(key.lower())
+        return i
+
+
+class Row:
+    """
+    Compact, read-mostly result row.
+    Values live in a tuple and column lookup goes through the shared
+    RowColumns map, so a result set does not build a dict per row.
+    Behaves like a case-insensitive dict: row['Col'], row.get(), `in`,
+    keys()/items(), and item assignment (extra keys are kept on the side).
+    """
+    __slots__ = ('_columns', '_values', '_extra')
+    
+    def __init__(self, columns, values):
+        self._columns = columns
+        self._values = values
+        self._extra = None
+    
+    def _find_extra(self, key):
+        """Return the stored casing of an extra key, or None"""
+        extra = self._extra
+        if not extra:
+            return None
+        if key in extra:
+            return key
+        if isinstance(key, str):
+            lower_key = key.lower()
+            for k in extra:
+                if isinstance(k, str) and k.lower() == lower_key:
+                    return k
+        return None
+    
+    def __getitem__(self, key):
+        i = self._columns.find(key)
+        if i is not None:
+            return self._values[i]
+        extra_key = self._find_extra(key)
+        if extra_key is not None:
+            return self._extra[extra_key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key, value):
+        i = self._columns.find(key)
+        if i is not None:
+            # Copy-on-write: rows are rarely modified after the query
+            values = list(self._values)
+            values[i] = value
+            self._values = tuple(values)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[self._find_extra(key) or key] = value
+    
+    def __delitem__(self, key):
+        extra_key = self._find_extra(key)
+        if extra_key is None:
+            raise KeyError(key)
+        del self._extra[extra_key]
+    
+    def __contains__(self, key):
+        return self._columns.find(key) is not None or self._find_extra(key) is not None
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def keys(self):
+        if self._extra:
+            return list(self._columns.names) + list(self._extra)
+        return list(self._columns.names)
+    
+    def values(self):
+        return [self[key] for key in self.keys()]
+    
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+    
+    def update(self, other=(), **kwargs):
+        pairs = other.items() if hasattr(other, 'items') else other
+        for key, value in pairs:
+            self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+    
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+    
+    def to_dict(self):
+        """Plain dict copy (original column casing) for JSON and templates"""
+        return dict(self.items())
+    
+    copy = to_dict
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def __len__(self):
+        return len(self._columns.names) + (len(self._extra) if self._extra else 0)
+    
+    def __eq__(self, other):
+        if isinstance(other, Row):
+            other = other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return f"Row({self.to_dict()!r})"
 
 
 class CaseInsensitiveDict(dict):
@@ -290,12 +883,16 @@ class CaseInsensitiveDict(dict):
             super().__delitem__(key)
 
 
-# Global instance (singleton pattern)
+# Global instance (singleton pattern) - safe to share across threads,
+# each thread checks out its own pooled connection
 _db_instance = None
+_db_instance_lock = threading.Lock()
 
 def get_db():
     """Get the global database instance"""
     global _db_instance
     if _db_instance is None:
-        _db_instance = DatabaseConnection()
+        with _db_instance_lock:
+            if _db_instance is None:
+                _db_instance = DatabaseConnection()
     return _db_instance
\ No newline at end of file
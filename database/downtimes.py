@@ -6,6 +6,7 @@ Enhanced for production downtime tracking with job selection
 """
 
 from .connection import get_db
+from .schema_cache import schema_cache
 from datetime import datetime, timedelta
 
 class DowntimesDB:
@@ -19,21 +20,14 @@ class DowntimesDB:
         """Ensure the Downtimes table has all required columns"""
         with self.db.get_connection() as conn:
             # Check if crew_size column exists, add if not
-            check_column = """
-                SELECT COUNT(*) 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'Downtimes' 
-                AND COLUMN_NAME = 'crew_size'
-            """
-            result = conn.execute_scalar(check_column)
-            
-            if result == 0:
+            if schema_cache.columns('Downtimes') and not schema_cache.has_column('Downtimes', 'crew_size'):
                 print("Adding crew_size column to Downtimes table...")
                 alter_query = """
                     ALTER TABLE Downtimes 
                     ADD crew_size INT DEFAULT 1
                 """
                 conn.execute_query(alter_query)
+                schema_cache.invalidate('Downtimes')
                 print("✅ crew_size column added successfully")
     
     def get_by_id(self, downtime_id):
@@ -120,13 +114,9 @@ class DowntimesDB:
                 data['shift_id'] = shift_id
             
             # Check if ERP columns exist in the database
-            check_columns = """
-                SELECT COUNT(*) 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'Downtimes' 
-                AND COLUMN_NAME IN ('erp_job_number', 'erp_part_number', 'erp_part_description')
-            """
-            erp_columns_exist = conn.execute_scalar(check_columns) == 3
+            erp_columns_exist = schema_cache.has_columns(
+                'Downtimes', 'erp_job_number', 'erp_part_number', 'erp_part_description'
+            )
             
             # Build INSERT query based on available columns
             if erp_columns_exist:
@@ -177,19 +167,13 @@ class DowntimesDB:
                     data['entered_by']
                 )
             
-            success = conn.execute_query(insert_query, params)
+            # Insert and read back the new downtime ID in the same batch and
+            # transaction, so it cannot pick up another user's row
+            insert_query = "SET NOCOUNT ON;" + insert_query + "SELECT CAST(SCOPE_IDENTITY() AS INT);"
+            with self.db.transaction() as tx:
+                downtime_id = tx.execute_scalar(insert_query, params)
             
-            if success:
-                # Get the new downtime ID
-                new_downtime = conn.execute_query("""
-                    SELECT TOP 1 downtime_id 
-                    FROM Downtimes 
-                    WHERE entered_by = ? 
-                    ORDER BY downtime_id DESC
-                """, (data['entered_by'],))
-                
-                downtime_id = new_downtime[0]['downtime_id'] if new_downtime else None
-                
+            if downtime_id is not None and not tx.failed:
                 # Create message with job info if applicable
                 message = f"Downtime entry created ({duration_minutes} minutes)"
                 if data.get('erp_job_number'):
@@ -245,13 +229,9 @@ class DowntimesDB:
                 return False, f"Invalid datetime format: {str(e)}"
             
             # Check if ERP columns exist
-            check_columns = """
-                SELECT COUNT(*) 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'Downtimes' 
-                AND COLUMN_NAME IN ('erp_job_number', 'erp_part_number', 'erp_part_description')
-            """
-            erp_columns_exist = conn.execute_scalar(check_columns) == 3
+            erp_columns_exist = schema_cache.has_columns(
+                'Downtimes', 'erp_job_number', 'erp_part_number', 'erp_part_description'
+            )
             
             # Build update query
             if erp_columns_exist:
@@ -0,0 +1,200 @@
+"""
+In-memory result cache for ERP datasets
+Serves recent ERP query results from memory, refreshing them in the background
+once they pass their TTL (stale-while-revalidate), and de-duplicates identical
+ERP calls made within one Flask request
+"""
+
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from flask import g, has_app_context
+from config import Config
+from .circuit_breaker import erp_breaker
+
+
+def _copy(value):
+    """Callers annotate the returned rows in place, so each gets its own row dicts"""
+    if isinstance(value, list):
+        return [dict(row) if isinstance(row, dict) else row for row in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+def _empty_stats():
+    return {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'errors': 0, 'fallbacks': 0}
+
+
+class ErpCache:
+    """Thread-safe per-dataset TTL cache with background revalidation"""
+
+    def __init__(self, stale_seconds=None):
+        self.stale_seconds = Config.ERP_CACHE_STALE_SECONDS if stale_seconds is None else stale_seconds
+        self._lock = threading.Lock()
+        self._entries = {}  # (dataset, args) -> {'value', 'loaded', 'loaded_at'}
+        self._load_locks = {}  # (dataset, args) -> Lock, so only one caller loads a key
+        self._refreshing = set()
+        self._stats = {}
+        self._local = threading.local()
+
+    @contextmanager
+    def bypass(self):
+        """Within this block, cached methods on this thread always query the ERP"""
+        previous = getattr(self._local, 'bypass', False)
+        self._local.bypass = True
+        try:
+            yield
+        finally:
+            self._local.bypass = previous
+
+    @property
+    def bypassed(self):
+        return getattr(self._local, 'bypass', False)
+
+    def _count(self, dataset, counter):
+        with self._lock:
+            stats = self._stats.setdefault(dataset, _empty_stats())
+            stats[counter] += 1
+
+    def _load(self, key, loader):
+        """Run the loader and store its result; empty results are not cached"""
+        value = loader()
+        if value:
+            with self._lock:
+                self._entries[key] = {
+                    'value': value,
+                    'loaded': time.monotonic(),
+                    'loaded_at': datetime.now()
+                }
+        return value
+
+    def _refresh_in_background(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._load(key, loader)
+                self._count(key[0], 'refreshes')
+            except Exception as e:
+                # Keep serving the stale copy; the next request retries
+                print(f"❌ [ERP_CACHE] Background refresh of {key[0]} failed: {e}")
+                traceback.print_exc()
+                self._count(key[0], 'errors')
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"erp-cache-{key[0]}", daemon=True).start()
+
+    def get(self, dataset, args, loader, ttl):
+        """
+        Return the cached result for (dataset, args), loading it with `loader`
+        when missing. Results older than `ttl` seconds are still returned for up
+        to `stale_seconds` more while a background thread fetches a fresh copy.
+        While the ERP circuit breaker is open, or when a load comes back empty,
+        the last good result is served regardless of age.
+        """
+        key = (dataset, args)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry['loaded']
+            if age < ttl:
+                self._count(dataset, 'hits')
+                return _copy(entry['value'])
+            if erp_breaker.state == erp_breaker.OPEN:
+                # The ERP is failing fast; an old result beats an empty page
+                self._count(dataset, 'fallbacks')
+                return _copy(entry['value'])
+            if age < ttl + self.stale_seconds:
+                self._count(dataset, 'stale_hits')
+                self._refresh_in_background(key, loader)
+                return _copy(entry['value'])
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            # Another request may have loaded it while we waited
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry['loaded'] < ttl:
+                self._count(dataset, 'hits')
+                return _copy(entry['value'])
+            self._count(dataset, 'misses')
+            value = self._load(key, loader)
+            if not value and entry is not None:
+                self._count(dataset, 'fallbacks')
+                return _copy(entry['value'])
+            return _copy(value)
+
+    def bust(self, dataset=None):
+        """Drop cached results for one dataset, or for all of them"""
+        with self._lock:
+            for key in list(self._entries):
+                if dataset is None or key[0] == dataset:
+                    del self._entries[key]
+
+    def stats(self):
+        """Per-dataset counters and cache state for the admin panel"""
+        with self._lock:
+            datasets = {}
+            for name, ttl in Config.ERP_CACHE_TTLS.items():
+                datasets[name] = dict(self._stats.get(name, _empty_stats()))
+                datasets[name].update({'ttl': ttl, 'entries': 0, 'loaded_at': None})
+            for (name, args), entry in self._entries.items():
+                dataset = datasets.setdefault(name, dict(_empty_stats(), ttl=None, entries=0, loaded_at=None))
+                dataset['entries'] += 1
+                if dataset['loaded_at'] is None or entry['loaded_at'] > dataset['loaded_at']:
+                    dataset['loaded_at'] = entry['loaded_at']
+            return datasets
+
+
+# Shared by every ErpService instance
+erp_cache = ErpCache()
+
+
+def erp_cached(method):
+    """
+    Cache an ErpService method's result under its name and arguments, using
+    the TTL configured in Config.ERP_CACHE_TTLS (0 or missing disables caching)
+    """
+    dataset = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        ttl = Config.ERP_CACHE_TTLS.get(dataset, 0)
+        if ttl <= 0 or erp_cache.bypassed:
+            return method(self, *args, **kwargs)
+        key = (args, tuple(sorted(kwargs.items())))
+        return erp_cache.get(dataset, key, lambda: method(self, *args, **kwargs), ttl)
+
+    return wrapper
+
+
+def request_scoped(method):
+    """
+    Memoize an ErpService method for the current Flask request (stored on `g`,
+    keyed by method name and arguments), so a dataset is fetched at most once
+    per request however many helpers ask for it. Outside a request - e.g. in
+    worker threads - calls go straight through.
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not has_app_context():
+            return method(self, *args, **kwargs)
+        memo = g.setdefault('_erp_request_memo', {})
+        key = (name, args, tuple(sorted(kwargs.items())))
+        if key not in memo:
+            memo[key] = method(self, *args, **kwargs)
+        return _copy(memo[key])
+
+    return wrapper
@@ -4,16 +4,54 @@ Dedicated ERP Database Connection Service.
 This is separate from the main application's database connection.
 """
 import pyodbc
+import threading
+import time
 import traceback
 from config import Config
+from .connection import ConnectionPool, is_disconnect_error
+from .circuit_breaker import erp_breaker, CircuitOpenError
+from .erp_cache import erp_cached, request_scoped, _copy
+from .erp_delta import DeltaAggregate
+from .query_stats import query_stats
 from datetime import datetime, timedelta
 
-class ERPConnection:
-    # ... (this class is unchanged) ...
-    def __init__(self):
-        self.connection = None
-        self._connection_string = None # Store the successful connection string
+ISOLATION_LEVELS = {'READ UNCOMMITTED', 'READ COMMITTED', 'REPEATABLE READ', 'SNAPSHOT', 'SERIALIZABLE'}
+
+def is_erp_failure(error):
+    """
+    True if a pyodbc error means the ERP is unreachable or too slow (lost
+    connection, login failure, query timeout) rather than a bad statement;
+    only these count towards opening the circuit breaker.
+    """
+    return isinstance(error, (pyodbc.OperationalError, pyodbc.InterfaceError)) or is_disconnect_error(error)
+
+class ERPConnectionPool(ConnectionPool):
+    """
+    Pool of autocommit connections to the ERP database.
+    Every statement runs in its own transaction, so a reused connection never
+    carries an old snapshot forward - each checkout reads current ERP data.
+    The working ODBC driver is found once and reused for every new connection;
+    the driver list is only probed again after that driver fails to connect.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.driver = None  # Driver that last connected successfully
+        self._probe_lock = threading.Lock()
 
+    def _build_connection_string(self, driver):
+        return (
+            f"DRIVER={driver};"
+            f"SERVER={Config.ERP_DB_SERVER},{Config.ERP_DB_PORT};"
+            f"DATABASE={Config.ERP_DB_NAME};"
+            f"UID={Config.ERP_DB_USERNAME};"
+            f"PWD={Config.ERP_DB_PASSWORD};"
+            f"TrustServerCertificate=yes;"
+            f"Connection Timeout={Config.ERP_DB_TIMEOUT};"
+        )
+
+    def _probe_drivers(self):
+        """Try each known ODBC driver in turn and remember the first that connects"""
         # Prioritized list of potential drivers to try
         drivers_to_try = [
             Config.ERP_DB_DRIVER,  # First, try the one from .env (e.g., '{ODBC Driver 18 for SQL Server}')
@@ -26,65 +64,319 @@ class ERPConnection:
         # Remove duplicates while preserving order
         drivers = list(dict.fromkeys(drivers_to_try))
 
+        last_error = None
         for driver in drivers:
             if not driver:
                 continue
             try:
-                connection_string = (
-                    f"DRIVER={driver};"
-                    f"SERVER={Config.ERP_DB_SERVER},{Config.ERP_DB_PORT};"
-                    f"DATABASE={Config.ERP_DB_NAME};"
-                    f"UID={Config.ERP_DB_USERNAME};"
-                    f"PWD={Config.ERP_DB_PASSWORD};"
-                    f"TrustServerCertificate=yes;"
-                    f"Connection Timeout={Config.ERP_DB_TIMEOUT};"
-                )
-                self.connection = pyodbc.connect(connection_string, autocommit=True)
+                connection_string = self._build_connection_string(driver)
+                connection = pyodbc.connect(connection_string, autocommit=True)
                 print(f"✅ [ERP_DB] Connection successful using driver: {driver}")
                 self._connection_string = connection_string  # Save the working string
-                break  # Exit loop on successful connection
-            except pyodbc.Error:
+                self.driver = driver
+                return connection
+            except pyodbc.Error as e:
                 print(f"ℹ️  [ERP_DB] Driver {driver} failed. Trying next...")
+                last_error = e
                 continue  # Try the next driver in the list
-        
-        if not self.connection:
-            print(f"❌ [ERP_DB] FATAL: Connection failed. All attempted drivers were unsuccessful.")
+
+        print(f"❌ [ERP_DB] FATAL: Connection failed. All attempted drivers were unsuccessful.")
+        raise last_error or pyodbc.Error("No ERP ODBC driver configured")
+
+    def _connect(self):
+        """Connect with the remembered driver, re-probing only if it fails"""
+        connection_string = self._connection_string
+        if connection_string:
+            try:
+                return pyodbc.connect(connection_string, autocommit=True)
+            except pyodbc.Error as e:
+                print(f"ℹ️  [ERP_DB] Driver {self.driver} failed ({e}). Re-probing drivers...")
+
+        # One thread probes at a time; the others then reuse what it found
+        with self._probe_lock:
+            if self._connection_string and self._connection_string != connection_string:
+                return pyodbc.connect(self._connection_string, autocommit=True)
+            self._connection_string = None
+            self.driver = None
+            return self._probe_drivers()
+
+    def _create_connection(self):
+        """Open a new ERP connection"""
+        connection = self._connect()
+        if Config.ERP_QUERY_TIMEOUT > 0:
+            # Statements running longer are cancelled by the driver (SQLSTATE HYT00)
+            connection.timeout = Config.ERP_QUERY_TIMEOUT
+
+        isolation_level = Config.ERP_DB_ISOLATION_LEVEL.strip().upper()
+        if isolation_level in ISOLATION_LEVELS:
+            # Session setting; applies to every autocommit statement on this connection
+            cursor = connection.cursor()
+            cursor.execute(f"SET TRANSACTION ISOLATION LEVEL {isolation_level}")
+            cursor.close()
+        return connection
+
+    def resolve_driver(self):
+        """Make sure a working driver is known (used for the startup report)"""
+        try:
+            self.release(self.acquire())
+        except Exception:
+            return None
+        return self.driver
+
+    def stats(self):
+        stats = super().stats()
+        stats['driver'] = self.driver
+        return stats
+
+
+_erp_pool = None
+_erp_pool_lock = threading.Lock()
+
+def get_erp_pool():
+    """Gets the process-wide ERP connection pool, creating it on first use."""
+    global _erp_pool
+    if _erp_pool is None:
+        with _erp_pool_lock:
+            if _erp_pool is None:
+                _erp_pool = ERPConnectionPool(
+                    None,
+                    max_size=Config.ERP_DB_POOL_SIZE,
+                    timeout=Config.ERP_DB_POOL_TIMEOUT,
+                    validate_after=Config.ERP_DB_VALIDATE_IDLE_SECONDS,
+                    max_lifetime=Config.ERP_DB_MAX_LIFETIME
+                )
+    return _erp_pool
+
+class ERPConnection:
+    """Runs ERP queries on connections checked out from the shared ERP pool."""
+
+    def __init__(self):
+        self.pool = get_erp_pool()
+        # Error of the last query on this handle, for callers that must tell a
+        # failed query apart from an empty result
+        self.last_error = None
+
+    def _acquire(self):
+        """
+        Check out a pooled connection, or None if the ERP is unreachable or the
+        circuit breaker is open (fails fast without touching the pool).
+        """
+        self.last_error = None
+        if not erp_breaker.allow():
+            self.last_error = CircuitOpenError('ERP circuit breaker is open')
+            return None
+        try:
+            return self.pool.acquire()
+        except Exception as e:
+            print(f"❌ [ERP_DB] Cannot execute query, no active connection: {e}")
+            self.last_error = e
+            erp_breaker.record_failure(e)
+            return None
+
+    @staticmethod
+    def _record_outcome(erp_error):
+        if erp_error is not None:
+            erp_breaker.record_failure(erp_error)
+        else:
+            erp_breaker.record_success()
 
     def execute_query(self, sql, params=None):
         """Executes a SQL query and returns results as a list of dicts."""
-        if not self.connection:
-            print("❌ [ERP_DB] Cannot execute query, no active connection.")
+        connection = self._acquire()
+        if connection is None:
             return []
         
+        started = time.perf_counter()
+        rows = None
+        failed = False
+        broken = False
+        erp_error = None
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(sql, params or [])
+            for attempt in range(2):
+                try:
+                    cursor = connection.cursor()
+                    cursor.execute(sql, params or [])
+                    break
+                except pyodbc.Error as e:
+                    if attempt or not is_disconnect_error(e):
+                        raise
+                    # Retry once on a fresh connection if the server dropped this one
+                    print(f"ℹ️  [ERP_DB] Connection lost ({e.args[0]}), reconnecting...")
+                    dead, connection = connection, None
+                    connection = self.pool.replace(dead)
             if cursor.description:
                 columns = [column[0] for column in cursor.description]
                 results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                rows = len(results)
                 cursor.close()
                 return results
             cursor.close()
             return []
         except pyodbc.Error as e:
+            failed = True
+            broken = is_disconnect_error(e)
+            self.last_error = e
+            if is_erp_failure(e):
+                erp_error = e
             print(f"❌ [ERP_DB] Query Failed: {e}")
             traceback.print_exc()
             return []
         except Exception as e:
+            failed = True
+            self.last_error = e
             print(f"❌ [ERP_DB] Unexpected error: {e}")
             traceback.print_exc()
             return []
+        finally:
+            query_stats.record('erp', sql, params, rows,
+                               (time.perf_counter() - started) * 1000, failed)
+            self._record_outcome(erp_error)
+            if connection is not None:
+                self.pool.release(connection, discard=broken)
+
+    def iter_query(self, sql, params=None, batch_size=500):
+        """Executes a SQL query and yields result rows as dicts, `batch_size` at a time."""
+        connection = self._acquire()
+        if connection is None:
+            return
+
+        cursor = None
+        # Only time spent waiting on the ERP server counts, not the consumer
+        started = time.perf_counter()
+        elapsed = 0.0
+        rows_streamed = 0
+        failed = False
+        broken = False
+        erp_error = None
+        try:
+            try:
+                for attempt in range(2):
+                    try:
+                        cursor = connection.cursor()
+                        cursor.execute(sql, params or [])
+                        break
+                    except pyodbc.Error as e:
+                        if attempt or not is_disconnect_error(e):
+                            raise
+                        print(f"ℹ️  [ERP_DB] Connection lost ({e.args[0]}), reconnecting...")
+                        dead, connection = connection, None
+                        connection = self.pool.replace(dead)
+            finally:
+                elapsed += time.perf_counter() - started
+            if not cursor.description:
+                return
+            columns = [column[0] for column in cursor.description]
+            while True:
+                started = time.perf_counter()
+                rows = cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - started
+                if not rows:
+                    break
+                rows_streamed += len(rows)
+                for row in rows:
+                    yield dict(zip(columns, row))
+        except pyodbc.Error as e:
+            failed = True
+            broken = is_disconnect_error(e)
+            self.last_error = e
+            if is_erp_failure(e):
+                erp_error = e
+            print(f"❌ [ERP_DB] Streaming query failed: {e}")
+            traceback.print_exc()
+        except Exception as e:
+            failed = True
+            self.last_error = e
+            print(f"❌ [ERP_DB] Unexpected error: {e}")
+            traceback.print_exc()
+        finally:
+            query_stats.record('erp', sql, params, rows_streamed, elapsed * 1000, failed)
+            self._record_outcome(erp_error)
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except pyodbc.Error:
+                    broken = True
+            if connection is not None:
+                self.pool.release(connection, discard=broken)
 
 def get_erp_db():
     """
-    Gets a fresh instance of the ERP connection to ensure data is not stale.
-    This is intentionally NOT a singleton for data refresh purposes.
+    Gets an ERP connection handle backed by the shared pool.
+    Connections are autocommit, so every query reads current ERP data even
+    though the underlying connection is reused.
     """
     return ERPConnection()
 
+def _checked(db, rows):
+    """Raise the query's error instead of passing off a failed query as no rows"""
+    if db.last_error is not None:
+        raise db.last_error
+    return rows
+
 class ErpService:
     """Contains all business logic for querying the ERP database."""
 
+    def __init__(self):
+        # Locally maintained aggregates used when ERP_DELTA_SYNC_ENABLED is on.
+        # Open orders are tracked by dttord.to_id (every order revision is a new
+        # row) and re-aggregated per base sales order, raw materials by
+        # dtfifo.fi_id (every inventory movement adds a row) per part number.
+        self.delta = {
+            'open_orders': DeltaAggregate(
+                'open_orders',
+                key=lambda row: int(row['SO']) // 100 * 100,
+                sort_key=lambda row: (-row['SO'], row['Part']),
+                load_mark=lambda: self._max_id('dttord', 'to_id'),
+                load_rows=self._load_open_orders,
+                load_touched=self._changed_order_bases
+            ),
+            'raw_material_inventory': DeltaAggregate(
+                'raw_material_inventory',
+                key=lambda row: row['PartNumber'],
+                sort_key=lambda row: row['PartNumber'],
+                load_mark=lambda: self._max_id('dtfifo', 'fi_id'),
+                load_rows=self._load_raw_material_inventory,
+                load_touched=self._changed_raw_material_parts
+            ),
+        }
+
+    def _max_id(self, table, column):
+        """High-water mark of an ERP table's identity column"""
+        db = get_erp_db()
+        result = _checked(db, db.execute_query(f"SELECT MAX({column}) AS mark FROM {table};"))
+        return result[0]['mark'] if result else None
+
+    def _changed_order_bases(self, since):
+        db = get_erp_db()
+        sql = """
+            SELECT DISTINCT FLOOR(to_ordnum / 100) * 100 AS base_so
+            FROM dttord
+            WHERE to_id > ?;
+        """
+        return [int(row['base_so']) for row in _checked(db, db.execute_query(sql, [since]))]
+
+    def _changed_raw_material_parts(self, since):
+        db = get_erp_db()
+        sql = """
+            SELECT DISTINCT p.pr_codenum AS PartNumber
+            FROM dtfifo f
+            JOIN dmprod p ON f.fi_prid = p.pr_id
+            WHERE f.fi_id > ?
+                AND p.pr_codenum NOT LIKE 'T%';
+        """
+        return [row['PartNumber'] for row in _checked(db, db.execute_query(sql, [since]))]
+
+    def _load_open_orders(self, since):
+        db = get_erp_db()
+        sql, params = self._open_order_schedule_query(since)
+        return _checked(db, db.execute_query(sql, params))
+
+    def _load_raw_material_inventory(self, since):
+        db = get_erp_db()
+        sql, params = self._raw_material_inventory_query(since)
+        return _checked(db, db.execute_query(sql, params))
+
+    @request_scoped
     def get_open_production_jobs(self):
         """
         Retrieves all open production jobs ('a' type) that are linked to a sales order,
@@ -107,11 +399,23 @@ class ErpService:
         return db.execute_query(sql)
 
     # ... (all other existing methods like get_raw_material_inventory, get_bom_data, etc. remain here) ...
+    @request_scoped
+    @erp_cached
     def get_raw_material_inventory(self):
         """
         Retrieves all raw material inventory, categorized by status, based on the provided JS logic.
         """
+        if Config.ERP_DELTA_SYNC_ENABLED:
+            return _copy(self.delta['raw_material_inventory'].sync())
         db = get_erp_db()
+        sql, params = self._raw_material_inventory_query()
+        return db.execute_query(sql, params)
+
+    def _raw_material_inventory_query(self, changed_since=None):
+        """
+        SQL for the raw material aggregate; with `changed_since`, only parts that
+        have dtfifo rows newer than that fi_id are aggregated.
+        """
         sql = """
             SELECT
                 p.pr_codenum AS PartNumber,
@@ -135,11 +439,17 @@ class ErpService:
             WHERE
                 f.fi_balance > 0
                 AND p.pr_codenum NOT LIKE 'T%' -- Exclude Finished Goods
-            GROUP BY
-                p.pr_codenum;
         """
-        return db.execute_query(sql)
+        params = []
+        if changed_since is not None:
+            sql += " AND f.fi_prid IN (SELECT fi_prid FROM dtfifo WHERE fi_id > ?) "
+            params.append(changed_since)
+
+        sql += " GROUP BY p.pr_codenum"
+        return sql, params
 
+    @request_scoped
+    @erp_cached
     def get_purchase_order_data(self):
         """
         Fetches genuinely open purchase order lines, based on the provided JS logic.
@@ -167,6 +477,34 @@ class ErpService:
         """
         return db.execute_query(sql)
 
+    @request_scoped
+    @erp_cached
+    def get_dated_purchase_order_data(self):
+        """
+        Open purchase order quantity per part and promise date (the wanted date
+        when no promise was given, as mm/dd/yyyy), for the time-phased MRP.
+        Same open PO lines as get_purchase_order_data.
+        """
+        db = get_erp_db()
+        sql = """
+            SELECT
+                pur.pu_ourcode AS "Part Number",
+                CONVERT(VARCHAR, ISNULL(pur.pu_promise, pur.pu_wanted), 101) AS "Promise Date",
+                SUM(ISNULL(pur.pu_quant, 0) - ISNULL(pur.pu_recman, 0)) AS "OpenPOQuantity"
+            FROM
+                dtpur AS pur
+            INNER JOIN
+                dttpur AS tp ON pur.pu_purnum = tp.tp_purnum
+            WHERE
+                (ISNULL(pur.pu_quant, 0) - ISNULL(pur.pu_recman, 0)) > 0
+                AND tp.tp_ordtype = 'p'
+                AND tp.tp_recevd IS NULL
+            GROUP BY
+                pur.pu_ourcode, CONVERT(VARCHAR, ISNULL(pur.pu_promise, pur.pu_wanted), 101);
+        """
+        return db.execute_query(sql)
+
+    @request_scoped
     def get_detailed_purchase_order_data(self):
         """
         Fetches detailed information for all genuinely open purchase order lines,
@@ -203,6 +541,7 @@ class ErpService:
         """
         return db.execute_query(sql)
 
+    @request_scoped
     def get_qc_pending_data(self):
         """
         Retrieves all inventory items that are currently in a 'QC Pending' status.
@@ -236,6 +575,8 @@ class ErpService:
         """
         return db.execute_query(sql)
 
+    @request_scoped
+    @erp_cached
     def get_bom_data(self, parent_part_number=None):
         db = get_erp_db()
         sql = """
@@ -340,6 +681,7 @@ class ErpService:
         
         return db.execute_query(sql, params)
     
+    @request_scoped
     def get_open_jobs_by_line(self, facility, line):
         db = get_erp_db()
         sql = """
@@ -387,6 +729,53 @@ class ErpService:
         """
         return db.execute_query(sql, (line, facility))
 
+    def get_all_open_jobs_by_line(self):
+        """
+        Every open 'a' job that is assigned to a production line, with the same
+        columns as get_open_jobs_by_line. Feeds the in-memory open jobs index;
+        raises if the query fails so the index keeps its previous contents.
+        """
+        db = get_erp_db()
+        sql = """
+            SELECT DISTINCT
+                j.jo_jobnum AS JobNumber,
+                CASE j.jo_waid
+                    WHEN 1 THEN 'IRWINDALE'
+                    WHEN 2 THEN 'DUARTE'
+                    WHEN 3 THEN 'AREA_3'
+                    ELSE 'UNKNOWN'
+                END AS Facility,
+                ISNULL(p.pr_codenum, 'UNKNOWN') AS PartNumber,
+                ISNULL(p.pr_descrip, 'UNKNOWN') AS PartDescription,
+                ISNULL(p1.p1_name, 'N/A') AS Customer,
+                CASE 
+                    WHEN ca.ca_name = 'Stick Pack' THEN 'SP'
+                    ELSE 'BPS'
+                END AS s_BU,
+                line.d3_value AS ProductionLine,
+                CASE 
+                    WHEN jl.lj_ordnum IS NOT NULL AND jl.lj_ordnum != 0 
+                        THEN CONVERT(VARCHAR, jl.lj_ordnum)
+                    WHEN wip_so.d2_value IS NOT NULL AND wip_so.d2_value != '' AND wip_so.d2_value != '0'
+                        THEN wip_so.d2_value
+                    ELSE ''
+                END AS SalesOrder
+            FROM dtjob j
+            LEFT JOIN dtljob jl ON j.jo_jobnum = jl.lj_jobnum
+            LEFT JOIN dmprod p ON jl.lj_prid = p.pr_id
+            LEFT JOIN dmpr1 p1 ON p.pr_user5 = p1.p1_id
+            LEFT JOIN dmcats ca ON p.pr_caid = ca.ca_id
+            INNER JOIN dtd2 line_link ON j.jo_jobnum = line_link.d2_recid AND line_link.d2_d1id = 5
+            INNER JOIN dmd3 line ON line_link.d2_value = line.d3_id AND line.d3_d1id = 5
+            LEFT JOIN dtd2 wip_so ON j.jo_jobnum = wip_so.d2_recid AND wip_so.d2_d1id = 31
+            WHERE j.jo_closed IS NULL
+              AND j.jo_type = 'a'
+            ORDER BY j.jo_jobnum ASC;
+        """
+        return _checked(db, db.execute_query(sql))
+
+    @request_scoped
+    @erp_cached
     def get_on_hand_inventory(self):
         db = get_erp_db()
         sql = """
@@ -413,6 +802,7 @@ class ErpService:
         """
         return db.execute_query(sql)
 
+    @request_scoped
     def get_split_fg_on_hand_value(self):
         today = datetime.now()
         first_of_this_month = today.replace(day=1)
@@ -455,6 +845,7 @@ class ErpService:
             }
         return {'label1': label1, 'value1': 0, 'label2': label2, 'value2': 0, 'label3': label3, 'value3': 0}
 
+    @request_scoped
     def get_shipped_for_current_month(self):
         db = get_erp_db()
         sql = """
@@ -469,9 +860,38 @@ class ErpService:
         result = db.execute_query(sql)
         return result[0]['total_shipped_value'] if result and result[0]['total_shipped_value'] is not None else 0
 
+    @request_scoped
+    @erp_cached
     def get_open_order_schedule(self):
-        # ... (this very large query is unchanged) ...
+        if Config.ERP_DELTA_SYNC_ENABLED:
+            return _copy(self.delta['open_orders'].sync())
+        return list(self.iter_open_order_schedule())
+
+    def iter_open_order_schedule(self, batch_size=500):
+        """
+        Streams the open order schedule in fetchmany batches, for exports and
+        other consumers that do not need the whole list in memory.
+        """
         db = get_erp_db()
+        sql, params = self._open_order_schedule_query()
+        yield from db.iter_query(sql, params, batch_size=batch_size)
+
+    def _open_order_schedule_query(self, changed_since=None):
+        """
+        SQL for the open order schedule; with `changed_since`, only sales orders
+        whose base order (SO rounded down to 00) has a dttord row newer than that
+        to_id are aggregated.
+        """
+        order_filter = ''
+        params = []
+        if changed_since is not None:
+            order_filter = """
+                AND FLOOR(to_ordnum / 100) * 100 IN (
+                    SELECT FLOOR(to_ordnum / 100) * 100 FROM dttord WHERE to_id > ?
+                )"""
+            params.append(changed_since)
+
+        # ... (this very large query is unchanged) ...
         sql = """
             WITH LatestOrderStatus AS (
                 SELECT 
@@ -486,7 +906,7 @@ class ErpService:
                     to_ordnum, to_billpo, to_ordtype, to_id as latest_to_id, to_wanted, to_promise,
                     to_orddate, to_dueship, to_s1id, to_biid, to_notes, to_waid
                 FROM LatestOrderStatus
-                WHERE rn = 1 AND to_ordtype IN ('s', 'h', 'm', 'l') AND to_shipped IS NULL
+                WHERE rn = 1 AND to_ordtype IN ('s', 'h', 'm', 'l') AND to_shipped IS NULL{order_filter}
             ),
             PrimarySalesRep AS (
                 SELECT 
@@ -647,8 +1067,8 @@ class ErpService:
             LEFT JOIN ProducedQuantities pq ON CAST(aod.to_ordnum AS VARCHAR) = pq.SalesOrder AND aod.pr_codenum = pq.PartNumber
             LEFT JOIN TotalShippedQuantities tsq ON (FLOOR(aod.to_ordnum / 100) * 100) = tsq.original_so_num AND aod.pr_codenum = tsq.pr_codenum
             ORDER BY aod.to_ordnum DESC, aod.pr_codenum;
-        """
-        return db.execute_query(sql)
+        """.format(order_filter=order_filter)
+        return sql, params
 
 # --- Singleton instance management ---
 _erp_service_instance = None
@@ -0,0 +1,107 @@
+"""
+Incremental (delta) sync for ERP aggregates
+Keeps a local copy of an aggregated ERP dataset and brings it up to date by
+re-aggregating only the groups whose source rows changed since the last
+high-water mark, with a periodic full reload to reconcile anything the
+change tracking cannot see.
+"""
+
+import threading
+import time
+import traceback
+from datetime import datetime
+from config import Config
+
+
+class DeltaAggregate:
+    """
+    A locally maintained aggregate, grouped by `key(row)`.
+
+    `load_mark()` returns the current high-water mark of the source table,
+    `load_rows(since)` returns aggregated rows (all of them when `since` is
+    None, otherwise only the groups touched after `since`), and
+    `load_touched(since)` returns the keys of those touched groups. Touched
+    keys missing from the delta rows have dropped out of the aggregate.
+    """
+
+    def __init__(self, name, key, sort_key, load_mark, load_rows, load_touched, full_interval=None):
+        self.name = name
+        self.key = key
+        self.sort_key = sort_key
+        self.load_mark = load_mark
+        self.load_rows = load_rows
+        self.load_touched = load_touched
+        self.full_interval = Config.ERP_DELTA_FULL_INTERVAL if full_interval is None else full_interval
+        self._groups = None  # key -> list of rows
+        self._rows = []
+        self._mark = None
+        self._last_full = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'full_syncs': 0, 'delta_syncs': 0, 'changed_groups': 0,
+                      'errors': 0, 'last_sync': None, 'last_ms': None}
+
+    def _full(self):
+        # Take the mark first so changes made during the load are picked up next time
+        mark = self.load_mark()
+        rows = self.load_rows(None)
+        if mark is None or not rows:
+            # An empty aggregate almost always means the ERP query failed
+            print(f"ℹ️  [ERP_DELTA] {self.name}: full load returned no rows, keeping previous data")
+            return
+        groups = {}
+        for row in rows:
+            groups.setdefault(self.key(row), []).append(row)
+        self._groups = groups
+        self._rows = rows
+        self._mark = mark
+        self._last_full = time.monotonic()
+        self.stats['full_syncs'] += 1
+
+    def _delta(self):
+        mark = self.load_mark()
+        if mark is None or mark == self._mark:
+            return
+        touched = set(self.load_touched(self._mark))
+        rows = self.load_rows(self._mark)
+        changed = {}
+        for row in rows:
+            changed.setdefault(self.key(row), []).append(row)
+        touched.update(changed)
+        for key in touched:
+            if key in changed:
+                self._groups[key] = changed[key]
+            else:
+                self._groups.pop(key, None)
+        self._rows = sorted((row for group in self._groups.values() for row in group), key=self.sort_key)
+        self._mark = mark
+        self.stats['delta_syncs'] += 1
+        self.stats['changed_groups'] += len(touched)
+
+    def sync(self):
+        """Bring the local aggregate up to date; returns its rows"""
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                if self._groups is None or time.monotonic() - self._last_full >= self.full_interval:
+                    self._full()
+                else:
+                    self._delta()
+            except Exception as e:
+                # Serve what we have; the mark is unchanged so the next sync retries
+                self.stats['errors'] += 1
+                print(f"❌ [ERP_DELTA] {self.name} sync failed: {e}")
+                traceback.print_exc()
+            self.stats['last_sync'] = datetime.now()
+            self.stats['last_ms'] = (time.perf_counter() - started) * 1000
+            return self._rows
+
+    def reset(self):
+        """Force a full reload on the next sync"""
+        with self._lock:
+            self._groups = None
+
+    def status(self):
+        with self._lock:
+            return dict(self.stats, mark=self._mark,
+                        groups=len(self._groups) if self._groups is not None else 0,
+                        rows=len(self._rows))
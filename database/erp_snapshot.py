@@ -0,0 +1,272 @@
+"""
+Local snapshot store for ERP datasets
+Periodically materializes the heavy ERP datasets into a local SQLite file so
+ERP-backed pages can be served even when the ERP server is slow or down.
+Each snapshot is stored column-wise (one value list per column), pickled and
+zlib-compressed, and versioned; the last few versions of each dataset are kept.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import traceback
+import zlib
+from datetime import datetime
+from config import Config
+from .erp_cache import erp_cache, _copy
+from .erp_connection import get_erp_service
+
+# Snapshot dataset name -> ErpService method that produces it
+DATASETS = {
+    'open_orders': 'get_open_order_schedule',
+    'boms': 'get_bom_data',
+    'raw_material_inventory': 'get_raw_material_inventory',
+    'on_hand_inventory': 'get_on_hand_inventory',
+    'purchase_orders': 'get_purchase_order_data',
+    'dated_purchase_orders': 'get_dated_purchase_order_data',
+    'detailed_purchase_orders': 'get_detailed_purchase_order_data',
+    'open_jobs': 'get_open_production_jobs',
+}
+
+
+def _encode(rows):
+    """Pack a list of row dicts as compressed column arrays"""
+    columns = list(rows[0].keys()) if rows else []
+    values = [[row.get(column) for row in rows] for column in columns]
+    return zlib.compress(pickle.dumps((columns, values), protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _decode(payload):
+    """Unpack column arrays back into a list of row dicts"""
+    columns, values = pickle.loads(zlib.decompress(payload))
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def _part_key(part_number):
+    """Match the ERP lookup: trimmed, case-insensitive part number"""
+    return str(part_number).strip().upper() if part_number is not None else ''
+
+
+class ErpSnapshotStore:
+    """Versioned ERP snapshots in a local SQLite file"""
+
+    def __init__(self, path=None, keep=None):
+        self.path = path or Config.ERP_SNAPSHOT_PATH
+        self.keep = keep or Config.ERP_SNAPSHOT_KEEP
+        self._decoded = {}  # dataset -> (version, rows), so reads skip decompression
+        self._meta = {}  # dataset -> newest snapshot metadata (or None), so reads skip SQLite
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS erp_snapshots (
+                    version INTEGER PRIMARY KEY AUTOINCREMENT,
+                    dataset TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    fetch_ms REAL,
+                    payload BLOB NOT NULL
+                )
+            """)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_erp_snapshots_dataset ON erp_snapshots(dataset, version)"
+            )
+            connection.commit()
+            self._initialized = True
+        return connection
+
+    def save(self, dataset, rows, fetch_ms=None):
+        """Store a new version of a dataset and prune old versions; returns the version"""
+        payload = _encode(rows)
+        created_at = datetime.now().replace(microsecond=0)
+        connection = self._connect()
+        try:
+            cursor = connection.execute(
+                "INSERT INTO erp_snapshots (dataset, created_at, row_count, fetch_ms, payload) VALUES (?, ?, ?, ?, ?)",
+                (dataset, created_at.isoformat(), len(rows), fetch_ms, payload)
+            )
+            version = cursor.lastrowid
+            connection.execute("""
+                DELETE FROM erp_snapshots
+                WHERE dataset = ? AND version NOT IN (
+                    SELECT version FROM erp_snapshots WHERE dataset = ? ORDER BY version DESC LIMIT ?
+                )
+            """, (dataset, dataset, self.keep))
+            connection.commit()
+        finally:
+            connection.close()
+        with self._lock:
+            self._decoded[dataset] = (version, rows)
+            self._meta[dataset] = {
+                'version': version,
+                'created_at': created_at,
+                'row_count': len(rows),
+                'fetch_ms': fetch_ms
+            }
+        return version
+
+    def invalidate(self):
+        """Forget the cached metadata so the next latest() re-reads it (e.g. written by another process)"""
+        with self._lock:
+            self._meta.clear()
+
+    def latest(self, dataset):
+        """Metadata of the newest snapshot of a dataset, or None"""
+        with self._lock:
+            if dataset in self._meta:
+                meta = self._meta[dataset]
+                return dict(meta) if meta else None
+        meta = self._read_latest(dataset)
+        with self._lock:
+            self._meta.setdefault(dataset, meta)
+        return dict(meta) if meta else None
+
+    def _read_latest(self, dataset):
+        connection = self._connect()
+        try:
+            row = connection.execute("""
+                SELECT version, created_at, row_count, fetch_ms
+                FROM erp_snapshots WHERE dataset = ?
+                ORDER BY version DESC LIMIT 1
+            """, (dataset,)).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            return None
+        return {
+            'version': row[0],
+            'created_at': datetime.fromisoformat(row[1]),
+            'row_count': row[2],
+            'fetch_ms': row[3]
+        }
+
+    def load(self, dataset, version):
+        """Rows of one snapshot version (shared - copy before mutating)"""
+        with self._lock:
+            cached = self._decoded.get(dataset)
+        if cached and cached[0] == version:
+            return cached[1]
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT payload FROM erp_snapshots WHERE version = ?", (version,)
+            ).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            return None
+        rows = _decode(row[0])
+        with self._lock:
+            self._decoded[dataset] = (version, rows)
+        return rows
+
+
+class ErpSnapshotService:
+    """Refreshes ERP snapshots in the background and serves reads from them"""
+
+    def __init__(self):
+        self.store = ErpSnapshotStore()
+        self.erp = get_erp_service()
+        self._thread = None
+        self._refresh_lock = threading.Lock()
+        self.last_errors = {}
+
+    @property
+    def enabled(self):
+        return Config.ERP_SNAPSHOT_ENABLED
+
+    def refresh(self, dataset=None):
+        """Pull fresh data from the ERP and store new snapshot versions"""
+        names = [dataset] if dataset else list(DATASETS)
+        with self._refresh_lock:
+            for name in names:
+                started = time.perf_counter()
+                try:
+                    # Go to the ERP itself, not the in-memory result cache
+                    with erp_cache.bypass():
+                        rows = getattr(self.erp, DATASETS[name])()
+                    if not rows:
+                        # An empty result usually means the ERP query failed;
+                        # keep serving the previous snapshot
+                        print(f"ℹ️  [ERP_SNAPSHOT] {name}: no rows returned, keeping previous snapshot")
+                        continue
+                    fetch_ms = (time.perf_counter() - started) * 1000
+                    version = self.store.save(name, rows, fetch_ms)
+                    self.last_errors.pop(name, None)
+                    print(f"✅ [ERP_SNAPSHOT] {name}: version {version}, {len(rows)} rows in {fetch_ms:.0f} ms")
+                except Exception as e:
+                    self.last_errors[name] = str(e)
+                    print(f"❌ [ERP_SNAPSHOT] Refresh of {name} failed: {e}")
+                    traceback.print_exc()
+            # Pick up versions other processes saved to the same file since the last sync
+            self.store.invalidate()
+
+    def read(self, dataset):
+        """
+        Rows of a dataset from the latest snapshot, if snapshots are enabled and
+        the snapshot is recent enough; otherwise straight from the ErpService.
+        """
+        if self.enabled:
+            try:
+                meta = self.store.latest(dataset)
+                if meta and (datetime.now() - meta['created_at']).total_seconds() <= Config.ERP_SNAPSHOT_MAX_AGE:
+                    rows = self.store.load(dataset, meta['version'])
+                    if rows is not None:
+                        return _copy(rows)
+            except Exception as e:
+                print(f"❌ [ERP_SNAPSHOT] Reading {dataset} failed, querying ERP: {e}")
+        return getattr(self.erp, DATASETS[dataset])()
+
+    def get_bom_data(self, parent_part_number=None):
+        """BOM rows from the snapshot, filtered to one parent when requested"""
+        if not parent_part_number:
+            return self.read('boms')
+        if self.enabled:
+            key = _part_key(parent_part_number)
+            boms = self.read('boms')
+            return [row for row in boms if _part_key(row.get('Parent Part Number')) == key]
+        return self.erp.get_bom_data(parent_part_number)
+
+    def refresh_in_background(self, dataset=None):
+        """Run refresh() on a throwaway thread so a request does not wait on the ERP"""
+        threading.Thread(target=self.refresh, args=(dataset,), name='erp-snapshot-refresh', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(Config.ERP_SNAPSHOT_INTERVAL)
+
+    def start(self):
+        """Start the background refresher (once per process)"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='erp-snapshots', daemon=True)
+        self._thread.start()
+        print(f"✅ [ERP_SNAPSHOT] Refreshing every {Config.ERP_SNAPSHOT_INTERVAL}s into {self.store.path}")
+
+    def status(self):
+        """Latest snapshot of each dataset, for the admin panel"""
+        status = {}
+        for name in DATASETS:
+            try:
+                meta = self.store.latest(name)
+            except Exception as e:
+                meta = None
+                self.last_errors.setdefault(name, str(e))
+            if meta:
+                meta['age_seconds'] = (datetime.now() - meta['created_at']).total_seconds()
+            status[name] = {'latest': meta, 'error': self.last_errors.get(name)}
+        return status
+
+
+# Shared instance
+erp_snapshots = ErpSnapshotService()
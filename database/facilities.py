@@ -4,6 +4,7 @@ With working update method for editing facilities
 """
 
 from .connection import get_db
+from .schema_cache import schema_cache
 from datetime import datetime
 
 class FacilitiesDB:
@@ -20,13 +21,7 @@ class FacilitiesDB:
                 return []
             
             # Check which columns exist
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'Facilities'
-            """
-            columns_result = conn.execute_query(columns_query)
-            existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+            existing_columns = schema_cache.columns('Facilities')
             
             # Build query based on available columns
             base_fields = ['facility_id', 'facility_name', 'is_active']
@@ -110,13 +105,7 @@ class FacilitiesDB:
                 return False, "Facility name already exists", None
             
             # Check which columns exist
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'Facilities'
-            """
-            columns_result = conn.execute_query(columns_query)
-            existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+            existing_columns = schema_cache.columns('Facilities')
             
             # Build INSERT query based on available columns
             fields = ['facility_name', 'is_active']
@@ -185,13 +174,7 @@ class FacilitiesDB:
                 return True, "No changes detected", None
             
             # Check which columns exist
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'Facilities'
-            """
-            columns_result = conn.execute_query(columns_query)
-            existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+            existing_columns = schema_cache.columns('Facilities')
             
             # Build UPDATE query
             set_fields = ['facility_name = ?']
@@ -245,13 +228,7 @@ class FacilitiesDB:
                     return False, f"Cannot deactivate facility with {lines[0]['count']} active production lines"
             
             # Check which columns exist
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'Facilities'
-            """
-            columns_result = conn.execute_query(columns_query)
-            existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+            existing_columns = schema_cache.columns('Facilities')
             
             # Deactivate
             if 'modified_by' in existing_columns:
@@ -289,13 +266,7 @@ class FacilitiesDB:
                 return False, "Facility is already active"
             
             # Check which columns exist
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'Facilities'
-            """
-            columns_result = conn.execute_query(columns_query)
-            existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+            existing_columns = schema_cache.columns('Facilities')
             
             # Reactivate
             if 'modified_by' in existing_columns:
@@ -0,0 +1,66 @@
+"""
+MRP allocation pegging
+Records, per component, which sales orders were given stock and how much, in
+allocation order. Running totals make an order's share of what earlier orders
+took a constant-time lookup during the MRP run instead of a scan of every
+earlier allocation. The per-order "shared with" breakdown is not stored in the
+results; it is rendered on request from the position each component row keeps
+in this log.
+"""
+
+
+class AllocationLog:
+    """Per-component allocation history of one MRP run"""
+
+    def __init__(self):
+        self._entries = {}  # part -> [(so_number, allocated)] in allocation order
+        self._totals = {}  # part -> total allocated so far
+        self._by_so = {}  # part -> {so_number: allocated so far to that order}
+
+    def add(self, part, so_number, allocated):
+        self._entries.setdefault(part, []).append((so_number, allocated))
+        self._totals[part] = self._totals.get(part, 0) + allocated
+        by_so = self._by_so.setdefault(part, {})
+        by_so[so_number] = by_so.get(so_number, 0) + allocated
+
+    def position(self, part):
+        """Allocations of `part` so far; kept in a component row to peg it to this point"""
+        return len(self._entries.get(part, ()))
+
+    def allocated_to_others(self, part, so_number):
+        """Quantity of `part` allocated so far to orders other than `so_number`"""
+        by_so = self._by_so.get(part)
+        if not by_so or (len(by_so) == 1 and so_number in by_so):
+            return 0
+        return self._totals[part] - by_so.get(so_number, 0)
+
+    def shared_with(self, part, so_number, position):
+        """'Shared with' lines for a component row: what earlier orders were given"""
+        others = [
+            (so, allocated) for so, allocated in self._entries.get(part, ())[:position]
+            if str(so) != str(so_number)
+        ]
+        if not others:
+            return []
+        total = sum(allocated for _, allocated in others)
+        return [f"Total Allocated to Prior SOs: {total:,.2f}"] + [
+            f"  - SO {so}: {allocated:,.2f}" for so, allocated in others
+        ]
+
+    @classmethod
+    def from_results(cls, results):
+        """Rebuild a run's log from the pegging positions kept in its component rows"""
+        slots = {}
+        for result in results:
+            so_number = result['sales_order']['SO']
+            for component in result['components']:
+                position = component.get('pegging_position')
+                if position and component['allocated_for_this_so'] > 0:
+                    slots.setdefault(component['part_number'], {})[position] = (
+                        so_number, component['allocated_for_this_so']
+                    )
+        log = cls()
+        for part, by_position in slots.items():
+            for position in sorted(by_position):
+                log.add(part, *by_position[position])
+        return log
@@ -0,0 +1,412 @@
+"""
+Shared MRP results and background MRP runner
+Keeps the latest MRP run so the MRP page, the customer summary and exports
+reuse one calculation instead of each running the full MRP. A run is reused
+until its inputs change: the fetched inputs (and the settings that affect the
+outcome) are fingerprinted and only a new fingerprint triggers a recompute.
+Runs happen on a background thread - on a schedule and on demand - one at a
+time, and every run is recorded with its phase timings in a local SQLite
+table together with its results, so a restart serves the last run at once.
+A run missing an optional input (POs, open jobs, capacities) is recorded as
+degraded and only served while there is no complete run to show instead.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import traceback
+import zlib
+from datetime import date, datetime
+from config import Config
+from .mrp_service import mrp_service
+from .mrp_pegging import AllocationLog
+
+
+def fingerprint(inputs, failed=()):
+    """Stable hash of the MRP inputs plus the settings that change the result"""
+    digest = hashlib.sha256()
+    for name in sorted(inputs):
+        digest.update(name.encode())
+        digest.update(pickle.dumps(inputs[name], protocol=4))
+    # A source that failed comes back empty; its recovery must not look unchanged
+    digest.update(repr(sorted(failed)).encode())
+    digest.update(repr((Config.MRP_ENGINE, Config.MRP_MULTI_LEVEL_BOM)).encode())
+    if Config.MRP_TIME_PHASED:
+        # Buckets are relative to today, so the same inputs give a new plan tomorrow
+        digest.update(repr((Config.MRP_TIME_BUCKET, date.today())).encode())
+    return digest.hexdigest()
+
+
+class MRPRunStore:
+    """MRP run history, with the results of the last few runs, in a local SQLite file"""
+
+    def __init__(self, path=None, keep=None):
+        self.path = path or Config.MRP_RUN_STORE_PATH
+        self.keep = keep or Config.MRP_RUN_KEEP
+        self._initialized = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS mrp_runs (
+                    version INTEGER PRIMARY KEY AUTOINCREMENT,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    trigger TEXT NOT NULL,
+                    fingerprint TEXT,
+                    order_count INTEGER,
+                    total_ms REAL,
+                    phases TEXT,
+                    row_counts TEXT,
+                    error TEXT,
+                    payload BLOB
+                )
+            """)
+            connection.commit()
+            self._initialized = True
+        return connection
+
+    def save(self, run, results=None):
+        """Record a run (with its results when it succeeded); returns its version"""
+        payload = None
+        if results is not None:
+            payload = zlib.compress(pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL))
+        connection = self._connect()
+        try:
+            cursor = connection.execute("""
+                INSERT INTO mrp_runs (started_at, finished_at, status, trigger, fingerprint, order_count,
+                                      total_ms, phases, row_counts, error, payload)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                run['started_at'].isoformat(timespec='seconds'), run['computed_at'].isoformat(timespec='seconds'),
+                run['status'], run['trigger'], run.get('fingerprint'), run.get('orders'), run.get('total_ms'),
+                json.dumps(run.get('phases') or {}), json.dumps(run.get('row_counts') or {}), run.get('error'),
+                payload
+            ))
+            version = cursor.lastrowid
+            # Only the newest runs keep their results; older ones stay as history
+            connection.execute("""
+                UPDATE mrp_runs SET payload = NULL
+                WHERE payload IS NOT NULL AND version NOT IN (
+                    SELECT version FROM mrp_runs WHERE payload IS NOT NULL ORDER BY version DESC LIMIT ?
+                )
+            """, (self.keep,))
+            connection.execute("""
+                DELETE FROM mrp_runs WHERE version NOT IN (
+                    SELECT version FROM mrp_runs ORDER BY version DESC LIMIT ?
+                )
+            """, (Config.MRP_RESULT_HISTORY,))
+            connection.commit()
+        finally:
+            connection.close()
+        return version
+
+    @staticmethod
+    def _meta(row):
+        return {
+            'version': row[0],
+            'started_at': datetime.fromisoformat(row[1]),
+            'computed_at': datetime.fromisoformat(row[2]),
+            'status': row[3],
+            'trigger': row[4],
+            'fingerprint': row[5],
+            'orders': row[6],
+            'total_ms': row[7],
+            'phases': json.loads(row[8] or '{}'),
+            'row_counts': json.loads(row[9] or '{}'),
+            'error': row[10]
+        }
+
+    def history(self, limit=None):
+        """Metadata of recent runs, newest first"""
+        connection = self._connect()
+        try:
+            rows = connection.execute("""
+                SELECT version, started_at, finished_at, status, trigger, fingerprint, order_count,
+                       total_ms, phases, row_counts, error
+                FROM mrp_runs ORDER BY version DESC LIMIT ?
+            """, (limit or Config.MRP_RESULT_HISTORY,)).fetchall()
+        finally:
+            connection.close()
+        return [self._meta(row) for row in rows]
+
+    def latest(self):
+        """The newest complete run with its results (a degraded one if there is none), or None"""
+        connection = self._connect()
+        try:
+            row = connection.execute("""
+                SELECT version, started_at, finished_at, status, trigger, fingerprint, order_count,
+                       total_ms, phases, row_counts, error, payload
+                FROM mrp_runs WHERE payload IS NOT NULL ORDER BY status = 'ok' DESC, version DESC LIMIT 1
+            """).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            return None
+        run = self._meta(row)
+        run['results'] = pickle.loads(zlib.decompress(row[11]))
+        return run
+
+
+class MRPResultCache:
+    """Latest MRP results keyed by input fingerprint, computed one run at a time"""
+
+    def __init__(self, service=None, store=None):
+        self.service = service or mrp_service
+        self.store = store or MRPRunStore()
+        self._run_lock = threading.Lock()  # Single flight: one fetch/run at a time
+        self._latest = None  # {'version', 'fingerprint', 'results', 'computed_at', ...}
+        self._checked = None  # monotonic time the latest result was last matched to the inputs
+        self._version = 0
+        self._thread = None
+        self._loaded = False
+        self.progress = {'running': False}
+        self.stats = {'hits': 0, 'shared': 0, 'runs': 0, 'forced': 0, 'errors': 0, 'degraded': 0}
+        self.last_error = None
+
+    def _set_progress(self, phase, done=None, total=None):
+        self.progress.update(phase=phase, done=done, total=total)
+
+    def _load_persisted(self):
+        """Pick up the last stored run so pages have results right after a restart"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            run = self.store.latest()
+        except Exception as e:
+            print(f"❌ [MRP_RESULTS] Reading stored MRP runs failed: {e}")
+            return
+        if run is not None and self._latest is None:
+            self._latest = run
+            self._version = run['version']
+            self._checked = float('-inf')  # Re-check its inputs on first use
+            print(f"ℹ️  [MRP_RESULTS] Loaded stored run #{run['version']} from {run['computed_at']:%Y-%m-%d %H:%M}")
+
+    def _persist(self, run, results=None):
+        try:
+            return self.store.save(run, results)
+        except Exception as e:
+            print(f"❌ [MRP_RESULTS] Saving MRP run failed: {e}")
+            traceback.print_exc()
+            return None
+
+    def get(self, force=False, trigger='request'):
+        """
+        Return the current MRP result as a dict with 'results', 'version',
+        'computed_at' and 'fingerprint', running the MRP first if needed. The
+        inputs are re-checked at most every MRP_RESULT_CHECK_SECONDS; `force`
+        recomputes even if they are unchanged. The result list is shared between
+        requests - callers must not modify it. Raises if the MRP run fails and
+        there is no earlier result.
+        """
+        requested = time.monotonic()
+        self._load_persisted()
+        with self._run_lock:
+            latest = self._latest
+            if latest is not None and self._checked >= requested:
+                # Another request ran or validated while we waited - share it
+                self.stats['shared'] += 1
+                return latest
+            if latest is not None and not force and (
+                    requested - self._checked < Config.MRP_RESULT_CHECK_SECONDS):
+                self.stats['hits'] += 1
+                return latest
+
+            self.progress = {'running': True, 'trigger': trigger, 'started_at': datetime.now(),
+                             'phase': 'fetch', 'done': None, 'total': None}
+            try:
+                return self._compute(latest, force, trigger)
+            finally:
+                self.progress = {'running': False}
+
+    def _compute(self, latest, force, trigger):
+        """Fetch and fingerprint the inputs, then run the MRP if they changed (run lock held)"""
+        started_at = self.progress['started_at']
+        started = time.perf_counter()
+        phases = {}
+        try:
+            inputs, failed = self.service.fetch_inputs()
+            phases['fetch_ms'] = (time.perf_counter() - started) * 1000
+            # Without a required source the result would be wrong, not just stale
+            self.service.check_inputs(failed)
+            row_counts = {name: len(rows) for name, rows in inputs.items()}
+            degraded = f"Could not fetch {', '.join(failed)}" if failed else None
+            if degraded and latest is not None and latest['status'] == 'ok':
+                # Keep serving the last complete run rather than computing one without these sources
+                self.stats['degraded'] += 1
+                self.last_error = degraded
+                print(f"⚠️  [MRP_RESULTS] {degraded}, keeping run #{latest['version']}")
+                self._persist({'started_at': started_at, 'computed_at': datetime.now(), 'status': 'degraded',
+                               'trigger': trigger, 'total_ms': (time.perf_counter() - started) * 1000,
+                               'phases': phases, 'row_counts': row_counts, 'error': degraded})
+                return latest
+
+            self._set_progress('fingerprint')
+            step = time.perf_counter()
+            key = fingerprint(inputs, failed)
+            phases['fingerprint_ms'] = (time.perf_counter() - step) * 1000
+            # A run restored from the store has no time-phased plan, so it is rebuilt once
+            missing_plan = Config.MRP_TIME_PHASED and latest is not None and latest.get('time_phased') is None
+            if latest is not None and not force and not missing_plan and key == latest['fingerprint']:
+                self._checked = time.monotonic()
+                self.last_error = None
+                self.stats['hits'] += 1
+                return latest
+
+            # A forced run recomputes every order rather than reusing the last run's
+            results = self.service.calculate_mrp_suggestions(inputs=inputs, progress=self._set_progress,
+                                                             full=force)
+            phases.update(self.service.last_run_phases)
+            row_counts['recomputed_orders'] = self.service.last_run_counts.get('recomputed')
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.last_error = str(e)
+            print(f"❌ [MRP_RESULTS] MRP run failed: {e}")
+            traceback.print_exc()
+            self._persist({'started_at': started_at, 'computed_at': datetime.now(), 'status': 'error',
+                           'trigger': trigger, 'total_ms': (time.perf_counter() - started) * 1000,
+                           'phases': phases, 'error': str(e)})
+            if latest is None:
+                raise
+            return latest
+
+        entry = {
+            'fingerprint': key,
+            'results': results,
+            'started_at': started_at,
+            'computed_at': datetime.now(),
+            'status': 'degraded' if degraded else 'ok',
+            'trigger': trigger,
+            'total_ms': (time.perf_counter() - started) * 1000,
+            'phases': phases,
+            'row_counts': row_counts,
+            'orders': len(results),
+            'time_phased': self.service.last_time_phased,
+            'error': degraded
+        }
+        if degraded:
+            # Nothing complete to show yet; serve it, flagged, until a complete run replaces it
+            self.stats['degraded'] += 1
+            print(f"⚠️  [MRP_RESULTS] {degraded}, serving an incomplete run")
+        version = self._persist(entry, results)
+        self._version = max(self._version + 1, version or 0)
+        entry['version'] = self._version
+        self._latest = entry
+        self._checked = time.monotonic()
+        self.last_error = None
+        self.stats['runs'] += 1
+        if force:
+            self.stats['forced'] += 1
+        print(f"✅ [MRP_RESULTS] Version {self._version}: {len(results)} orders "
+              f"in {entry['total_ms']:.0f} ms ({trigger}{', forced' if force else ''})")
+        return entry
+
+    def current(self):
+        """
+        The latest result without waiting for the MRP, or None before the first
+        run finishes. Starts a background check of the inputs when one is due.
+        """
+        self._load_persisted()
+        latest = self._latest
+        if latest is None or time.monotonic() - self._checked >= Config.MRP_RESULT_CHECK_SECONDS:
+            self.run_in_background(trigger='page')
+        return latest
+
+    def shared_with(self, version, so_number, components):
+        """
+        'Shared with' lines for component rows of one order, given as
+        [(part, pegging_position)], from run `version`; None when that run is no
+        longer the current one. The run's pegging is rebuilt from its results
+        on first use.
+        """
+        latest = self._latest
+        if latest is None or latest['version'] != version:
+            return None
+        allocation_log = latest.get('allocation_log')
+        if allocation_log is None:
+            allocation_log = latest['allocation_log'] = AllocationLog.from_results(latest['results'])
+        return [allocation_log.shared_with(part, so_number, position) for part, position in components]
+
+    def run_in_background(self, force=False, trigger='demand'):
+        """Start a run on a throwaway thread; False if one is already running"""
+        if self._run_lock.locked():
+            return False
+
+        def run():
+            try:
+                self.get(force=force, trigger=trigger)
+            except Exception:
+                pass  # Already logged and recorded by get()
+
+        threading.Thread(target=run, name='mrp-run', daemon=True).start()
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                self.get(trigger='schedule')
+            except Exception:
+                pass
+            time.sleep(Config.MRP_RUN_INTERVAL)
+
+    def start(self):
+        """Load the stored run and start the scheduled runs (once per process)"""
+        self._load_persisted()
+        if Config.MRP_RUN_INTERVAL <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='mrp-scheduler', daemon=True)
+        self._thread.start()
+        print(f"✅ [MRP_RESULTS] Checking MRP inputs every {Config.MRP_RUN_INTERVAL}s")
+
+    def progress_status(self):
+        """Run progress and the current result version, for the MRP pages to poll"""
+        progress = dict(self.progress)
+        latest = self._latest
+        percent = None
+        if progress.get('running') and progress.get('total'):
+            percent = round(100 * (progress.get('done') or 0) / progress['total'])
+        started_at = progress.get('started_at')
+        return {
+            'running': progress.get('running', False),
+            'phase': progress.get('phase'),
+            'trigger': progress.get('trigger'),
+            'done': progress.get('done'),
+            'total': progress.get('total'),
+            'percent': percent,
+            'started_at': started_at.isoformat(timespec='seconds') if started_at else None,
+            'version': latest['version'] if latest else None,
+            'computed_at': latest['computed_at'].isoformat(timespec='seconds') if latest else None,
+            'error': self.last_error
+        }
+
+    def status(self):
+        """Counters and stored run history for the admin panel"""
+        latest = self._latest
+        try:
+            history = self.store.history()
+        except Exception as e:
+            history = []
+            print(f"❌ [MRP_RESULTS] Reading MRP run history failed: {e}")
+        return dict(self.stats,
+                    version=latest['version'] if latest else None,
+                    computed_at=latest['computed_at'] if latest else None,
+                    fingerprint=latest['fingerprint'][:12] if latest else None,
+                    running=self._run_lock.locked(),
+                    progress=self.progress_status(),
+                    history=history,
+                    error=self.last_error)
+
+
+# Shared by the MRP routes
+mrp_result_cache = MRPResultCache()
@@ -4,23 +4,60 @@ MRP (Material Requirements Planning) Service
 This service contains the core logic for calculating production suggestions.
 """
 
+import bisect
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from config import Config
 from .erp_connection import get_erp_service
+from .erp_snapshot import erp_snapshots
+from .bom_explosion import bom_explosion
+from .mrp_pegging import AllocationLog
+from .mrp_time_phased import TimePhasedPlan
 from .capacity import ProductionCapacityDB
 from datetime import datetime
 
+try:
+    import numpy as np
+except ImportError:  # Only the 'numpy' MRP engine needs it
+    np = None
+
 # Create an instance of the capacity DB directly
 capacity_db = ProductionCapacityDB()
 
+# Shared, bounded worker pool for the MRP input fetches (each worker holds one
+# ERP connection while its query runs)
+_fetch_executor = ThreadPoolExecutor(max_workers=Config.MRP_FETCH_WORKERS, thread_name_prefix='mrp-fetch')
+
+# Inputs the MRP cannot run without: computing with one of these empty would
+# report every order as short (or nothing to build) instead of failing
+REQUIRED_INPUTS = ('sales_orders', 'boms', 'component_inventory', 'finished_good_inventory')
+
+
+class MRPInputError(Exception):
+    """Raised instead of running the MRP when a required input could not be fetched"""
+
+    def __init__(self, sources):
+        self.sources = list(sources)
+        super().__init__(f"Could not fetch required MRP data: {', '.join(self.sources)}")
+
+
 class MRPService:
     def __init__(self):
         self.erp = get_erp_service()
+        self.last_fetch_report = {}
+        self.last_engine_comparison = {}
+        self.last_run_phases = {}
+        self.last_run_counts = {}
+        self.last_time_phased = None  # TimePhasedPlan of the last run, for per-part projections
+        self._incremental_state = None  # per-order results of the last python run, for incremental runs
 
     def get_component_inventory(self):
         """
         Fetches and processes raw material/component inventory from the ERP.
         Returns a dictionary mapping part numbers to their available quantities.
         """
-        inventory_data = self.erp.get_raw_material_inventory()
+        inventory_data = erp_snapshots.read('raw_material_inventory')
         inventory = {}
         for row in inventory_data:
             part_number = row['PartNumber']
@@ -33,20 +70,110 @@ class MRPService:
             }
         return inventory
 
-    def calculate_mrp_suggestions(self):
+    def fetch_inputs(self):
+        """
+        Runs the independent MRP input queries concurrently on the shared worker
+        pool. Returns (inputs, failed): a source that fails or exceeds
+        Config.MRP_FETCH_TIMEOUT comes back empty and its name is listed in
+        `failed`, so the caller decides whether the run can go ahead (see
+        check_inputs). Per-source timings are kept in `last_fetch_report`.
+        """
+        sources = {
+            'sales_orders': (lambda: erp_snapshots.read('open_orders'), list),
+            'boms': (lambda: erp_snapshots.read('boms'), list),
+            'purchase_orders': (lambda: erp_snapshots.read('purchase_orders'), list),
+            'component_inventory': (self.get_component_inventory, dict),
+            'finished_good_inventory': (lambda: erp_snapshots.read('on_hand_inventory'), list),
+            'open_jobs': (lambda: erp_snapshots.read('open_jobs'), list),
+            'capacities': (capacity_db.get_all, list),
+        }
+        if Config.MRP_TIME_PHASED:
+            # Only the time-phased netting needs the open POs split by promise date
+            sources['dated_purchase_orders'] = (lambda: erp_snapshots.read('dated_purchase_orders'), list)
+
+        def timed(fetch):
+            started = time.perf_counter()
+            result = fetch()
+            return result, (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        deadline = time.monotonic() + Config.MRP_FETCH_TIMEOUT
+        futures = {name: _fetch_executor.submit(timed, fetch) for name, (fetch, _) in sources.items()}
+
+        data = {}
+        report = {}
+        failed = []
+        for name, future in futures.items():
+            empty = sources[name][1]
+            try:
+                result, elapsed_ms = future.result(timeout=max(0, deadline - time.monotonic()))
+                data[name] = result if result is not None else empty()
+                report[name] = {'status': 'ok', 'ms': elapsed_ms, 'rows': len(data[name])}
+            except FutureTimeoutError:
+                print(f"MRP RUN: {name} did not finish within {Config.MRP_FETCH_TIMEOUT}s, continuing without it")
+                data[name] = empty()
+                failed.append(name)
+                report[name] = {'status': 'timeout', 'ms': None, 'rows': 0}
+            except Exception as e:
+                print(f"MRP RUN: Fetching {name} failed: {e}")
+                traceback.print_exc()
+                data[name] = empty()
+                failed.append(name)
+                report[name] = {'status': 'error', 'ms': None, 'rows': 0}
+
+        report['total_ms'] = (time.perf_counter() - started) * 1000
+        self.last_fetch_report = report
+        print("MRP RUN: Fetched inputs in {:.0f} ms ({})".format(
+            report['total_ms'],
+            ', '.join(
+                f"{name} {info['ms']:.0f} ms" if info['ms'] is not None else f"{name} {info['status']}"
+                for name, info in report.items() if name != 'total_ms'
+            )
+        ))
+        return data, failed
+
+    @staticmethod
+    def check_inputs(failed):
+        """Raise MRPInputError if any of the `failed` sources is one the MRP requires"""
+        missing = [name for name in REQUIRED_INPUTS if name in failed]
+        if missing:
+            raise MRPInputError(missing)
+
+    def calculate_mrp_suggestions(self, engine=None, inputs=None, progress=None, full=False):
         """
         The main MRP engine. Calculates production suggestions for all open sales orders.
+        `engine` picks the allocation engine ('python', 'numpy' or 'compare');
+        defaults to Config.MRP_ENGINE. `inputs` takes data already returned by
+        fetch_inputs (its sales order rows are annotated in place); when the
+        inputs are fetched here, a missing required source raises MRPInputError.
+        `progress`, if given, is called as progress(phase, done, total) while
+        the run goes.
+        With Config.MRP_INCREMENTAL the python engine reuses the previous run's
+        results for orders nothing changed for; `full` recomputes every order.
+        With Config.MRP_TIME_PHASED each component row also gets its shortfall
+        on the order's ship date (see `_time_phase`).
+        Time spent per phase is kept in `last_run_phases`, and the number of
+        orders actually allocated in `last_run_counts`.
         """
-        # 1. Fetch all necessary data in bulk
-        print("MRP RUN: Fetching data...")
-        sales_orders = self.erp.get_open_order_schedule()
-        boms = self.erp.get_bom_data()
-        purchase_orders = self.erp.get_purchase_order_data()
-        component_inventory = self.get_component_inventory()
-        finished_good_inventory_data = self.erp.get_on_hand_inventory()
-        capacities = {c['line_id']: c['capacity_per_shift'] for c in capacity_db.get_all()}
+        phases = {}
+        report = progress or (lambda phase, done=None, total=None: None)
+
+        # 1. Fetch all necessary data in bulk (concurrently)
+        if inputs is None:
+            print("MRP RUN: Fetching data...")
+            report('fetch')
+            inputs, failed = self.fetch_inputs()
+            self.check_inputs(failed)
+            phases['fetch_ms'] = self.last_fetch_report['total_ms']
+        started = time.perf_counter()
+        sales_orders = inputs['sales_orders']
+        boms = inputs['boms']
+        purchase_orders = inputs['purchase_orders']
+        component_inventory = inputs['component_inventory']
+        finished_good_inventory_data = inputs['finished_good_inventory']
+        capacities = {c['line_id']: c['capacity_per_shift'] for c in inputs['capacities']}
         
-        open_jobs = self.erp.get_open_production_jobs()
+        open_jobs = inputs['open_jobs']
         jobs_by_so = {}
         for job in open_jobs:
             so_num = str(job.get('so_number'))
@@ -68,12 +195,11 @@ class MRPService:
             } for item in finished_good_inventory_data
         }
         
-        boms_by_parent = {}
-        for item in boms:
-            parent = item['Parent Part Number'].strip()
-            if parent not in boms_by_parent:
-                boms_by_parent[parent] = []
-            boms_by_parent[parent].append(item)
+        # Sub-assemblies are exploded down to purchased components (memoized across runs)
+        report('bom')
+        bom_started = time.perf_counter()
+        bom_explosion.load(boms)
+        phases['bom_ms'] = (time.perf_counter() - bom_started) * 1000
 
         pos_by_part = {}
         for po in purchase_orders:
@@ -84,11 +210,7 @@ class MRPService:
                     pos_by_part[part] = 0
                 pos_by_part[part] += open_qty
 
-        # 3. Initialize mutable "live" inventories for sequential allocation
-        live_fg_approved = {part.strip(): data.get('approved', 0) for part, data in fg_inventory_map.items()}
-        live_fg_qc = {part.strip(): data.get('pending_qc', 0) for part, data in fg_inventory_map.items()}
-
-        # 4. Sort Sales Orders by "Due to Ship" date to process them in priority order
+        # 3. Sort Sales Orders by "Due to Ship" date to process them in priority order
         max_date = datetime.max.date()
         def get_sort_date(so):
             due_date_str = so.get('Due to Ship')
@@ -100,203 +222,648 @@ class MRPService:
             return max_date
         sales_orders.sort(key=get_sort_date)
 
-        # 5. Initialize component inventory and allocation log
-        live_component_inventory = {
-            part.strip(): data.get('approved', 0) for part, data in component_inventory.items()
+        context = {
+            'component_inventory': component_inventory,
+            'fg_inventory_map': fg_inventory_map,
+            'pos_by_part': pos_by_part,
+            'jobs_by_so': jobs_by_so,
+            'capacities': capacities,
+            'progress': progress
+        }
+        phases['prepare_ms'] = (time.perf_counter() - started) * 1000 - phases['bom_ms']
+
+        # 4. Allocate inventory to each sales order sequentially
+        engine = (engine or Config.MRP_ENGINE).lower()
+        if engine in ('numpy', 'compare') and np is None:
+            print(f"MRP RUN: NumPy is not installed, using the python engine instead of {engine}")
+            engine = 'python'
+        print(f"MRP RUN: Sorted {len(sales_orders)} SO lines. Starting allocation ({engine} engine)...")
+
+        report('allocate', 0, len(sales_orders))
+        started = time.perf_counter()
+        if engine == 'python' and Config.MRP_INCREMENTAL:
+            mrp_results = self._allocate_incremental(sales_orders, context, reuse=not full)
+        else:
+            self._incremental_state = None
+            if engine == 'compare':
+                mrp_results = self._compare_engines(sales_orders, context)
+            elif engine == 'numpy':
+                mrp_results = self._allocate_vectorized(sales_orders, context)
+            else:
+                mrp_results = self._allocate(sales_orders, context)
+            self.last_run_counts = {'orders': len(sales_orders), 'recomputed': len(sales_orders)}
+        phases['allocate_ms'] = (time.perf_counter() - started) * 1000
+        print(f"MRP RUN: Allocation took {phases['allocate_ms']:.0f} ms")
+
+        # 5. Net the component needs against supply by date
+        if Config.MRP_TIME_PHASED:
+            report('time_phase')
+            started = time.perf_counter()
+            # Inputs without the dated POs count every open PO as available now
+            dated_purchase_orders = inputs.get('dated_purchase_orders', purchase_orders)
+            self.last_time_phased = self._time_phase(mrp_results, component_inventory, dated_purchase_orders)
+            phases['time_phase_ms'] = (time.perf_counter() - started) * 1000
+        else:
+            self.last_time_phased = None
+
+        mrp_results.sort(key=lambda r: r['sales_order']['SO'])
+        self.last_run_phases = phases
+        print("MRP RUN: Calculation complete.")
+        return mrp_results
+
+    @staticmethod
+    def _report_progress(context, done, total):
+        """Pass allocation progress to the run's callback every 250 orders"""
+        progress = context.get('progress')
+        if progress is not None and done % 250 == 0:
+            progress('allocate', done, total)
+
+    @staticmethod
+    def _live_fg_inventory(fg_inventory_map):
+        """Mutable copies of finished good stock that the allocation draws down"""
+        live_fg_approved = {part.strip(): data.get('approved', 0) for part, data in fg_inventory_map.items()}
+        live_fg_qc = {part.strip(): data.get('pending_qc', 0) for part, data in fg_inventory_map.items()}
+        return live_fg_approved, live_fg_qc
+
+    @staticmethod
+    def _live_component_inventory(component_inventory):
+        return {part.strip(): data.get('approved', 0) for part, data in component_inventory.items()}
+
+    def _net_finished_goods(self, so, context, live_fg_approved, live_fg_qc):
+        """
+        Fills a sales order from approved, then pending-QC finished good stock.
+        Returns (result, None) when no production is needed, otherwise
+        (None, state) with what is left to produce.
+        """
+        part_number = so['Part'].strip()
+        so_number = str(so['SO'])
+        ord_qty_curr_level = so.get('Ord Qty - Cur. Level', 0)
+
+        fg_inv_static = context['fg_inventory_map'].get(part_number, {'approved': 0, 'pending_qc': 0})
+        so['On Hand Qty Approved'] = fg_inv_static.get('approved', 0)
+        so['On Hand Qty Pending QC'] = fg_inv_static.get('pending_qc', 0)
+
+        is_job_created = False
+        job_details_for_so = None
+        bottleneck_text_for_job = None
+
+        jobs_by_so = context['jobs_by_so']
+        if so_number in jobs_by_so:
+            is_job_created = True
+            jobs = jobs_by_so[so_number]
+            job_details_for_so = jobs
+            if len(jobs) == 1:
+                job = jobs[0]
+                bottleneck_text_for_job = f"Job: {job['jo_jobnum']} ({job.get('completed_quantity', 0):,.0f}/{job.get('job_quantity', 0):,.0f})"
+            else:
+                job_numbers = ', '.join([str(j['jo_jobnum']) for j in jobs])
+                bottleneck_text_for_job = f"Jobs: {job_numbers}"
+
+        needed = ord_qty_curr_level
+
+        available_approved = live_fg_approved.get(part_number, 0)
+        fulfilled_from_approved = min(needed, available_approved)
+
+        if part_number in live_fg_approved:
+            live_fg_approved[part_number] -= fulfilled_from_approved
+
+        needed -= fulfilled_from_approved
+
+        so['Net Qty'] = needed if needed > 0 else 0
+
+        if needed <= 0:
+            return {
+                'sales_order': so, 'components': [], 'bottleneck': 'None',
+                'can_produce_qty': ord_qty_curr_level, 'status': 'ready-to-ship',
+                'shifts_required': 0, 'shippable_qty': fulfilled_from_approved, 'producible_qty': 0,
+                'material_status': 'ready-to-ship'
+            }, None
+
+        available_qc = live_fg_qc.get(part_number, 0)
+        if needed <= available_qc:
+            if part_number in live_fg_qc:
+                live_fg_qc[part_number] -= needed
+
+            status = 'pending-qc'
+            bottleneck_text = f"Pending QC Hold: {so['On Hand Qty Pending QC']:,.0f}"
+
+            return {
+                'sales_order': so, 'components': [], 'bottleneck': bottleneck_text,
+                'can_produce_qty': fulfilled_from_approved, 'status': status,
+                'shifts_required': 0, 'shippable_qty': fulfilled_from_approved, 'producible_qty': 0,
+                'material_status': 'pending-qc'
+            }, None
+
+        return None, {
+            'part_number': part_number,
+            'ord_qty': ord_qty_curr_level,
+            'fulfilled_from_approved': fulfilled_from_approved,
+            'net_production_qty': needed,
+            'is_job_created': is_job_created,
+            'job_details': job_details_for_so,
+            'bottleneck_text_for_job': bottleneck_text_for_job
         }
-        allocation_log = {}
 
-        print(f"MRP RUN: Sorted {len(sales_orders)} SO lines. Starting allocation...")
+    def _production_result(self, so, state, final_can_produce_qty, bottleneck_parts, has_bom,
+                           component_details, capacities):
+        """Status, bottleneck text and shifts for an order that needs production"""
+        net_production_qty = state['net_production_qty']
+        fulfilled_from_approved = state['fulfilled_from_approved']
+
+        if not has_bom:
+            final_can_produce_qty = 0
+            bottleneck = "No BOM Found"
+            prod_status = 'critical'
+        elif final_can_produce_qty >= net_production_qty:
+            prod_status = 'ok'
+            bottleneck = "Full Production Ready - Create job now"
+        else:
+            prod_status = 'partial' if final_can_produce_qty > 0 else 'critical'
+            bottleneck = "Material Shortage"
+
+        if fulfilled_from_approved > 0:
+            prod_status = 'partial-ship'
+
+        if 'No BOM Found' not in bottleneck:
+            if prod_status == 'partial':
+                producible_formatted = f"{final_can_produce_qty:,.0f}"
+                bottleneck = f"Partial Production Ready - Producible: {producible_formatted} - {', '.join(bottleneck_parts)}"
+            elif prod_status == 'critical':
+                bottleneck = f"Critical Shortage - {', '.join(bottleneck_parts)}"
+
+        if state['is_job_created']:
+            bottleneck_text_for_job = state['bottleneck_text_for_job']
+            bottleneck = f"{bottleneck_text_for_job} - {', '.join(bottleneck_parts)}" if bottleneck_parts else bottleneck_text_for_job
+
+        if prod_status == 'partial-ship':
+             bottleneck = f"Partial Ship: {fulfilled_from_approved:,.0f} / Prod. Needed: {net_production_qty:,.0f} / Producible: {final_can_produce_qty:,.0f}"
+
+        final_status = 'job-created' if state['is_job_created'] else prod_status
+
+        so_result = {
+            'sales_order': so,
+            'components': component_details,
+            'bottleneck': bottleneck,
+            'bottleneck_parts': bottleneck_parts,
+            'can_produce_qty': fulfilled_from_approved + final_can_produce_qty,
+            'shifts_required': 0,
+            'status': final_status,
+            'material_status': prod_status,
+            'job_details': state['job_details'],
+            'shippable_qty': fulfilled_from_approved,
+            'producible_qty': final_can_produce_qty
+        }
 
-        # 6. Process each sales order sequentially
+        if capacities:
+            line_capacity = next(iter(capacities.values()), 0)
+            if line_capacity > 0:
+                so_result['shifts_required'] = (net_production_qty / line_capacity) if line_capacity > 0 else 0
+
+        return so_result
+
+    def _new_live_state(self, context):
+        """Stock the allocation draws down, plus the pegging of what each order was given"""
+        live_fg_approved, live_fg_qc = self._live_fg_inventory(context['fg_inventory_map'])
+        return {
+            'fg_approved': live_fg_approved,
+            'fg_qc': live_fg_qc,
+            'components': self._live_component_inventory(context['component_inventory']),
+            'log': AllocationLog()
+        }
+
+    def _allocate(self, sales_orders, context):
+        """Reference allocation engine: plain Python over dicts, one order at a time"""
+        live = self._new_live_state(context)
         mrp_results = []
+        for index, so in enumerate(sales_orders):
+            self._report_progress(context, index, len(sales_orders))
+            mrp_results.append(self._allocate_order(so, context, live))
+        return mrp_results
+
+    def _allocate_order(self, so, context, live):
+        """Allocate one sales order against the live stock in `live`, drawing it down"""
+        component_inventory = context['component_inventory']
+        pos_by_part = context['pos_by_part']
+        live_component_inventory = live['components']
+        allocation_log = live['log']
+
+        result, state = self._net_finished_goods(so, context, live['fg_approved'], live['fg_qc'])
+        if result is not None:
+            return result
+
+        net_production_qty = state['net_production_qty']
+        ord_qty_curr_level = state['ord_qty']
+
+        final_can_produce_qty = float('inf')
+        bom_components = bom_explosion.requirements(state['part_number'])
+        # A BOM whose rows all have zero quantity still counts as a BOM (needing nothing)
+        has_bom = bom_explosion.has_bom(state['part_number'])
+        bottleneck_parts = []
+
+        if has_bom:
+            component_build_calcs = []
+            for comp_part_num, qty_per_unit, _ in bom_components:
+                initial_inv = component_inventory.get(comp_part_num, {'approved': 0, 'pending_qc': 0})
+                inventory_before_this_so = live_component_inventory.get(comp_part_num, 0)
+                pending_qc_qty = initial_inv.get('pending_qc', 0)
+                available_for_build = inventory_before_this_so + pending_qc_qty
+                max_build_for_comp = available_for_build / qty_per_unit
+
+                component_build_calcs.append({'part': comp_part_num, 'max_build': max_build_for_comp})
+                final_can_produce_qty = min(final_can_produce_qty, max_build_for_comp)
+
+            final_can_produce_qty = min(final_can_produce_qty, net_production_qty)
+
+            for calc in component_build_calcs:
+                if calc['max_build'] < net_production_qty:
+                    bottleneck_parts.append(calc['part'])
+
+        component_details = []
+        for comp_part_num, qty_per_unit, description in bom_components:
+            initial_inv = component_inventory.get(comp_part_num, {'approved': 0, 'pending_qc': 0})
+            inventory_before_this_so = live_component_inventory.get(comp_part_num, 0)
+            open_po_qty = pos_by_part.get(comp_part_num, 0)
+
+            required_for_constrained_build = final_can_produce_qty * qty_per_unit
+            allocated_for_this_so = min(inventory_before_this_so, required_for_constrained_build)
+            if comp_part_num in live_component_inventory:
+                live_component_inventory[comp_part_num] -= allocated_for_this_so
+
+            if allocated_for_this_so > 0:
+                allocation_log.add(comp_part_num, so['SO'], allocated_for_this_so)
+
+            total_original_need = net_production_qty * qty_per_unit
+            available_for_allocation_with_po = inventory_before_this_so + initial_inv.get('pending_qc', 0) + open_po_qty
+            shortfall = max(0, total_original_need - available_for_allocation_with_po)
+
+            component_details.append({
+                'part_number': comp_part_num, 'description': description,
+                'allocated_to_prior_sos': allocation_log.allocated_to_others(comp_part_num, so['SO']),
+                'pegging_position': allocation_log.position(comp_part_num),
+                'total_required': ord_qty_curr_level * qty_per_unit,
+                'on_hand_initial': initial_inv['approved'], 'inventory_before_this_so': inventory_before_this_so,
+                'allocated_for_this_so': allocated_for_this_so, 'open_po_qty': open_po_qty,
+                'shortfall': shortfall
+            })
+
+        return self._production_result(
+            so, state, final_can_produce_qty, bottleneck_parts, has_bom,
+            component_details, context['capacities']
+        )
+
+    def _allocate_incremental(self, sales_orders, context, reuse=True):
+        """
+        Python engine that reuses the previous run. Orders are replayed in
+        priority order; an order is allocated again only when it is new, its
+        row, exploded BOM or jobs changed, it moved in the priority order, or
+        it draws on stock that something earlier changed - an inventory or PO
+        change for that part, or a recomputed order that took a different
+        amount of it. Every other order keeps its previous result and only its
+        recorded draw-down is reapplied. Falls back to a full run when there is
+        no previous run, `reuse` is off, or the capacities or BOM mode changed.
+        """
+        settings = (context['capacities'], bom_explosion.multi_level)
+        previous = self._incremental_state if reuse else None
+        if previous is not None and previous['settings'] != settings:
+            previous = None
+        previous_orders = previous['orders'] if previous else {}
+
+        live = self._new_live_state(context)
+        resource_signatures = self._resource_signatures(context, live)
+        occurrences = {}
+        orders = []
         for so in sales_orders:
-            part_number = so['Part'].strip()
-            so_number = str(so['SO']) 
-            ord_qty_curr_level = so.get('Ord Qty - Cur. Level', 0)
+            key = (str(so['SO']), so['Part'].strip())
+            occurrences[key] = occurrences.get(key, 0) + 1
+            key += (occurrences[key],)
+            orders.append((key, so, self._order_signature(so, context)))
+
+        # Stock whose starting position changed: inventory/PO edits, orders that
+        # are gone, and orders now processed in a different relative order
+        dirty = set()
+        current_resources = {}
+        if previous:
+            for resource, signature in previous['resources'].items():
+                current_resources[resource] = resource_signatures(resource)
+                if current_resources[resource] != signature:
+                    dirty.add(resource)
+            current_keys = {key for key, _, _ in orders}
+            for key, record in previous_orders.items():
+                if key not in current_keys:
+                    dirty.update(record['touched'])
+        kept = [key for key, _, _ in orders if key in previous_orders]
+        moved = set(kept) - self._in_previous_order(kept, previous_orders)
+        for key in moved:
+            dirty.update(previous_orders[key]['touched'])
 
-            fg_inv_static = fg_inventory_map.get(part_number, {'approved': 0, 'pending_qc': 0})
-            so['On Hand Qty Approved'] = fg_inv_static.get('approved', 0)
-            so['On Hand Qty Pending QC'] = fg_inv_static.get('pending_qc', 0)
-            
-            is_job_created = False
-            job_details_for_so = None
-            bottleneck_text_for_job = None
-            
-            if so_number in jobs_by_so:
-                is_job_created = True
-                jobs = jobs_by_so[so_number]
-                job_details_for_so = jobs
-                if len(jobs) == 1:
-                    job = jobs[0]
-                    bottleneck_text_for_job = f"Job: {job['jo_jobnum']} ({job.get('completed_quantity', 0):,.0f}/{job.get('job_quantity', 0):,.0f})"
-                else:
-                    job_numbers = ', '.join([str(j['jo_jobnum']) for j in jobs])
-                    bottleneck_text_for_job = f"Jobs: {job_numbers}"
-
-            needed = ord_qty_curr_level
-            
-            available_approved = live_fg_approved.get(part_number, 0)
-            fulfilled_from_approved = min(needed, available_approved)
-            
-            if part_number in live_fg_approved:
-                live_fg_approved[part_number] -= fulfilled_from_approved
-            
-            needed -= fulfilled_from_approved
+        mrp_results = []
+        records = {}
+        recomputed = 0
+        for index, (key, so, signature) in enumerate(orders):
+            self._report_progress(context, index, len(orders))
+            record = previous_orders.get(key)
+            if (record is None or key in moved or record['signature'] != signature
+                    or not dirty.isdisjoint(record['touched'])):
+                result = self._allocate_order(so, context, live)
+                touched, consumption = self._consumption(result)
+                recomputed += 1
+                if record is None:
+                    dirty.update(touched)
+                elif consumption != record['consumption']:
+                    dirty.update(touched | record['touched'])
+            else:
+                result, touched, consumption = record['result'], record['touched'], record['consumption']
+                for annotation in ('On Hand Qty Approved', 'On Hand Qty Pending QC', 'Net Qty'):
+                    so[annotation] = result['sales_order'][annotation]
+                result = dict(result, sales_order=so)
+                self._replay(so, consumption, live)
+            records[key] = {'index': index, 'signature': signature, 'touched': touched,
+                            'consumption': consumption, 'result': result}
+            mrp_results.append(result)
+
+        self._incremental_state = {
+            'settings': settings,
+            'resources': {resource: current_resources[resource] if resource in current_resources
+                          else resource_signatures(resource)
+                          for record in records.values() for resource in record['touched']},
+            'orders': records
+        }
+        self.last_run_counts = {'orders': len(orders), 'recomputed': recomputed}
+        print(f"MRP RUN: Incremental allocation recomputed {recomputed} of {len(orders)} orders"
+              + ("" if previous else " (full run)"))
+        return mrp_results
 
-            so['Net Qty'] = needed if needed > 0 else 0
+    @staticmethod
+    def _in_previous_order(keys, previous_orders):
+        """
+        Largest set of `keys` still in the same relative order as in the previous
+        run (longest increasing subsequence of their old positions); the other
+        keys are the orders that moved.
+        """
+        tail_indexes = []  # smallest old index ending an in-order run of length n + 1
+        tails = []  # position in `keys` of that run's last key
+        parents = []
+        for position, key in enumerate(keys):
+            old_index = previous_orders[key]['index']
+            length = bisect.bisect_left(tail_indexes, old_index)
+            parents.append(tails[length - 1] if length else None)
+            if length == len(tails):
+                tail_indexes.append(old_index)
+                tails.append(position)
+            else:
+                tail_indexes[length] = old_index
+                tails[length] = position
+        in_order = set()
+        position = tails[-1] if tails else None
+        while position is not None:
+            in_order.add(keys[position])
+            position = parents[position]
+        return in_order
+
+    @staticmethod
+    def _order_signature(so, context):
+        """Everything about an order that its own allocation depends on, taken before it is annotated"""
+        part_number = so['Part'].strip()
+        return (tuple(so.items()), bom_explosion.has_bom(part_number), bom_explosion.requirements(part_number),
+                context['jobs_by_so'].get(str(so['SO'])))
+
+    @staticmethod
+    def _resource_signatures(context, live):
+        """Maps ('fg', part) or ('comp', part) to the starting stock and POs behind it"""
+        fg_inventory_map = context['fg_inventory_map']
+        component_inventory = context['component_inventory']
+        pos_by_part = context['pos_by_part']
+        initial_components = dict(live['components'])
+
+        def signature(resource):
+            kind, part = resource
+            if kind == 'fg':
+                return fg_inventory_map.get(part)
+            return initial_components.get(part), component_inventory.get(part), pos_by_part.get(part)
+        return signature
+
+    @staticmethod
+    def _consumption(result):
+        """
+        The stock an order result took, in allocation order, and the set of
+        stock it read: [('fg', part, approved, pending_qc), ('comp', part,
+        allocated), ...].
+        """
+        part_number = result['sales_order']['Part'].strip()
+        qc_used = result['sales_order']['Net Qty'] if result['material_status'] == 'pending-qc' else 0
+        consumption = [('fg', part_number, result['shippable_qty'], qc_used)]
+        consumption.extend(
+            ('comp', component['part_number'], component['allocated_for_this_so'])
+            for component in result['components']
+        )
+        return {(entry[0], entry[1]) for entry in consumption}, consumption
+
+    @staticmethod
+    def _replay(so, consumption, live):
+        """Draw down `live` by a reused result exactly as `_allocate_order` did"""
+        for entry in consumption:
+            part = entry[1]
+            if entry[0] == 'fg':
+                if entry[2] and part in live['fg_approved']:
+                    live['fg_approved'][part] -= entry[2]
+                if entry[3] and part in live['fg_qc']:
+                    live['fg_qc'][part] -= entry[3]
+                continue
+            allocated = entry[2]
+            if not allocated:
+                continue
+            if part in live['components']:
+                live['components'][part] -= allocated
+            if allocated > 0:
+                live['log'].add(part, so['SO'], allocated)
 
-            if needed <= 0:
-                mrp_results.append({
-                    'sales_order': so, 'components': [], 'bottleneck': 'None', 
-                    'can_produce_qty': ord_qty_curr_level, 'status': 'ready-to-ship', 
-                    'shifts_required': 0, 'shippable_qty': fulfilled_from_approved, 'producible_qty': 0,
-                    'material_status': 'ready-to-ship'
-                })
+    def _allocate_vectorized(self, sales_orders, context):
+        """
+        Same allocation as `_allocate`, with the component arithmetic on NumPy
+        arrays. Each order's exploded BOM is one row of a sparse order x
+        component matrix in CSR form (row offsets, component columns, per-unit
+        quantities) and component stock is a dense vector, so the build limit
+        and draw-down for an order are a handful of array operations over its
+        row. Shortfalls and requirements for all rows are computed in one pass
+        after the sequential allocation.
+        """
+        component_inventory = context['component_inventory']
+        pos_by_part = context['pos_by_part']
+        live_fg_approved, live_fg_qc = self._live_fg_inventory(context['fg_inventory_map'])
+        live_by_part = self._live_component_inventory(component_inventory)
+
+        # Encode every component that appears in an order's BOM as a column
+        columns = {}
+        indptr = [0]
+        entry_columns = []
+        entry_qty = []
+        entry_descriptions = []
+        repeated_parts = []  # Rows naming one part twice must draw it down in sequence
+        has_bom = []  # A row can be empty for a BOM whose quantities are all zero
+        for so in sales_orders:
+            bom_components = bom_explosion.requirements(so['Part'].strip())
+            has_bom.append(bom_explosion.has_bom(so['Part'].strip()))
+            for part, qty_per_unit, description in bom_components:
+                entry_columns.append(columns.setdefault(part, len(columns)))
+                entry_qty.append(qty_per_unit)
+                entry_descriptions.append(description)
+            indptr.append(len(entry_columns))
+            repeated_parts.append(len({part for part, _, _ in bom_components}) != len(bom_components))
+
+        parts = list(columns)
+        initial = [component_inventory.get(part, {'approved': 0, 'pending_qc': 0}) for part in parts]
+        live = np.array([live_by_part.get(part, 0) for part in parts], dtype=float)
+        pending = np.array([inv.get('pending_qc', 0) for inv in initial], dtype=float)
+        open_po = np.array([pos_by_part.get(part, 0) for part in parts], dtype=float)
+        col = np.array(entry_columns, dtype=np.intp)
+        qty = np.array(entry_qty, dtype=float)
+
+        inventory_before = np.zeros(len(col))
+        allocated = np.zeros(len(col))
+        net_qty = np.zeros(len(sales_orders))
+        ord_qty = np.zeros(len(sales_orders))
+        produced = []  # (row, component list) for orders that went to production with a BOM
+
+        mrp_results = []
+        for row, so in enumerate(sales_orders):
+            self._report_progress(context, row, len(sales_orders))
+            result, state = self._net_finished_goods(so, context, live_fg_approved, live_fg_qc)
+            if result is not None:
+                mrp_results.append(result)
                 continue
 
-            available_qc = live_fg_qc.get(part_number, 0)
-            if needed <= available_qc:
-                if part_number in live_fg_qc:
-                    live_fg_qc[part_number] -= needed
-                
-                status = 'pending-qc'
-                bottleneck_text = f"Pending QC Hold: {so['On Hand Qty Pending QC']:,.0f}"
-
-                mrp_results.append({
-                    'sales_order': so, 'components': [], 'bottleneck': bottleneck_text, 
-                    'can_produce_qty': fulfilled_from_approved, 'status': status, 
-                    'shifts_required': 0, 'shippable_qty': fulfilled_from_approved, 'producible_qty': 0,
-                    'material_status': 'pending-qc'
-                })
+            net_production_qty = state['net_production_qty']
+            start, end = indptr[row], indptr[row + 1]
+            if not has_bom[row]:
+                mrp_results.append(self._production_result(
+                    so, state, 0, [], False, [], context['capacities']
+                ))
                 continue
 
-            net_production_qty = needed
-            
-            final_can_produce_qty = float('inf')
-            bom_components = boms_by_parent.get(part_number, [])
-            bottleneck_parts = []
-            
-            if not bom_components:
-                final_can_produce_qty = 0
-                bottleneck = "No BOM Found"
-                prod_status = 'critical'
+            idx = col[start:end]
+            per_unit = qty[start:end]
+            before = live[idx]
+            max_build = (before + pending[idx]) / per_unit
+            final_can_produce_qty = min(float(max_build.min(initial=np.inf)), net_production_qty)
+            bottleneck_parts = [parts[c] for c in idx[max_build < net_production_qty].tolist()]
+
+            if repeated_parts[row]:
+                for k in range(start, end):
+                    c = col[k]
+                    inventory_before[k] = live[c]
+                    allocated[k] = min(live[c], final_can_produce_qty * qty[k])
+                    live[c] -= allocated[k]
             else:
-                component_build_calcs = []
-                for component in bom_components:
-                    comp_part_num = component['Part Number'].strip()
-                    qty_per_unit = component['Quantity'] * (1 + (component.get('Scrap %', 0) / 100))
-                    if qty_per_unit <= 0: continue
-
-                    initial_inv = component_inventory.get(comp_part_num, {'approved': 0, 'pending_qc': 0})
-                    inventory_before_this_so = live_component_inventory.get(comp_part_num, 0)
-                    pending_qc_qty = initial_inv.get('pending_qc', 0)
-                    available_for_build = inventory_before_this_so + pending_qc_qty
-                    max_build_for_comp = available_for_build / qty_per_unit
-                    
-                    component_build_calcs.append({'part': comp_part_num, 'max_build': max_build_for_comp})
-                    final_can_produce_qty = min(final_can_produce_qty, max_build_for_comp)
-
-                final_can_produce_qty = min(final_can_produce_qty, net_production_qty)
-
-                for calc in component_build_calcs:
-                    if calc['max_build'] < net_production_qty:
-                        bottleneck_parts.append(calc['part'])
-
-                if final_can_produce_qty >= net_production_qty:
-                    prod_status = 'ok'
-                    bottleneck = "Full Production Ready - Create job now"
-                else:
-                    prod_status = 'partial' if final_can_produce_qty > 0 else 'critical'
-                    bottleneck = "Material Shortage"
-
-            if fulfilled_from_approved > 0:
-                prod_status = 'partial-ship'
-
-            component_details = []
-            if bom_components:
-                for component in bom_components:
-                    comp_part_num = component['Part Number'].strip()
-                    qty_per_unit = component['Quantity'] * (1 + (component.get('Scrap %', 0) / 100))
-                    if qty_per_unit <= 0: continue
-                    
-                    initial_inv = component_inventory.get(comp_part_num, {'approved': 0, 'pending_qc': 0})
-                    inventory_before_this_so = live_component_inventory.get(comp_part_num, 0)
-                    open_po_qty = pos_by_part.get(comp_part_num, 0)
-
-                    required_for_constrained_build = final_can_produce_qty * qty_per_unit
-                    allocated_for_this_so = min(inventory_before_this_so, required_for_constrained_build)
-                    if comp_part_num in live_component_inventory:
-                        live_component_inventory[comp_part_num] -= allocated_for_this_so
-
-                    if comp_part_num not in allocation_log:
-                        allocation_log[comp_part_num] = []
-                    if allocated_for_this_so > 0:
-                        allocation_log[comp_part_num].append({ 'so': so['SO'], 'allocated': allocated_for_this_so })
-
-                    total_original_need = net_production_qty * qty_per_unit
-                    available_for_allocation_with_po = inventory_before_this_so + initial_inv.get('pending_qc', 0) + open_po_qty
-                    shortfall = max(0, total_original_need - available_for_allocation_with_po)
-
-                    shared_with_so_details = []
-                    total_allocated_to_others = 0
-                    if comp_part_num in allocation_log:
-                        for allocation in allocation_log[comp_part_num]:
-                            if allocation['so'] != so['SO']:
-                                total_allocated_to_others += allocation['allocated']
-                        if total_allocated_to_others > 0:
-                            shared_with_so_details.insert(0, f"Total Allocated to Prior SOs: {total_allocated_to_others:,.2f}")
-                            for allocation in allocation_log[comp_part_num]:
-                                if allocation['so'] != so['SO']:
-                                    shared_with_so_details.append(f"  - SO {allocation['so']}: {allocation['allocated']:,.2f}")
-
-                    component_details.append({
-                        'part_number': comp_part_num, 'description': component['Description'],
-                        'shared_with_so': shared_with_so_details, 'total_required': ord_qty_curr_level * qty_per_unit,
-                        'on_hand_initial': initial_inv['approved'], 'inventory_before_this_so': inventory_before_this_so,
-                        'allocated_for_this_so': allocated_for_this_so, 'open_po_qty': open_po_qty,
-                        'shortfall': shortfall
-                    })
-            
-            if 'No BOM Found' not in bottleneck:
-                if prod_status == 'partial':
-                    producible_formatted = f"{final_can_produce_qty:,.0f}"
-                    bottleneck = f"Partial Production Ready - Producible: {producible_formatted} - {', '.join(bottleneck_parts)}"
-                elif prod_status == 'critical':
-                    bottleneck = f"Critical Shortage - {', '.join(bottleneck_parts)}"
-
-            if is_job_created:
-                bottleneck = f"{bottleneck_text_for_job} - {', '.join(bottleneck_parts)}" if bottleneck_parts else bottleneck_text_for_job
-            
-            if prod_status == 'partial-ship':
-                 bottleneck = f"Partial Ship: {fulfilled_from_approved:,.0f} / Prod. Needed: {net_production_qty:,.0f} / Producible: {final_can_produce_qty:,.0f}"
-
-            final_status = 'job-created' if is_job_created else prod_status
-
-            so_result = {
-                'sales_order': so, 
-                'components': component_details, 
-                'bottleneck': bottleneck,
-                'bottleneck_parts': bottleneck_parts,
-                'can_produce_qty': fulfilled_from_approved + final_can_produce_qty,
-                'shifts_required': 0, 
-                'status': final_status,
-                'material_status': prod_status,
-                'job_details': job_details_for_so,
-                'shippable_qty': fulfilled_from_approved,
-                'producible_qty': final_can_produce_qty
-            }
+                draw = np.minimum(before, final_can_produce_qty * per_unit)
+                inventory_before[start:end] = before
+                allocated[start:end] = draw
+                live[idx] -= draw
+
+            net_qty[row] = net_production_qty
+            ord_qty[row] = state['ord_qty']
+            result = self._production_result(
+                so, state, final_can_produce_qty, bottleneck_parts, True, [], context['capacities']
+            )
+            produced.append((row, result['components']))
+            mrp_results.append(result)
+
+        # Component details for every produced order at once
+        counts = np.diff(np.array(indptr, dtype=np.intp))
+        shortfall = np.maximum(
+            0, np.repeat(net_qty, counts) * qty - (inventory_before + pending[col] + open_po[col])
+        ).tolist()
+        total_required = (np.repeat(ord_qty, counts) * qty).tolist()
+        inventory_before = inventory_before.tolist()
+        allocated = allocated.tolist()
+
+        allocation_log = AllocationLog()
+        for row, component_details in produced:
+            so_number = sales_orders[row]['SO']
+            for k in range(indptr[row], indptr[row + 1]):
+                part = parts[entry_columns[k]]
+                if allocated[k] > 0:
+                    allocation_log.add(part, so_number, allocated[k])
+                component_details.append({
+                    'part_number': part, 'description': entry_descriptions[k],
+                    'allocated_to_prior_sos': allocation_log.allocated_to_others(part, so_number),
+                    'pegging_position': allocation_log.position(part),
+                    'total_required': total_required[k],
+                    'on_hand_initial': initial[entry_columns[k]]['approved'],
+                    'inventory_before_this_so': inventory_before[k],
+                    'allocated_for_this_so': allocated[k], 'open_po_qty': pos_by_part.get(part, 0),
+                    'shortfall': shortfall[k]
+                })
 
-            if capacities:
-                line_capacity = next(iter(capacities.values()), 0)
-                if line_capacity > 0:
-                    so_result['shifts_required'] = (net_production_qty / line_capacity) if line_capacity > 0 else 0
+        return mrp_results
 
-            mrp_results.append(so_result)
+    @staticmethod
+    def _time_phase(mrp_results, component_inventory, purchase_orders):
+        """
+        Time-phased netting over results in allocation (priority) order. Each
+        production order's component need goes in the bucket of its ship date
+        and is netted against stock plus the PO quantity promised by then, after
+        the needs of earlier orders. Component rows get
+        'available_by_ship_date' and 'shortfall_by_ship_date'; each result lists
+        the parts short on its ship date in 'short_on_ship_date'.
+        """
+        plan = TimePhasedPlan(Config.MRP_TIME_BUCKET)
+        for part, inventory in component_inventory.items():
+            plan.add_supply(part.strip(), (inventory.get('approved') or 0) + (inventory.get('pending_qc') or 0))
+        for po in purchase_orders:
+            open_qty = po.get('OpenPOQuantity') or 0
+            if open_qty > 0:
+                plan.add_supply(po['Part Number'].strip(), open_qty, po.get('Promise Date'))
+        plan.build()
 
-        mrp_results.sort(key=lambda r: r['sales_order']['SO'])
-        print("MRP RUN: Calculation complete.")
-        return mrp_results
+        for result in mrp_results:
+            result['short_on_ship_date'] = []
+            if not result['components']:
+                continue
+            so = result['sales_order']
+            bucket = plan.bucket_of_text(so.get('Due to Ship')) or plan.UNDATED
+            net_production_qty = so.get('Net Qty', 0)
+            components = []
+            requirements = bom_explosion.requirements(so['Part'].strip())
+            for (part, qty_per_unit, _), component in zip(requirements, result['components']):
+                available, shortfall = plan.net(part, bucket, net_production_qty * qty_per_unit)
+                # New rows: a reused incremental result shares its rows with the previous run
+                components.append(dict(component, available_by_ship_date=available,
+                                       shortfall_by_ship_date=shortfall))
+                if shortfall > 0:
+                    result['short_on_ship_date'].append(part)
+            result['components'] = components
+        return plan
+
+    def _compare_engines(self, sales_orders, context):
+        """
+        Runs both allocation engines on copies of the orders, logs their timings
+        and any order whose result differs, and returns the python engine's
+        results. The outcome is kept in `last_engine_comparison`.
+        """
+        timings = {}
+        results = {}
+        for name, allocate in (('python', self._allocate), ('numpy', self._allocate_vectorized)):
+            orders = [dict(so) for so in sales_orders]
+            started = time.perf_counter()
+            results[name] = allocate(orders, context)
+            timings[name] = (time.perf_counter() - started) * 1000
+
+        mismatches = [
+            expected['sales_order']['SO']
+            for expected, actual in zip(results['python'], results['numpy'])
+            if expected != actual
+        ]
+        if len(results['python']) != len(results['numpy']):
+            mismatches.append('result count')
+
+        self.last_engine_comparison = {
+            'python_ms': timings['python'], 'numpy_ms': timings['numpy'],
+            'orders': len(sales_orders), 'mismatches': mismatches, 'compared_at': datetime.now()
+        }
+        print(f"MRP RUN: python engine {timings['python']:.0f} ms, numpy engine {timings['numpy']:.0f} ms, "
+              + (f"{len(mismatches)} orders differ (first: {', '.join(map(str, mismatches[:5]))})"
+                 if mismatches else "results identical"))
+        return results['python']
 
     def get_customer_summary(self, customer_orders):
         """
@@ -0,0 +1,110 @@
+"""
+Time-phased MRP netting
+Places component supply and demand in day or week buckets: stock on hand and
+past-due or undated PO lines in the current bucket, open PO lines in the bucket
+of their promise date, and each production order's component need in the
+bucket of its ship date. Per part, receipts are kept as compact parallel arrays
+of bucket keys and cumulative quantities, so the supply promised by an order's
+ship date is a binary search instead of a scan of the PO lines, and the
+projected available balance per bucket falls out of the same arrays.
+"""
+
+import bisect
+from datetime import date, datetime, timedelta
+
+
+class TimePhasedPlan:
+    """Per-part supply and demand by bucket, netted in MRP priority order"""
+
+    UNDATED = date.max.toordinal()  # Bucket for orders without a usable ship date
+
+    def __init__(self, bucket='day', today=None):
+        self.bucket = 'week' if str(bucket).lower() == 'week' else 'day'
+        self.today = today or date.today()
+        self._current = self.bucket_of(self.today)
+        self._receipts = {}  # part -> {bucket: quantity}, until build()
+        self._keys = {}  # part -> sorted bucket keys with a receipt
+        self._quantities = {}  # part -> receipts in each of those buckets
+        self._cumulative = {}  # part -> cumulative receipts through each of those keys
+        self._demand = {}  # part -> [(bucket, quantity)] in priority order
+        self._demand_total = {}  # part -> demand netted so far
+
+    def bucket_of(self, day):
+        """Bucket key (an ordinal day) for a date; weeks start on Monday"""
+        if day is None:
+            return self.UNDATED
+        if self.bucket == 'week':
+            day = day - timedelta(days=day.weekday())
+        return day.toordinal()
+
+    def bucket_of_text(self, text):
+        """Bucket for an mm/dd/yyyy ERP date; dates in the past fall in the current bucket"""
+        try:
+            day = datetime.strptime(text, '%m/%d/%Y').date()
+        except (ValueError, TypeError):
+            return None
+        return max(self.bucket_of(day), self._current)
+
+    def add_supply(self, part, quantity, due=None):
+        """Stock or a PO receipt; `due` is an mm/dd/yyyy date, None means available now"""
+        if not quantity:
+            return
+        bucket = (self.bucket_of_text(due) if due else None) or self._current
+        receipts = self._receipts.setdefault(part, {})
+        receipts[bucket] = receipts.get(bucket, 0) + quantity
+
+    def build(self):
+        """Freeze the receipts into per-part sorted keys and running totals"""
+        for part, receipts in self._receipts.items():
+            keys = sorted(receipts)
+            cumulative = []
+            total = 0
+            for key in keys:
+                total += receipts[key]
+                cumulative.append(total)
+            self._keys[part] = keys
+            self._quantities[part] = [receipts[key] for key in keys]
+            self._cumulative[part] = cumulative
+        self._receipts = {}
+
+    def supply_through(self, part, bucket):
+        """All supply of `part` available by the end of `bucket`"""
+        keys = self._keys.get(part)
+        if not keys:
+            return 0
+        index = bisect.bisect_right(keys, bucket)
+        return self._cumulative[part][index - 1] if index else 0
+
+    def net(self, part, bucket, quantity):
+        """
+        Add one order's need for `part` in `bucket`, in priority order, and
+        return (supply by that bucket, shortfall on that date). Earlier orders'
+        needs come first, including any they could not cover yet, so a late
+        receipt goes to the order that has been waiting for it.
+        """
+        total = self._demand_total.get(part, 0) + quantity
+        self._demand_total[part] = total
+        self._demand.setdefault(part, []).append((bucket, quantity))
+        supply = self.supply_through(part, bucket)
+        return supply, min(quantity, max(0, total - supply))
+
+    def projection(self, part):
+        """
+        Projected available balance of `part` per bucket with activity:
+        [{'bucket': date, 'receipts', 'demand', 'balance'}], undated demand last.
+        """
+        receipts = dict(zip(self._keys.get(part, ()), self._quantities.get(part, ())))
+        demand = {}
+        for bucket, quantity in self._demand.get(part, ()):
+            demand[bucket] = demand.get(bucket, 0) + quantity
+        rows = []
+        balance = 0
+        for bucket in sorted(set(receipts) | set(demand)):
+            balance += receipts.get(bucket, 0) - demand.get(bucket, 0)
+            rows.append({
+                'bucket': None if bucket == self.UNDATED else date.fromordinal(bucket),
+                'receipts': receipts.get(bucket, 0),
+                'demand': demand.get(bucket, 0),
+                'balance': balance
+            })
+        return rows
@@ -0,0 +1,134 @@
+"""
+In-memory index of open ERP production jobs
+Loads every open 'a' job once, keyed by (facility, line), and refreshes it in
+the background so the downtime job picker is answered without an ERP query
+per line selection.
+"""
+
+import threading
+import time
+import traceback
+from datetime import datetime
+from config import Config
+from .erp_connection import get_erp_service
+
+
+def _index_key(facility, line):
+    """Match the ERP lookup: case-insensitive facility, trimmed case-insensitive line"""
+    return ((facility or '').strip().upper(), (line or '').strip().upper())
+
+
+class OpenJobsIndex:
+    """Open jobs grouped by (facility, line), rebuilt from one ERP query"""
+
+    def __init__(self):
+        self.erp = get_erp_service()
+        self._jobs = {}  # (FACILITY, LINE) -> list of job dicts
+        self._refreshed = None  # monotonic time of the last successful load
+        self.refreshed_at = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False  # A background reload started by lookup() is running
+        self._thread = None
+
+    @property
+    def loaded(self):
+        return self._refreshed is not None
+
+    @property
+    def age_seconds(self):
+        if self._refreshed is None:
+            return None
+        return time.monotonic() - self._refreshed
+
+    def refresh(self):
+        """Reload every open job from the ERP; returns True on success"""
+        requested = time.monotonic()
+        with self._refresh_lock:
+            if self._refreshed is not None and self._refreshed >= requested:
+                # Another thread reloaded while we waited for the lock
+                return True
+            started = time.perf_counter()
+            try:
+                rows = self.erp.get_all_open_jobs_by_line()
+            except Exception as e:
+                # Keep answering from the previous index
+                self.last_error = str(e)
+                print(f"❌ [OPEN_JOBS] Index refresh failed: {e}")
+                traceback.print_exc()
+                return False
+
+            jobs = {}
+            for row in rows:
+                jobs.setdefault(_index_key(row['Facility'], row['ProductionLine']), []).append(row)
+            with self._lock:
+                self._jobs = jobs
+                self._refreshed = time.monotonic()
+                self.refreshed_at = datetime.now()
+            self.last_error = None
+            print(f"✅ [OPEN_JOBS] Indexed {len(rows)} jobs on {len(jobs)} lines "
+                  f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+            return True
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()  # Failures are logged and the old index kept
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name='open-jobs-refresh', daemon=True).start()
+
+    def lookup(self, facility, line, force_refresh=False):
+        """
+        Open jobs for one facility/line. Loads the index first if it is empty or
+        a refresh was asked for (at most once per OPEN_JOBS_MIN_REFRESH
+        seconds); past OPEN_JOBS_INDEX_MAX_AGE the stale index is answered while
+        one background reload runs. Returns None if it never loaded.
+        """
+        age = self.age_seconds
+        if age is None or (force_refresh and age > Config.OPEN_JOBS_MIN_REFRESH):
+            self.refresh()
+        elif age > Config.OPEN_JOBS_INDEX_MAX_AGE:
+            self._refresh_in_background()
+        if not self.loaded:
+            return None
+        with self._lock:
+            jobs = self._jobs.get(_index_key(facility, line), [])
+        # Callers may annotate the rows
+        return [dict(job) for job in jobs]
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(Config.OPEN_JOBS_INDEX_INTERVAL)
+
+    def start(self):
+        """Start the background refresher (once per process)"""
+        if Config.OPEN_JOBS_INDEX_INTERVAL <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='open-jobs-index', daemon=True)
+        self._thread.start()
+
+    def status(self):
+        with self._lock:
+            lines = len(self._jobs)
+            jobs = sum(len(group) for group in self._jobs.values())
+        return {
+            'lines': lines,
+            'jobs': jobs,
+            'refreshed_at': self.refreshed_at,
+            'age_seconds': self.age_seconds,
+            'error': self.last_error
+        }
+
+
+# Shared instance
+open_jobs_index = OpenJobsIndex()
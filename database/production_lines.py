@@ -4,6 +4,7 @@ Handles all production line-related database interactions
 """
 
 from .connection import get_db
+from .schema_cache import schema_cache
 from datetime import datetime
 
 class ProductionLinesDB:
@@ -16,13 +17,7 @@ class ProductionLinesDB:
         """Get all production lines, optionally filtered by facility"""
         with self.db.get_connection() as conn:
             # Check which columns exist
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'ProductionLines'
-            """
-            columns_result = conn.execute_query(columns_query)
-            existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+            existing_columns = schema_cache.columns('ProductionLines')
             
             # Build select fields based on available columns
             select_fields = ['pl.line_id', 'pl.facility_id', 'pl.line_name', 'pl.is_active', 'f.facility_name']
@@ -110,13 +105,7 @@ class ProductionLinesDB:
             facility_name = facility_result[0]['facility_name'] if facility_result else 'Unknown'
             
             # Check which columns exist
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'ProductionLines'
-            """
-            columns_result = conn.execute_query(columns_query)
-            existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+            existing_columns = schema_cache.columns('ProductionLines')
             
             # Build INSERT query based on available columns
             if 'created_by' in existing_columns:
@@ -185,13 +174,7 @@ class ProductionLinesDB:
                 changes['line_name'] = {'old': current.get('line_name'), 'new': line_name}
             
             # Check which columns exist
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'ProductionLines'
-            """
-            columns_result = conn.execute_query(columns_query)
-            existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+            existing_columns = schema_cache.columns('ProductionLines')
             
             # Handle line_code if column exists
             if 'line_code' in existing_columns:
@@ -268,13 +251,7 @@ class ProductionLinesDB:
                 has_downtimes = False
             
             # Check which columns exist
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'ProductionLines'
-            """
-            columns_result = conn.execute_query(columns_query)
-            existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+            existing_columns = schema_cache.columns('ProductionLines')
             
             # Deactivate
             if 'modified_by' in existing_columns:
@@ -306,13 +283,7 @@ class ProductionLinesDB:
         """Reactivate a deactivated production line"""
         with self.db.get_connection() as conn:
             # Check which columns exist
-            columns_query = """
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'ProductionLines'
-            """
-            columns_result = conn.execute_query(columns_query)
-            existing_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
+            existing_columns = schema_cache.columns('ProductionLines')
             
             if 'modified_by' in existing_columns:
                 update_query = """
@@ -0,0 +1,157 @@
+"""
+Query timing instrumentation
+Aggregates per-statement timings in memory and writes slow statements to a rotating log
+"""
+
+import os
+import re
+import threading
+import logging
+from logging.handlers import RotatingFileHandler
+from datetime import datetime
+from flask import has_request_context, request
+from config import Config
+
+_STRING_LITERAL = re.compile(r"N?'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(query):
+    """Normalize a statement so calls that differ only in literals aggregate together"""
+    text = _STRING_LITERAL.sub('?', query)
+    text = _NUMBER_LITERAL.sub('?', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def _current_route():
+    """Endpoint of the Flask request running this query, if any"""
+    if has_request_context():
+        return request.endpoint or request.path
+    return None
+
+
+class QueryStats:
+    """Thread-safe per-fingerprint timing aggregate with a slow-query log"""
+
+    def __init__(self, slow_ms=None, max_entries=None):
+        self.slow_ms = Config.SLOW_QUERY_MS if slow_ms is None else slow_ms
+        self.max_entries = Config.QUERY_STATS_MAX_ENTRIES if max_entries is None else max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._dropped = 0
+        self._since = datetime.now()
+        self._logger = None
+
+    def _slow_logger(self):
+        """Create the rotating slow-query logger on first use"""
+        if self._logger is None:
+            logger = logging.getLogger('production_portal.slow_queries')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            if not logger.handlers:
+                try:
+                    log_dir = os.path.dirname(Config.SLOW_QUERY_LOG)
+                    if log_dir:
+                        os.makedirs(log_dir, exist_ok=True)
+                    handler = RotatingFileHandler(
+                        Config.SLOW_QUERY_LOG,
+                        maxBytes=Config.SLOW_QUERY_LOG_MAX_BYTES,
+                        backupCount=Config.SLOW_QUERY_LOG_BACKUPS,
+                        encoding='utf-8'
+                    )
+                    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+                    logger.addHandler(handler)
+                except OSError as e:
+                    print(f"⚠️  Slow query log unavailable: {str(e)}")
+                    logger.addHandler(logging.NullHandler())
+            self._logger = logger
+        return self._logger
+
+    def record(self, source, query, params=None, rows=None, elapsed_ms=0.0, error=False):
+        """
+        Record one statement execution
+
+        Args:
+            source: Connection the statement ran on ('app' or 'erp')
+            query: SQL text
+            params: Bound parameters (only the count is kept)
+            rows: Rows returned or affected, if known
+            elapsed_ms: Wall time spent in the database call
+            error: True if the statement failed
+        """
+        key = (source, fingerprint(query))
+        param_count = len(params) if params else 0
+        route = _current_route()
+        slow = elapsed_ms >= self.slow_ms
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    self._dropped += 1
+                else:
+                    entry = self._entries[key] = {
+                        'source': source,
+                        'fingerprint': key[1],
+                        'count': 0,
+                        'errors': 0,
+                        'slow_count': 0,
+                        'total_ms': 0.0,
+                        'max_ms': 0.0,
+                        'rows': 0,
+                        'param_count': param_count,
+                        'last_route': None,
+                        'last_seen': None
+                    }
+            if entry is not None:
+                entry['count'] += 1
+                entry['total_ms'] += elapsed_ms
+                entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+                entry['rows'] += rows or 0
+                entry['last_route'] = route
+                entry['last_seen'] = datetime.now()
+                if error:
+                    entry['errors'] += 1
+                if slow:
+                    entry['slow_count'] += 1
+
+        if slow:
+            self._slow_logger().warning(
+                "source=%s elapsed_ms=%.1f rows=%s params=%d route=%s error=%s sql=%s",
+                source, elapsed_ms, rows if rows is not None else '-', param_count,
+                route or '-', error, key[1]
+            )
+
+    def top(self, limit=20, order_by='total_ms'):
+        """Return the `limit` heaviest statements, with average time filled in"""
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        for entry in entries:
+            entry['avg_ms'] = entry['total_ms'] / entry['count'] if entry['count'] else 0.0
+        entries.sort(key=lambda entry: entry.get(order_by) or 0, reverse=True)
+        return entries[:limit]
+
+    def summary(self):
+        """Totals across everything recorded since the last reset"""
+        with self._lock:
+            return {
+                'since': self._since,
+                'statements': len(self._entries),
+                'executions': sum(entry['count'] for entry in self._entries.values()),
+                'slow': sum(entry['slow_count'] for entry in self._entries.values()),
+                'errors': sum(entry['errors'] for entry in self._entries.values()),
+                'dropped': self._dropped,
+                'slow_ms': self.slow_ms
+            }
+
+    def reset(self):
+        """Clear the in-memory aggregate (the slow-query log is kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._dropped = 0
+            self._since = datetime.now()
+
+
+# Process-wide instance shared by the app and ERP connections
+query_stats = QueryStats()
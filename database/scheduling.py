@@ -4,6 +4,7 @@ Database operations for the Production Scheduling module.
 
 from .connection import get_db
 from .erp_connection import get_erp_service
+from .erp_snapshot import erp_snapshots
 from datetime import datetime
 
 class SchedulingDB:
@@ -41,10 +42,10 @@ class SchedulingDB:
         Also calculates the total value of all on-hand inventory.
         """
         # Step 1: Get the main sales order data from ERP
-        erp_data = self.erp_service.get_open_order_schedule()
+        erp_data = erp_snapshots.read('open_orders')
         
         # Step 2: Get the on-hand inventory data from ERP for row-level display
-        on_hand_data = self.erp_service.get_on_hand_inventory()
+        on_hand_data = erp_snapshots.read('on_hand_inventory')
         # Create a simple lookup map: { 'PartNumber': TotalOnHand }
         on_hand_map = {item['PartNumber']: item['TotalOnHand'] for item in on_hand_data}
 
@@ -0,0 +1,113 @@
+"""
+Schema metadata cache
+Keeps the column list of every table in memory so the database modules can
+decide which optional columns exist without querying INFORMATION_SCHEMA each call
+"""
+
+import threading
+from datetime import datetime
+from config import Config
+from .connection import get_db
+
+
+class ColumnNames(frozenset):
+    """
+    Column names of one table, as reported by INFORMATION_SCHEMA.
+    Membership ignores case like the SQL Server default collation does, so
+    'Crew_Size' in columns matches a column created as crew_size.
+    """
+
+    def __new__(cls, names=()):
+        columns = super().__new__(cls, names)
+        columns.folded = frozenset(name.casefold() for name in columns)
+        return columns
+
+    def __contains__(self, name):
+        return isinstance(name, str) and name.casefold() in self.folded
+
+    def has_all(self, names):
+        return {name.casefold() for name in names} <= self.folded
+
+
+class SchemaCache:
+    """Process-wide cache of table -> column names, loaded once and refreshed on demand"""
+
+    def __init__(self):
+        self.db = get_db()
+        self._lock = threading.Lock()
+        self._tables = {}
+        self.loaded_at = None
+
+    def load(self):
+        """(Re)load the columns of every table in the application database"""
+        query = """
+            SELECT TABLE_NAME, COLUMN_NAME
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_CATALOG = ?
+        """
+        results = self.db.execute_query(query, (Config.DB_NAME,))
+        if not results:
+            print("⚠️  Schema cache: no column metadata loaded")
+            return False
+
+        tables = {}
+        for row in results:
+            tables.setdefault(row['TABLE_NAME'].casefold(), set()).add(row['COLUMN_NAME'])
+
+        with self._lock:
+            self._tables = {name: ColumnNames(columns) for name, columns in tables.items()}
+            self.loaded_at = datetime.now()
+        print(f"✅ Schema cache: loaded {len(tables)} tables")
+        return True
+
+    def refresh(self):
+        """Drop everything and reload, e.g. after a migration"""
+        return self.load()
+
+    def invalidate(self, table_name):
+        """Forget one table so its columns are re-read on next use (call after DDL)"""
+        with self._lock:
+            self._tables.pop(table_name.casefold(), None)
+
+    def columns(self, table_name):
+        """Return the column names of a table (membership tests ignore case)"""
+        key = table_name.casefold()
+        with self._lock:
+            columns = self._tables.get(key)
+        if columns is not None:
+            return columns
+
+        # Not cached yet (table created after startup, or just invalidated)
+        query = """
+            SELECT COLUMN_NAME
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_NAME = ?
+        """
+        results = self.db.execute_query(query, (table_name,))
+        columns = ColumnNames(row['COLUMN_NAME'] for row in results)
+        if columns:
+            # Tables that do not exist yet are not cached, so they are seen once created
+            with self._lock:
+                self._tables[key] = columns
+        return columns
+
+    def has_column(self, table_name, column_name):
+        """Check if a table has a column (case-insensitive)"""
+        return column_name in self.columns(table_name)
+
+    def has_columns(self, table_name, *column_names):
+        """Check if a table has all of the given columns (case-insensitive)"""
+        return self.columns(table_name).has_all(column_names)
+
+    def stats(self):
+        """Summary for the admin panel"""
+        with self._lock:
+            return {
+                'tables': len(self._tables),
+                'columns': sum(len(columns) for columns in self._tables.values()),
+                'loaded_at': self.loaded_at
+            }
+
+
+# Shared instance used by all database modules
+schema_cache = SchemaCache()
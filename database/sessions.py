@@ -66,7 +66,7 @@ class SessionsDB:
     
     def create_session(self, session_id, username, ip=None, user_agent=None):
         """Create a new active session"""
-        with self.db.get_connection() as conn:
+        with self.db.transaction() as conn:
             # First, invalidate any existing sessions
             self.invalidate_user_sessions(username)
             
@@ -76,7 +76,9 @@ class SessionsDB:
                 (session_id, username, login_date, last_activity, ip_address, user_agent, is_active)
                 VALUES (?, ?, GETDATE(), GETDATE(), ?, ?, 1)
             """
-            return conn.execute_query(insert_query, (session_id, username, ip, user_agent))
+            success = conn.execute_query(insert_query, (session_id, username, ip, user_agent))
+        # Both statements commit together when the block exits
+        return success and not conn.failed
     
     def validate_session(self, session_id, username):
         """Validate if a session is still active"""
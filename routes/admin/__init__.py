@@ -10,6 +10,7 @@ from .categories import admin_categories_bp
 from .audit import admin_audit_bp
 from .shifts import admin_shifts_bp
 from .users import admin_users_bp
+from .performance import admin_performance_bp
 
 __all__ = [
     'admin_panel_bp',
@@ -18,5 +19,6 @@ __all__ = [
     'admin_categories_bp',
     'admin_audit_bp',
     'admin_shifts_bp',
-    'admin_users_bp'
+    'admin_users_bp',
+    'admin_performance_bp'
 ]
\ No newline at end of file
@@ -9,10 +9,13 @@ Fixed admin route files with proper session validation
 Audit log viewing routes
 """
 
-from flask import Blueprint, render_template, redirect, url_for, session, flash
+from flask import Blueprint, render_template, redirect, url_for, session, flash, request, Response, stream_with_context
 from auth import require_login, require_admin
 from database import audit_db
 from routes.main import validate_session
+from datetime import datetime
+import csv
+from io import StringIO
 
 admin_audit_bp = Blueprint('admin_audit', __name__)
 
@@ -34,6 +37,42 @@ def audit_log():
     
     return render_template('admin/audit_log.html', history=history, user=session['user'])
 
+@admin_audit_bp.route('/audit-log/export')
+@validate_session
+def export_audit_log():
+    """Stream the audit history as CSV without loading it all into memory"""
+    if not require_login(session):
+        return redirect(url_for('main.login'))
+    
+    if not require_admin(session):
+        flash('Admin privileges required', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    days = request.args.get('days', 30, type=int)
+    columns = [
+        'audit_id', 'changed_date', 'table_name', 'record_id', 'action_type',
+        'field_name', 'old_value', 'new_value', 'changed_by', 'user_ip', 'additional_notes'
+    ]
+    
+    def generate():
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for entry in audit_db.iter_history(days=days):
+            writer.writerow([entry.get(col) for col in columns])
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=audit_log_{timestamp}.csv'}
+    )
+
 
 # ============================================
 # routes/admin/facilities.py
@@ -0,0 +1,117 @@
+"""
+Database performance diagnostics routes
+"""
+
+from flask import Blueprint, render_template, redirect, url_for, session, flash, request
+from auth import require_login, require_admin
+from database.query_stats import query_stats
+from database.schema_cache import schema_cache
+from database.erp_cache import erp_cache
+from database.circuit_breaker import erp_breaker
+from database.erp_snapshot import erp_snapshots
+from database.erp_connection import get_erp_service
+from database.open_jobs_index import open_jobs_index
+from database.bom_explosion import bom_explosion
+from database.mrp_results import mrp_result_cache
+from database import mrp_service
+from config import Config
+from routes.main import validate_session
+
+admin_performance_bp = Blueprint('admin_performance', __name__)
+
+SORT_OPTIONS = ('total_ms', 'avg_ms', 'max_ms', 'count', 'slow_count', 'errors')
+
+@admin_performance_bp.route('/performance')
+@validate_session
+def performance():
+    if not require_login(session):
+        return redirect(url_for('main.login'))
+    
+    if not require_admin(session):
+        flash('Admin privileges required', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    order_by = request.args.get('sort', 'total_ms')
+    if order_by not in SORT_OPTIONS:
+        order_by = 'total_ms'
+    limit = request.args.get('limit', 25, type=int)
+    
+    return render_template(
+        'admin/performance.html',
+        user=session['user'],
+        summary=query_stats.summary(),
+        schema=schema_cache.stats(),
+        erp_cache=erp_cache.stats(),
+        erp_breaker=erp_breaker.status(),
+        snapshots=erp_snapshots.status(),
+        snapshots_enabled=erp_snapshots.enabled,
+        erp_delta={name: aggregate.status() for name, aggregate in get_erp_service().delta.items()},
+        erp_delta_enabled=Config.ERP_DELTA_SYNC_ENABLED,
+        open_jobs=open_jobs_index.status(),
+        mrp_fetch=mrp_service.last_fetch_report,
+        mrp_engines=mrp_service.last_engine_comparison,
+        mrp_runs=mrp_result_cache.status(),
+        bom_explosion=bom_explosion.status(),
+        queries=query_stats.top(limit, order_by),
+        order_by=order_by,
+        sort_options=SORT_OPTIONS
+    )
+
+@admin_performance_bp.route('/performance/reset', methods=['POST'])
+@validate_session
+def reset_performance():
+    if not require_admin(session):
+        flash('Admin privileges required', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    query_stats.reset()
+    flash('Query statistics cleared', 'success')
+    return redirect(url_for('admin_performance.performance'))
+
+@admin_performance_bp.route('/performance/schema/refresh', methods=['POST'])
+@validate_session
+def refresh_schema():
+    if not require_admin(session):
+        flash('Admin privileges required', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    if schema_cache.refresh():
+        flash('Schema cache reloaded', 'success')
+    else:
+        flash('Schema cache reload failed', 'error')
+    return redirect(url_for('admin_performance.performance'))
+
+@admin_performance_bp.route('/performance/erp-cache/bust', methods=['POST'])
+@validate_session
+def bust_erp_cache():
+    if not require_admin(session):
+        flash('Admin privileges required', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    dataset = request.form.get('dataset') or None
+    erp_cache.bust(dataset)
+    flash(f"ERP cache cleared: {dataset or 'all datasets'}", 'success')
+    return redirect(url_for('admin_performance.performance'))
+
+@admin_performance_bp.route('/performance/erp-breaker/reset', methods=['POST'])
+@validate_session
+def reset_erp_breaker():
+    if not require_admin(session):
+        flash('Admin privileges required', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    erp_breaker.reset()
+    flash('ERP circuit breaker closed', 'success')
+    return redirect(url_for('admin_performance.performance'))
+
+@admin_performance_bp.route('/performance/snapshots/refresh', methods=['POST'])
+@validate_session
+def refresh_snapshots():
+    if not require_admin(session):
+        flash('Admin privileges required', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    dataset = request.form.get('dataset') or None
+    erp_snapshots.refresh_in_background(dataset)
+    flash(f"ERP snapshot refresh started: {dataset or 'all datasets'}", 'success')
+    return redirect(url_for('admin_performance.performance'))
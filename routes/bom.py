@@ -6,13 +6,12 @@ Bill of Materials (BOM) Viewer routes.
 from flask import Blueprint, render_template, request, session, redirect, url_for, flash, jsonify, send_file
 from auth import require_login
 from routes.main import validate_session
-from database.erp_connection import get_erp_service
+from database.erp_snapshot import erp_snapshots
 import openpyxl
 from io import BytesIO
 from datetime import datetime
 
 bom_bp = Blueprint('bom', __name__, url_prefix='/bom')
-erp_service = get_erp_service()
 
 @bom_bp.route('/')
 @validate_session
@@ -24,9 +23,9 @@ def view_boms():
     # Allow filtering by a specific parent part number via query parameter
     parent_part_number = request.args.get('part_number', None)
     
-    # Fetch all BOM data from the ERP
+    # Fetch BOM data from the latest ERP snapshot (or the ERP itself)
     try:
-        boms = erp_service.get_bom_data(parent_part_number)
+        boms = erp_snapshots.get_bom_data(parent_part_number)
     except Exception as e:
         flash(f'Error fetching BOM data from ERP: {e}', 'error')
         boms = []
@@ -1,5 +1,6 @@
-from flask import Blueprint, jsonify, session
+from flask import Blueprint, jsonify, session, request
 from database.erp_connection import get_erp_service
+from database.open_jobs_index import open_jobs_index
 
 erp_bp = Blueprint('erp', __name__, url_prefix='/api/erp')
 erp_service = get_erp_service()
@@ -9,21 +10,31 @@ def get_open_jobs(facility, line):
     """
     API endpoint to get open jobs for a given facility and line.
     Simplified authentication - just checks if user is in session.
+    Answered from the in-memory open jobs index; pass ?refresh=1 to reload it
+    first. The response carries when the index was last loaded.
     """
     # Simple session check - don't use validate_session decorator
     if 'user' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'}), 401
     
     try:
-        print(f"🔍 [ERP API] Fetching jobs for {facility}/{line}")
-        jobs = erp_service.get_open_jobs_by_line(facility, line)
+        force_refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+        jobs = open_jobs_index.lookup(facility, line, force_refresh=force_refresh)
         
-        if jobs:
-            print(f"✅ [ERP API] Found {len(jobs)} jobs")
-            return jsonify({'success': True, 'jobs': jobs})
-        else:
-            print(f"ℹ️ [ERP API] No jobs found")
-            return jsonify({'success': True, 'jobs': []})
+        if jobs is None:
+            # Index has never loaded; ask the ERP for this line directly
+            print(f"🔍 [ERP API] Index unavailable, fetching jobs for {facility}/{line}")
+            jobs = erp_service.get_open_jobs_by_line(facility, line)
+            return jsonify({'success': True, 'jobs': jobs or [], 'refreshed_at': None, 'age_seconds': None})
+        
+        refreshed_at = open_jobs_index.refreshed_at
+        age = open_jobs_index.age_seconds
+        return jsonify({
+            'success': True,
+            'jobs': jobs,
+            'refreshed_at': refreshed_at.isoformat(timespec='seconds') if refreshed_at else None,
+            'age_seconds': round(age) if age is not None else None
+        })
             
     except Exception as e:
         print(f"❌ [ERP API] Error: {str(e)}")
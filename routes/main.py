@@ -14,6 +14,7 @@ from config import Config
 # Import database modules
 from database import facilities_db, lines_db, categories_db, downtimes_db, sessions_db
 from database.connection import DatabaseConnection
+from database.erp_connection import get_erp_pool
 
 # Import i18n
 from i18n_config import I18nConfig, _
@@ -224,13 +225,17 @@ def status():
         'facilities_count': 0,
         'lines_count': 0,
         'users_today': 0,
-        'active_sessions': 0
+        'active_sessions': 0,
+        'db_pool': {},
+        'erp_pool': {}
     }
     
     # Test connections
     try:
         db = DatabaseConnection()
         status_info['db_connected'] = db.test_connection()
+        status_info['db_pool'] = db.get_pool_stats()
+        status_info['erp_pool'] = get_erp_pool().stats()
         
         if status_info['db_connected']:
             with db.get_connection() as conn:
@@ -7,12 +7,24 @@ from flask import Blueprint, render_template, session, redirect, url_for, flash,
 from auth import require_login
 from routes.main import validate_session
 from database.mrp_service import mrp_service
+from database.mrp_results import mrp_result_cache
 import openpyxl
 from io import BytesIO
 from datetime import datetime
 
 mrp_bp = Blueprint('mrp', __name__, url_prefix='/mrp')
 
+def _flash_run_error(mrp_run):
+    """Tell the user when the last MRP run could not complete or the shown run is missing inputs"""
+    error = mrp_result_cache.last_error
+    if error:
+        if mrp_run:
+            flash(f"The last MRP run failed: {error}. Showing results from run #{mrp_run['version']}.", 'error')
+        else:
+            flash(f'The MRP run failed: {error}.', 'error')
+    elif mrp_run and mrp_run['status'] == 'degraded':
+        flash(f"These MRP results are incomplete: {mrp_run['error']}.", 'error')
+
 @mrp_bp.route('/')
 @validate_session
 def view_mrp():
@@ -21,18 +33,85 @@ def view_mrp():
         flash('MRP access is restricted to administrators and scheduling admins.', 'error')
         return redirect(url_for('main.dashboard'))
 
-    try:
-        mrp_results = mrp_service.calculate_mrp_suggestions()
-    except Exception as e:
-        flash(f'An error occurred while running the MRP calculation: {e}', 'error')
-        mrp_results = []
+    # Served from the last background run; before the first run finishes the
+    # page shows progress and reloads itself
+    mrp_run = mrp_result_cache.current()
+    mrp_results = mrp_run['results'] if mrp_run else []
+    _flash_run_error(mrp_run)
 
     return render_template(
         'mrp/index.html',
         user=session['user'],
-        mrp_results=mrp_results
+        mrp_results=mrp_results,
+        mrp_run=mrp_run
     )
 
+@mrp_bp.route('/recompute', methods=['POST'])
+@validate_session
+def recompute_mrp():
+    """Starts an MRP run even if its inputs are unchanged, then returns to the calling page."""
+    if not (session.get('user', {}).get('is_admin') or session.get('user', {}).get('is_scheduling_admin')):
+        flash('MRP access is restricted.', 'error')
+        return redirect(url_for('main.dashboard'))
+
+    if not mrp_result_cache.run_in_background(force=True, trigger='demand'):
+        flash('An MRP run is already in progress; the page will update when it finishes.', 'info')
+
+    next_url = request.form.get('next', '')
+    if not next_url.startswith('/') or next_url.startswith('//'):
+        next_url = url_for('mrp.view_mrp')
+    return redirect(next_url)
+
+@mrp_bp.route('/api/status')
+@validate_session
+def run_status():
+    """Progress of the background MRP run and the current result version, polled by the MRP pages."""
+    if not (session.get('user', {}).get('is_admin') or session.get('user', {}).get('is_scheduling_admin')):
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    return jsonify(mrp_result_cache.progress_status())
+
+@mrp_bp.route('/api/shared-with')
+@validate_session
+def shared_with():
+    """What earlier orders were given of each component of one SO, loaded when its row is expanded."""
+    if not (session.get('user', {}).get('is_admin') or session.get('user', {}).get('is_scheduling_admin')):
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    parts = request.args.getlist('part')
+    positions = request.args.getlist('position', type=int)
+    version = request.args.get('version', type=int)
+    so_number = request.args.get('so', '')
+    if not so_number or version is None or len(parts) != len(positions):
+        return jsonify({'success': False, 'message': 'so, version and matching part/position lists are required'}), 400
+
+    lines = mrp_result_cache.shared_with(version, so_number, list(zip(parts, positions)))
+    if lines is None:
+        return jsonify({'success': False, 'message': 'The MRP has been recalculated; reload the page for the latest allocation.'}), 409
+    return jsonify({'success': True, 'shared_with': lines})
+
+@mrp_bp.route('/api/projection')
+@validate_session
+def projected_balance():
+    """Projected available balance of one component per day/week bucket in the current MRP run."""
+    if not (session.get('user', {}).get('is_admin') or session.get('user', {}).get('is_scheduling_admin')):
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    part = request.args.get('part', '').strip()
+    mrp_run = mrp_result_cache.current()
+    plan = mrp_run.get('time_phased') if mrp_run else None
+    if not part:
+        return jsonify({'success': False, 'message': 'part is required'}), 400
+    if plan is None:
+        return jsonify({'success': False, 'message': 'No time-phased plan yet; it is built by the next MRP run.'}), 404
+
+    buckets = [
+        dict(row, bucket=row['bucket'].isoformat() if row['bucket'] else None)
+        for row in plan.projection(part)
+    ]
+    return jsonify({'success': True, 'part': part, 'bucket_size': plan.bucket, 'version': mrp_run['version'],
+                    'buckets': buckets})
+
 @mrp_bp.route('/summary')
 @validate_session
 def customer_summary():
@@ -41,8 +120,10 @@ def customer_summary():
         flash('MRP access is restricted.', 'error')
         return redirect(url_for('main.dashboard'))
 
+    mrp_run = mrp_result_cache.current()
+    _flash_run_error(mrp_run)
     try:
-        mrp_results = mrp_service.calculate_mrp_suggestions()
+        mrp_results = mrp_run['results'] if mrp_run else []
         all_customers = sorted(list(set(r['sales_order']['Customer Name'] for r in mrp_results)))
         
         selected_customer = request.args.get('customer')
@@ -50,7 +131,8 @@ def customer_summary():
         orders_for_template = []
         
         if selected_customer:
-            customer_orders = [r for r in mrp_results if r['sales_order']['Customer Name'] == selected_customer]
+            # The summary annotates each result; the cached run is shared, so work on copies
+            customer_orders = [dict(r) for r in mrp_results if r['sales_order']['Customer Name'] == selected_customer]
             summary_data = mrp_service.get_customer_summary(customer_orders)
             if summary_data:
                 orders_for_template = summary_data.get('orders', [])
@@ -77,7 +159,8 @@ def customer_summary():
         selected_customer=selected_customer,
         summary=summary_data,
         all_orders=orders_for_template,
-        filters=filters
+        filters=filters,
+        mrp_run=mrp_run
     )
 
 
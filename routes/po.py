@@ -6,13 +6,12 @@ Purchase Order (PO) Viewer routes.
 from flask import Blueprint, render_template, request, session, redirect, url_for, flash, jsonify, send_file
 from auth import require_login
 from routes.main import validate_session
-from database.erp_connection import get_erp_service
+from database.erp_snapshot import erp_snapshots
 import openpyxl
 from io import BytesIO
 from datetime import datetime
 
 po_bp = Blueprint('po', __name__, url_prefix='/po')
-erp_service = get_erp_service()
 
 @po_bp.route('/')
 @validate_session
@@ -22,7 +21,7 @@ def view_pos():
         return redirect(url_for('main.login'))
 
     try:
-        purchase_orders = erp_service.get_detailed_purchase_order_data()
+        purchase_orders = erp_snapshots.read('detailed_purchase_orders')
     except Exception as e:
         flash(f'Error fetching PO data from ERP: {e}', 'error')
         purchase_orders = []
@@ -50,9 +50,10 @@ function attachAllEventListeners() {
     document.getElementById('resetBtn').addEventListener('click', resetFilters);
     document.getElementById('exportBtn').addEventListener('click', exportVisibleDataToXlsx);
     document.getElementById('refreshBtn').addEventListener('click', () => {
+        // The button posts the recompute form; mrp_status.js reloads the page
+        // with the saved filters once the new run is ready
         saveFilters();
-        sessionStorage.setItem('mrpWasRefreshed', 'true');
-        window.location.reload();
+        sessionStorage.setItem('mrpRecomputeRequested', 'true');
     });
     
     document.querySelectorAll('.so-header-static .sortable').forEach(header => {
@@ -74,15 +75,44 @@ function attachAccordionEventListeners() {
                     slideUp(details);
                 } else {
                     slideDown(details);
+                    loadSharedWith(details);
                 }
             }
         }
     });
 }
 
+function loadSharedWith(details) {
+    // Which earlier orders took each shared component is fetched on first expand
+    const icons = Array.from(details.querySelectorAll('.shared-icon[data-position]:not([data-loaded])'));
+    if (icons.length === 0 || !details.dataset.runVersion) return;
+
+    const params = new URLSearchParams({ so: details.dataset.so, version: details.dataset.runVersion });
+    icons.forEach(icon => {
+        params.append('part', icon.dataset.part);
+        params.append('position', icon.dataset.position);
+        icon.dataset.loaded = 'true';
+    });
+
+    fetch(`/mrp/api/shared-with?${params}`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                icons.forEach(icon => { icon.title += `\n${data.message}`; });
+                return;
+            }
+            icons.forEach((icon, index) => {
+                const lines = data.shared_with[index];
+                if (lines && lines.length) icon.title = lines.join('\n');
+            });
+        })
+        .catch(() => icons.forEach(icon => { delete icon.dataset.loaded; }));
+}
+
 function updateLastUpdatedTime() {
     const timestampEl = document.getElementById('lastUpdated');
-    if (timestampEl) {
+    // The server stamps when the MRP results were computed; only fall back to now
+    if (timestampEl && !timestampEl.textContent.trim()) {
         const now = new Date();
         const timeString = now.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
         timestampEl.textContent = `Last Updated: ${timeString}`;
@@ -395,7 +425,7 @@ function exportVisibleDataToXlsx() {
     const headers = [
         'SO', 'Customer', 'Finished Good', 'SO Required', 'SO Can Produce', 'SO Bottleneck',
         'Component Part', 'Component Description', 'Total Required', 'Initial On-Hand',
-        'Avail. Before SO', 'Allocated', 'Open PO Qty', 'Shortfall'
+        'Avail. Before SO', 'Allocated', 'Open PO Qty', 'Shortfall', 'Short on Ship Date'
     ];
 
     const rows = [];
@@ -424,13 +454,13 @@ function exportVisibleDataToXlsx() {
                         compRow.cells[1].textContent.trim(), compRow.cells[2].textContent.trim(),
                         compRow.cells[3].textContent.trim(), compRow.cells[4].textContent.trim(),
                         compRow.cells[5].textContent.trim(), compRow.cells[6].textContent.trim(),
-                        compRow.cells[7].textContent.trim(),
+                        compRow.cells[7].textContent.trim(), compRow.cells[8].textContent.trim(),
                     ];
                     rows.push(rowData);
                 });
             }
         } else {
-             rows.push([soData.so, soData.customer, soData.fg, soData.required, soData.canProduce, soData.bottleneck, '', '', '', '', '', '', '', '']);
+             rows.push([soData.so, soData.customer, soData.fg, soData.required, soData.canProduce, soData.bottleneck, '', '', '', '', '', '', '', '', '']);
         }
     });
 
@@ -0,0 +1,77 @@
+// Polls the background MRP runner while an MRP page is open: shows progress
+// while a run is going and picks up new results when it finishes.
+document.addEventListener('DOMContentLoaded', function() {
+    const panel = document.getElementById('mrpRunStatus');
+    if (!panel) return;
+
+    const statusUrl = panel.dataset.statusUrl;
+    const shownVersion = panel.dataset.version ? parseInt(panel.dataset.version, 10) : null;
+    const message = document.getElementById('mrpRunMessage');
+    const bar = document.getElementById('mrpRunBar');
+    const phases = {
+        fetch: 'Fetching ERP data',
+        fingerprint: 'Checking for changes',
+        bom: 'Exploding BOMs',
+        allocate: 'Allocating inventory',
+        time_phase: 'Phasing supply by date'
+    };
+
+    function reloadWithResults() {
+        // mrp.js restores the filters and confirms the refresh after the reload
+        if (typeof saveFilters === 'function') saveFilters();
+        sessionStorage.removeItem('mrpRecomputeRequested');
+        sessionStorage.setItem('mrpWasRefreshed', 'true');
+        window.location.reload();
+    }
+
+    function showNewResults(version) {
+        panel.hidden = false;
+        bar.parentElement.hidden = true;
+        message.textContent = `New MRP results are available (run #${version}). `;
+        const link = document.createElement('a');
+        link.href = '#';
+        link.textContent = 'Reload';
+        link.addEventListener('click', event => {
+            event.preventDefault();
+            reloadWithResults();
+        });
+        message.appendChild(link);
+    }
+
+    function poll() {
+        fetch(statusUrl, { credentials: 'same-origin' })
+            .then(response => response.json())
+            .then(status => {
+                if (status.version !== null && status.version !== shownVersion) {
+                    // Reload straight away if the page had nothing to show or the user asked for this run
+                    if (shownVersion === null || sessionStorage.getItem('mrpRecomputeRequested')) {
+                        reloadWithResults();
+                    } else {
+                        showNewResults(status.version);
+                    }
+                    return;
+                }
+                if (status.running) {
+                    panel.hidden = false;
+                    let text = phases[status.phase] || 'Calculating MRP';
+                    if (status.percent !== null) {
+                        text += ` - ${status.done.toLocaleString()} of ${status.total.toLocaleString()} orders`;
+                    }
+                    message.textContent = `${text}...`;
+                    bar.style.width = `${Math.max(status.percent || 0, 5)}%`;
+                    setTimeout(poll, 2000);
+                    return;
+                }
+                sessionStorage.removeItem('mrpRecomputeRequested');
+                if (shownVersion !== null) {
+                    panel.hidden = true;
+                } else if (status.error) {
+                    message.textContent = `The MRP calculation failed: ${status.error}`;
+                }
+                setTimeout(poll, 30000);
+            })
+            .catch(() => setTimeout(poll, 30000));
+    }
+
+    poll();
+});
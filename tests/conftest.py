@@ -0,0 +1,35 @@
+"""
+Shared test setup
+The units under test never reach a database. When the pyodbc driver (or the
+unixODBC library it loads) is not installed, a minimal module stands in for
+it with the names the database package imports; connecting always fails.
+"""
+
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    pyodbc = types.ModuleType('pyodbc')
+
+    class Error(Exception):
+        pass
+
+    class InterfaceError(Error):
+        pass
+
+    class OperationalError(Error):
+        pass
+
+    def connect(*args, **kwargs):
+        raise OperationalError('08001', 'No ODBC driver in the test environment')
+
+    pyodbc.Error = Error
+    pyodbc.InterfaceError = InterfaceError
+    pyodbc.OperationalError = OperationalError
+    pyodbc.connect = connect
+    sys.modules['pyodbc'] = pyodbc
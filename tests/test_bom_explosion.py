@@ -0,0 +1,118 @@
+"""Tests for the memoized multi-level BOM explosion"""
+
+import pytest
+
+from database.bom_explosion import BomExplosion
+
+
+def bom(parent, part, quantity, scrap=0, revision=1):
+    return {'Parent Part Number': parent, 'Part Number': part, 'Quantity': quantity, 'Scrap %': scrap,
+            'Description': f'{part.strip()} description', 'Revision ID': revision}
+
+
+def quantities(explosion, part):
+    return {component: pytest.approx(qty) for component, qty, _ in explosion.requirements(part)}
+
+
+BOMS = [
+    bom('FG-1', 'SUB-1', 2, scrap=10),
+    bom('FG-1', 'RM-1', 1),
+    bom('SUB-1', 'SUB-2', 3, scrap=5),
+    bom('SUB-1', 'RM-1', 0.5),
+    bom('SUB-2', 'RM-2', 4, scrap=50),
+    bom('FG-2', 'RM-3', 1),
+]
+
+
+def test_single_level_returns_direct_components_only():
+    explosion = BomExplosion(multi_level=False)
+    explosion.load(BOMS)
+    assert quantities(explosion, 'FG-1') == {'SUB-1': 2.2, 'RM-1': 1}
+
+
+def test_default_is_single_level():
+    assert BomExplosion().multi_level is False
+
+
+def test_scrap_compounds_across_levels():
+    explosion = BomExplosion(multi_level=True)
+    explosion.load(BOMS)
+    # FG-1 -> 2.2 SUB-1 -> 2.2 * 3.15 SUB-2 -> 2.2 * 3.15 * 6 RM-2
+    assert quantities(explosion, 'FG-1') == {'RM-2': 2.2 * 3.15 * 6, 'RM-1': 1 + 2.2 * 0.5}
+    assert quantities(explosion, 'SUB-1') == {'RM-2': 3.15 * 6, 'RM-1': 0.5}
+
+
+def test_requirements_keep_descriptions_and_skip_zero_quantities():
+    explosion = BomExplosion(multi_level=True)
+    explosion.load(BOMS + [bom('FG-2', 'RM-4', 0), bom(' FG-3 ', ' RM-5 ', 1)])
+    assert [part for part, _, _ in explosion.requirements('FG-2')] == ['RM-3']
+    assert explosion.requirements('FG-3') == (('RM-5', 1, 'RM-5 description'),)
+    assert explosion.requirements('RM-1') == ()
+
+
+@pytest.mark.parametrize('rows,cycle', [
+    ([bom('A', 'B', 1), bom('B', 'C', 1), bom('C', 'A', 1), bom('C', 'RM-1', 2)], ['A', 'B', 'C', 'A']),
+    ([bom('A', 'A', 1), bom('A', 'RM-1', 2)], ['A', 'A']),
+])
+def test_cycles_are_cut_and_reported(rows, cycle):
+    explosion = BomExplosion(multi_level=True)
+    explosion.load(rows)
+    assert explosion.stats['cycles'] == [cycle]
+    requirements = quantities(explosion, 'A')
+    # The back edge is treated as a purchased part; the explosion terminates
+    assert requirements['RM-1'] == 2
+    assert requirements[cycle[-1]] == 1
+
+
+def test_cycle_cut_is_dropped_when_the_bom_is_fixed():
+    explosion = BomExplosion(multi_level=True)
+    explosion.load([bom('A', 'B', 1), bom('B', 'A', 1), bom('B', 'RM-1', 1)])
+    assert 'A' in quantities(explosion, 'A')
+
+    explosion.load([bom('A', 'B', 1), bom('B', 'RM-1', 1)])
+    assert explosion.stats['cycles'] == []
+    assert quantities(explosion, 'A') == {'RM-1': 1}
+
+
+def test_unchanged_reload_keeps_memoized_explosions():
+    explosion = BomExplosion(multi_level=True)
+    explosion.load(BOMS)
+    first = explosion.requirements('FG-1')
+    explosion.load([dict(row) for row in BOMS])
+    assert explosion.requirements('FG-1') is first
+    assert explosion.stats['invalidated'] == 0
+    assert explosion.stats['hits'] == 1
+
+
+def test_changed_sub_assembly_invalidates_its_parents_only():
+    explosion = BomExplosion(multi_level=True)
+    explosion.load(BOMS)
+    for part in ('FG-1', 'FG-2'):
+        explosion.requirements(part)
+    fg2 = explosion.requirements('FG-2')
+
+    changed = [row if row['Parent Part Number'] != 'SUB-2' else bom('SUB-2', 'RM-2', 1, revision=2)
+               for row in BOMS]
+    explosion.load(changed)
+
+    assert explosion.requirements('FG-2') is fg2
+    assert quantities(explosion, 'FG-1')['RM-2'] == pytest.approx(2.2 * 3.15)
+    # FG-1, SUB-1 and SUB-2 were memoized and all depend on SUB-2
+    assert explosion.stats['invalidated'] == 3
+
+
+def test_new_bom_for_a_purchased_part_invalidates_its_users():
+    explosion = BomExplosion(multi_level=True)
+    explosion.load(BOMS)
+    explosion.requirements('FG-2')
+    explosion.load(BOMS + [bom('RM-3', 'RM-9', 2)])
+    assert quantities(explosion, 'FG-2') == {'RM-9': 2}
+
+
+def test_revision_change_alone_invalidates():
+    explosion = BomExplosion(multi_level=True)
+    explosion.load(BOMS)
+    first = explosion.requirements('FG-2')
+    explosion.load([row if row['Parent Part Number'] != 'FG-2' else dict(row, **{'Revision ID': 2})
+                    for row in BOMS])
+    assert explosion.requirements('FG-2') is not first
@@ -0,0 +1,96 @@
+"""Tests for the ERP circuit breaker state machine"""
+
+import time
+
+from database.circuit_breaker import CircuitBreaker
+
+
+def make_breaker(failures=3, reset_seconds=60):
+    return CircuitBreaker('test', failure_threshold=failures, reset_seconds=reset_seconds)
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure(RuntimeError('down'))
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_stays_closed_below_threshold():
+    breaker = make_breaker(failures=3)
+    breaker.record_failure(RuntimeError('1'))
+    breaker.record_failure(RuntimeError('2'))
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_success_resets_consecutive_failures():
+    breaker = make_breaker(failures=3)
+    breaker.record_failure(RuntimeError('1'))
+    breaker.record_failure(RuntimeError('2'))
+    breaker.record_success()
+    breaker.record_failure(RuntimeError('3'))
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.status()['consecutive_failures'] == 1
+
+
+def test_opens_at_threshold_and_rejects_calls():
+    breaker = make_breaker(failures=3)
+    open_breaker(breaker)
+    assert not breaker.allow()
+    assert not breaker.allow()
+    status = breaker.status()
+    assert status['opened'] == 1
+    assert status['rejected'] == 2
+    assert status['last_error'] == 'down'
+    assert 0 < status['retry_in'] <= 60
+
+
+def test_half_open_lets_one_trial_through_after_cool_down():
+    breaker = make_breaker(reset_seconds=0.01)
+    open_breaker(breaker)
+    time.sleep(0.02)
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # Only one trial at a time
+    assert breaker.status()['trials'] == 1
+
+
+def test_successful_trial_closes_the_circuit():
+    breaker = make_breaker(reset_seconds=0.01)
+    open_breaker(breaker)
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = make_breaker(reset_seconds=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure(RuntimeError('still down'))
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.status()['opened'] == 2
+
+
+def test_manual_reset_closes_the_circuit():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    breaker.reset()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_zero_threshold_disables_the_breaker():
+    breaker = make_breaker(failures=0)
+    for _ in range(10):
+        breaker.record_failure(RuntimeError('down'))
+        assert breaker.allow()
@@ -0,0 +1,242 @@
+"""Tests for ConnectionPool and the disconnect retry in DatabaseConnection"""
+
+import threading
+import time
+
+import pyodbc
+import pytest
+
+from database.audit import AuditDB
+from database.connection import ConnectionPool, DatabaseConnection
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.fast_executemany = False
+
+    def execute(self, query, params=None):
+        if not self.connection.alive:
+            raise pyodbc.Error('08S01', 'Communication link failure')
+        if self.connection.fail_with:
+            raise self.connection.fail_with
+        self.connection.executed.append(query)
+        return self
+
+    def executemany(self, query, seq_of_params):
+        if self.fast_executemany and self.connection.reject_fast:
+            raise pyodbc.Error('HY090', 'Invalid string or buffer length')
+        self.connection.executed.extend(query for _ in seq_of_params)
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.fail_with = None
+        self.reject_fast = False
+        self.closed = False
+        self.rollbacks = 0
+        self.executed = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        if not self.alive:
+            raise pyodbc.Error('08S01', 'Communication link failure')
+        self.rollbacks += 1
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    pool = ConnectionPool('DRIVER={Fake}', **kwargs)
+    opened = []
+
+    def create():
+        connection = FakeConnection(len(opened) + 1)
+        opened.append(connection)
+        return connection
+
+    pool._create_connection = create
+    return pool, opened
+
+
+def test_release_returns_connection_for_reuse():
+    pool, opened = make_pool(max_size=2, validate_after=30)
+    first = pool.acquire()
+    assert pool.stats()['in_use'] == 1
+
+    pool.release(first)
+    assert first.rollbacks == 1  # No open transaction is handed on
+    assert pool.stats()['idle'] == 1
+
+    assert pool.acquire() is first
+    stats = pool.stats()
+    assert len(opened) == 1
+    assert stats['created'] == 1
+    assert stats['checkouts'] == 2
+    assert stats['probes_skipped'] == 1
+    assert stats['probes'] == 0
+
+
+def test_pool_grows_to_max_size_then_times_out():
+    pool, opened = make_pool(max_size=2, timeout=0.05)
+    pool.acquire()
+    pool.acquire()
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    assert time.monotonic() - started >= 0.04
+    stats = pool.stats()
+    assert stats['timeouts'] == 1
+    assert stats['open'] == 2
+    assert len(opened) == 2
+
+
+def test_waiting_checkout_gets_released_connection():
+    pool, _ = make_pool(max_size=1, timeout=2)
+    held = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.release(held)
+    waiter.join(1)
+
+    assert got == [held]
+    assert pool.stats()['waits'] >= 1
+
+
+def test_idle_connection_that_fails_probe_is_discarded():
+    pool, opened = make_pool(max_size=2, validate_after=0)
+    first = pool.acquire()
+    pool.release(first)
+    first.alive = False
+
+    second = pool.acquire()
+    assert second is not first
+    assert first.closed
+    stats = pool.stats()
+    assert stats['probes'] == 1
+    assert stats['discarded'] == 1
+    assert stats['open'] == 1
+    assert len(opened) == 2
+
+
+def test_idle_connection_that_passes_probe_is_reused():
+    pool, _ = make_pool(validate_after=0)
+    first = pool.acquire()
+    pool.release(first)
+
+    assert pool.acquire() is first
+    assert pool.stats()['probes'] == 1
+
+
+def test_release_discards_connection_whose_rollback_fails():
+    pool, _ = make_pool()
+    connection = pool.acquire()
+    connection.alive = False
+    pool.release(connection)
+
+    stats = pool.stats()
+    assert connection.closed
+    assert stats['discarded'] == 1
+    assert stats['open'] == 0
+
+
+def test_connection_past_max_lifetime_is_closed_instead_of_reused():
+    pool, _ = make_pool(max_lifetime=0.01)
+    first = pool.acquire()
+    pool.release(first)
+    time.sleep(0.02)
+
+    assert pool.acquire() is not first
+    assert first.closed
+    assert pool.stats()['expired'] == 1
+
+
+def test_failed_connect_frees_its_slot():
+    pool, _ = make_pool(max_size=1, timeout=0.05)
+
+    def refuse():
+        raise pyodbc.Error('08001', 'Server not found')
+
+    pool._create_connection = refuse
+    with pytest.raises(pyodbc.Error):
+        pool.acquire()
+    assert pool.stats()['open'] == 0
+
+
+@pytest.fixture
+def db():
+    database = DatabaseConnection()
+    database.pool, opened = make_pool(max_size=2)
+    database.opened = opened
+    return database
+
+
+def test_execute_retries_once_on_a_fresh_connection_after_disconnect(db):
+    with db.get_connection():
+        dropped = db.connection
+        dropped.alive = False
+        db._execute("SELECT 42")
+        replacement = db.connection
+
+    assert replacement is not dropped
+    assert replacement.executed == ["SELECT 42"]
+    assert dropped.closed
+    stats = db.pool.stats()
+    assert stats['reconnects'] == 1
+    assert stats['open'] == 1
+
+
+def test_execute_does_not_retry_other_errors(db):
+    with db.get_connection():
+        db.connection.fail_with = pyodbc.Error('42S02', 'Invalid object name')
+        with pytest.raises(pyodbc.Error):
+            db._execute("SELECT * FROM missing")
+
+    assert db.pool.stats()['reconnects'] == 0
+    assert len(db.opened) == 1
+
+
+def test_execute_does_not_retry_inside_a_transaction(db):
+    with db.transaction() as transaction:
+        db.connection.alive = False
+        with pytest.raises(pyodbc.Error):
+            db._execute("UPDATE t SET x = 1")
+        transaction.failed = True
+
+    stats = db.pool.stats()
+    assert stats['reconnects'] == 0
+    assert stats['open'] == 0  # The dead connection is not returned to the pool
+
+
+def test_audit_log_falls_back_to_row_by_row_when_batch_is_rejected(db):
+    audit = AuditDB.__new__(AuditDB)
+    audit.db = db
+    audit.audit_enabled = True
+    with db.get_connection():
+        db.connection.reject_fast = True
+
+    logged = audit.log('Parts', 7, 'UPDATE', changes={
+        'description': {'old': 'Bolt', 'new': 'Hex bolt'},
+        'qty': {'old': 1, 'new': 2},
+    }, username='tester')
+
+    assert logged
+    inserts = [query for query in db.opened[0].executed if 'INSERT INTO AuditLog' in query]
+    assert len(inserts) == 2
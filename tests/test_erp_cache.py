@@ -0,0 +1,148 @@
+"""Tests for the in-memory ERP result cache"""
+
+import threading
+import time
+
+import pytest
+
+from database import erp_cache as erp_cache_module
+from database.circuit_breaker import CircuitBreaker
+from database.erp_cache import ErpCache
+
+# Configured dataset names, so stats() reports them
+ORDERS = 'get_open_order_schedule'
+BOMS = 'get_bom_data'
+
+
+class Loader:
+    """Returns a new numbered result per call; can be told to block or come back empty"""
+
+    def __init__(self):
+        self.calls = 0
+        self.empty = False
+        self.gate = None
+
+    def __call__(self):
+        if self.gate is not None:
+            self.gate.wait(1)
+        self.calls += 1
+        if self.empty:
+            return []
+        return [{'load': self.calls}]
+
+
+def wait_for(condition, timeout=1):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_seconds=60)
+    monkeypatch.setattr(erp_cache_module, 'erp_breaker', breaker)
+    return breaker
+
+
+def test_fresh_entry_is_served_from_memory(breaker):
+    cache = ErpCache(stale_seconds=60)
+    loader = Loader()
+    assert cache.get(ORDERS, (), loader, ttl=60) == [{'load': 1}]
+    assert cache.get(ORDERS, (), loader, ttl=60) == [{'load': 1}]
+    assert loader.calls == 1
+    stats = cache.stats()[ORDERS]
+    assert (stats['misses'], stats['hits']) == (1, 1)
+
+
+def test_callers_get_their_own_row_copies(breaker):
+    cache = ErpCache()
+    loader = Loader()
+    cache.get(ORDERS, (), loader, ttl=60)[0]['load'] = 'changed'
+    assert cache.get(ORDERS, (), loader, ttl=60) == [{'load': 1}]
+
+
+def test_arguments_are_cached_separately(breaker):
+    cache = ErpCache()
+    loader = Loader()
+    cache.get(BOMS, ('A',), loader, ttl=60)
+    cache.get(BOMS, ('B',), loader, ttl=60)
+    assert loader.calls == 2
+
+
+def test_stale_entry_is_served_while_refreshing_in_background(breaker):
+    cache = ErpCache(stale_seconds=60)
+    loader = Loader()
+    cache.get(ORDERS, (), loader, ttl=0.01)
+    time.sleep(0.02)
+
+    loader.gate = threading.Event()
+    assert cache.get(ORDERS, (), loader, ttl=0.01) == [{'load': 1}]  # Stale, not waiting on the ERP
+    assert cache.get(ORDERS, (), loader, ttl=0.01) == [{'load': 1}]
+    loader.gate.set()
+    wait_for(lambda: cache.stats()[ORDERS]['refreshes'] == 1)
+
+    assert loader.calls == 2  # One background refresh for both stale reads
+    assert cache.get(ORDERS, (), loader, ttl=60) == [{'load': 2}]
+    assert cache.stats()[ORDERS]['stale_hits'] == 2
+
+
+def test_entry_past_stale_window_is_reloaded_inline(breaker):
+    cache = ErpCache(stale_seconds=0)
+    loader = Loader()
+    cache.get(ORDERS, (), loader, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get(ORDERS, (), loader, ttl=0.01) == [{'load': 2}]
+    assert cache.stats()[ORDERS]['misses'] == 2
+
+
+def test_empty_reload_keeps_last_good_result(breaker):
+    cache = ErpCache(stale_seconds=0)
+    loader = Loader()
+    cache.get(ORDERS, (), loader, ttl=0.01)
+    time.sleep(0.02)
+    loader.empty = True
+    assert cache.get(ORDERS, (), loader, ttl=0.01) == [{'load': 1}]
+    assert cache.stats()[ORDERS]['fallbacks'] == 1
+
+
+def test_open_breaker_serves_old_result_without_loading(breaker):
+    cache = ErpCache(stale_seconds=0)
+    loader = Loader()
+    cache.get(ORDERS, (), loader, ttl=0.01)
+    time.sleep(0.02)
+    breaker.record_failure(RuntimeError('down'))
+
+    assert cache.get(ORDERS, (), loader, ttl=0.01) == [{'load': 1}]
+    assert loader.calls == 1
+
+
+def test_concurrent_misses_load_once(breaker):
+    cache = ErpCache()
+    loader = Loader()
+    loader.gate = threading.Event()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(ORDERS, (), loader, ttl=60)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.02)
+    loader.gate.set()
+    for thread in threads:
+        thread.join(1)
+
+    assert loader.calls == 1
+    assert results == [[{'load': 1}]] * 5
+
+
+def test_bust_and_bypass(breaker):
+    cache = ErpCache()
+    loader = Loader()
+    cache.get(ORDERS, (), loader, ttl=60)
+    cache.bust(ORDERS)
+    assert cache.get(ORDERS, (), loader, ttl=60) == [{'load': 2}]
+
+    assert not cache.bypassed
+    with cache.bypass():
+        assert cache.bypassed
+    assert not cache.bypassed
@@ -0,0 +1,141 @@
+"""Tests for incremental (delta) sync of ERP aggregates"""
+
+import pytest
+
+from database.erp_delta import DeltaAggregate
+
+
+class Source:
+    """An aggregated ERP table: rows per part, with an identity high-water mark"""
+
+    def __init__(self, quantities):
+        self.quantities = dict(quantities)
+        self.mark = 1
+        self.changes = []  # (id, part)
+        self.full_loads = 0
+        self.delta_loads = []
+
+    def change(self, part, quantity=None):
+        self.mark += 1
+        self.changes.append((self.mark, part))
+        if quantity is None:
+            self.quantities.pop(part, None)
+        else:
+            self.quantities[part] = quantity
+
+    def load_rows(self, since):
+        if since is None:
+            self.full_loads += 1
+            parts = self.quantities
+        else:
+            parts = {part for mark, part in self.changes if mark > since and part in self.quantities}
+            self.delta_loads.append(sorted(parts))
+        return [{'PartNumber': part, 'qty': self.quantities[part]} for part in sorted(parts)]
+
+    def load_touched(self, since):
+        return {part for mark, part in self.changes if mark > since}
+
+    def aggregate(self, full_interval=3600):
+        return DeltaAggregate(
+            'test', key=lambda row: row['PartNumber'], sort_key=lambda row: row['PartNumber'],
+            load_mark=lambda: self.mark, load_rows=self.load_rows, load_touched=self.load_touched,
+            full_interval=full_interval
+        )
+
+
+def as_dict(rows):
+    return {row['PartNumber']: row['qty'] for row in rows}
+
+
+@pytest.fixture
+def source():
+    return Source({'A': 1, 'B': 2, 'C': 3})
+
+
+def test_first_sync_is_full(source):
+    aggregate = source.aggregate()
+    assert as_dict(aggregate.sync()) == {'A': 1, 'B': 2, 'C': 3}
+    assert source.full_loads == 1
+    assert aggregate.status()['mark'] == 1
+
+
+def test_unchanged_mark_skips_the_query(source):
+    aggregate = source.aggregate()
+    aggregate.sync()
+    aggregate.sync()
+    assert source.delta_loads == []
+    assert aggregate.stats['delta_syncs'] == 0
+
+
+def test_delta_reloads_only_changed_groups(source):
+    aggregate = source.aggregate()
+    aggregate.sync()
+    source.change('B', 20)
+    source.change('D', 4)
+
+    assert as_dict(aggregate.sync()) == {'A': 1, 'B': 20, 'C': 3, 'D': 4}
+    assert source.delta_loads == [['B', 'D']]
+    assert source.full_loads == 1
+    assert aggregate.stats['changed_groups'] == 2
+
+
+def test_touched_group_missing_from_delta_is_removed(source):
+    aggregate = source.aggregate()
+    aggregate.sync()
+    source.change('A')
+    assert as_dict(aggregate.sync()) == {'B': 2, 'C': 3}
+
+
+@pytest.mark.parametrize('edits', [
+    [('B', 20)],
+    [('A', None), ('E', 5)],
+    [('C', 30), ('C', 31), ('B', None), ('F', 6)],
+])
+def test_delta_result_matches_a_full_reload(source, edits):
+    aggregate = source.aggregate()
+    aggregate.sync()
+    for part, quantity in edits:
+        source.change(part, quantity)
+    delta_rows = aggregate.sync()
+    assert delta_rows == source.aggregate().sync()
+    assert [row['PartNumber'] for row in delta_rows] == sorted(as_dict(delta_rows))
+
+
+def test_full_interval_forces_a_full_reload(source):
+    aggregate = source.aggregate(full_interval=0)
+    aggregate.sync()
+    source.change('B', 20)
+    aggregate.sync()
+    assert source.full_loads == 2
+    assert source.delta_loads == []
+
+
+def test_reset_forces_a_full_reload(source):
+    aggregate = source.aggregate()
+    aggregate.sync()
+    aggregate.reset()
+    aggregate.sync()
+    assert source.full_loads == 2
+
+
+def test_failed_delta_keeps_rows_and_retries_from_same_mark(source):
+    aggregate = source.aggregate()
+    aggregate.sync()
+    source.change('B', 20)
+
+    def erp_down(since):
+        raise RuntimeError('ERP down')
+
+    aggregate.load_rows = erp_down
+    assert as_dict(aggregate.sync()) == {'A': 1, 'B': 2, 'C': 3}
+    assert aggregate.stats['errors'] == 1
+
+    aggregate.load_rows = source.load_rows
+    assert as_dict(aggregate.sync()) == {'A': 1, 'B': 20, 'C': 3}
+
+
+def test_empty_full_load_keeps_previous_rows(source):
+    aggregate = source.aggregate(full_interval=0)
+    aggregate.sync()
+    source.quantities.clear()
+    assert as_dict(aggregate.sync()) == {'A': 1, 'B': 2, 'C': 3}
@@ -0,0 +1,99 @@
+"""Tests for the ERP snapshot store and snapshot-backed reads"""
+
+import pytest
+
+from config import Config
+from database.erp_snapshot import ErpSnapshotService, ErpSnapshotStore
+
+
+class CountingStore(ErpSnapshotStore):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connects = 0
+
+    def _connect(self):
+        self.connects += 1
+        return super()._connect()
+
+
+class FakeErp:
+    def __init__(self):
+        self.calls = 0
+        self.boms = [
+            {'Parent Part Number': 'FG-100 ', 'Part Number': 'RM-1'},
+            {'Parent Part Number': 'fg-100', 'Part Number': 'RM-2'},
+            {'Parent Part Number': 'FG-200', 'Part Number': 'RM-3'},
+            {'Parent Part Number': 300, 'Part Number': 'RM-4'},
+        ]
+
+    def get_bom_data(self, parent_part_number=None):
+        self.calls += 1
+        return [dict(row) for row in self.boms]
+
+
+@pytest.fixture
+def snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'ERP_SNAPSHOT_ENABLED', True)
+    service = ErpSnapshotService()
+    service.store = CountingStore(path=str(tmp_path / 'snapshots.db'))
+    service.erp = FakeErp()
+    return service
+
+
+def test_reads_after_save_do_not_touch_sqlite(snapshots):
+    snapshots.store.save('boms', snapshots.erp.get_bom_data())
+    connects = snapshots.store.connects
+
+    for _ in range(5):
+        assert len(snapshots.read('boms')) == 4
+    assert snapshots.store.connects == connects
+
+
+def test_metadata_is_read_once_then_refreshed_on_sync(snapshots, tmp_path):
+    # Written by another process: this store has no metadata for it yet
+    CountingStore(path=snapshots.store.path).save('boms', snapshots.erp.get_bom_data())
+    assert snapshots.store.latest('boms')['row_count'] == 4
+    connects = snapshots.store.connects
+    assert snapshots.store.latest('boms')['row_count'] == 4
+    assert snapshots.store.connects == connects
+
+    snapshots.erp.boms.append({'Parent Part Number': 'FG-300', 'Part Number': 'RM-5'})
+    snapshots.refresh('boms')
+    assert snapshots.store.latest('boms')['row_count'] == 5
+
+
+def test_missing_dataset_is_remembered_until_saved(snapshots):
+    assert snapshots.store.latest('boms') is None
+    connects = snapshots.store.connects
+    assert snapshots.store.latest('boms') is None
+    assert snapshots.store.connects == connects
+
+    snapshots.store.save('boms', snapshots.erp.get_bom_data())
+    assert snapshots.store.latest('boms')['version'] is not None
+
+
+def test_latest_returns_a_copy(snapshots):
+    snapshots.store.save('boms', snapshots.erp.get_bom_data())
+    snapshots.store.latest('boms')['age_seconds'] = 1
+    assert 'age_seconds' not in snapshots.store.latest('boms')
+
+
+def test_stale_snapshot_falls_back_to_erp(snapshots, monkeypatch):
+    snapshots.store.save('boms', snapshots.erp.get_bom_data())
+    calls = snapshots.erp.calls
+    monkeypatch.setattr(Config, 'ERP_SNAPSHOT_MAX_AGE', -1)
+    snapshots.read('boms')
+    assert snapshots.erp.calls == calls + 1
+
+
+@pytest.mark.parametrize('parent', ['FG-100', 'fg-100', ' Fg-100 '])
+def test_bom_parent_filter_ignores_case_and_padding(snapshots, parent):
+    snapshots.store.save('boms', snapshots.erp.get_bom_data())
+    rows = snapshots.get_bom_data(parent)
+    assert [row['Part Number'] for row in rows] == ['RM-1', 'RM-2']
+
+
+def test_bom_parent_filter_matches_non_string_part_numbers(snapshots):
+    snapshots.store.save('boms', snapshots.erp.get_bom_data())
+    assert [row['Part Number'] for row in snapshots.get_bom_data('300')] == ['RM-4']
+    assert snapshots.get_bom_data('FG-999') == []
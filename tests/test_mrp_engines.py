@@ -0,0 +1,233 @@
+"""
+Tests for the MRP allocation engines: the numpy engine and incremental runs
+must give exactly the results of a full python run on the same inputs
+"""
+
+import copy
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from config import Config
+from database.bom_explosion import bom_explosion
+from database.mrp_service import MRPService
+
+FINISHED_GOODS = ['FG-%d' % n for n in range(1, 7)]
+COMPONENTS = ['RM-%d' % n for n in range(1, 13)]
+
+
+def make_inputs(seed=7, orders=80):
+    """A small plant with shared components, one shared sub-assembly and scarce stock"""
+    rng = random.Random(seed)
+    boms = []
+    for fg in FINISHED_GOODS:
+        for part in rng.sample(COMPONENTS, 3):
+            boms.append({'Parent Part Number': fg, 'Part Number': part, 'Quantity': rng.choice([1, 2, 0.5]),
+                         'Scrap %': rng.choice([0, 0, 5]), 'Description': part, 'Revision ID': 1})
+    for fg in FINISHED_GOODS[:3]:
+        boms.append({'Parent Part Number': fg, 'Part Number': 'SUB-1', 'Quantity': 1, 'Scrap %': 0,
+                     'Description': 'Sub-assembly', 'Revision ID': 1})
+    for part in ('RM-1', 'RM-2'):
+        boms.append({'Parent Part Number': 'SUB-1', 'Part Number': part, 'Quantity': 2, 'Scrap %': 10,
+                     'Description': part, 'Revision ID': 1})
+
+    start = date(2026, 1, 5)
+    sales_orders = []
+    for n in range(orders):
+        due = start + timedelta(days=rng.randrange(60))
+        sales_orders.append({'SO': 100000 + n * 100, 'Part': rng.choice(FINISHED_GOODS),
+                             'Ord Qty - Cur. Level': rng.randrange(10, 200),
+                             'Due to Ship': due.strftime('%m/%d/%Y'), 'Customer Name': f'Customer {n % 5}'})
+
+    component_inventory = {
+        part: {'approved': rng.randrange(2000, 6000), 'pending_qc': rng.choice([0, 0, 50]),
+               'quarantine': 0, 'issued_to_job': 0, 'staged': 0}
+        for part in COMPONENTS
+    }
+    finished_good_inventory = [
+        {'PartNumber': fg, 'on_hand_approved': rng.randrange(0, 300), 'on_hand_pending_qc': rng.choice([0, 40]),
+         'TotalOnHand': 0}
+        for fg in FINISHED_GOODS
+    ]
+    purchase_orders = [{'Part Number': part, 'OpenPOQuantity': rng.randrange(0, 500)} for part in COMPONENTS[::2]]
+    open_jobs = [{'so_number': sales_orders[n]['SO'], 'jo_jobnum': 5000 + n, 'job_quantity': 50,
+                  'completed_quantity': 10} for n in range(0, orders, 9)]
+    return {
+        'sales_orders': sales_orders,
+        'boms': boms,
+        'purchase_orders': purchase_orders,
+        'component_inventory': component_inventory,
+        'finished_good_inventory': finished_good_inventory,
+        'open_jobs': open_jobs,
+        'capacities': [{'line_id': 1, 'capacity_per_shift': 500}],
+    }
+
+
+def run(service, inputs, engine='python', full=False):
+    # The engines sort and annotate the sales order rows in place
+    return service.calculate_mrp_suggestions(engine=engine, inputs=copy.deepcopy(inputs), full=full)
+
+
+@pytest.fixture(autouse=True, params=[False, True], ids=['single-level', 'multi-level'])
+def bom_levels(request, monkeypatch):
+    monkeypatch.setattr(bom_explosion, 'multi_level', request.param)
+    return request.param
+
+
+@pytest.fixture(params=[False, True], ids=['allocation', 'time-phased'])
+def time_phased(request, monkeypatch):
+    monkeypatch.setattr(Config, 'MRP_TIME_PHASED', request.param)
+    return request.param
+
+
+def test_inputs_have_shortages():
+    results = run(MRPService(), make_inputs())
+    statuses = {result['status'] for result in results}
+    assert {'ok', 'critical', 'ready-to-ship', 'job-created'} <= statuses
+
+
+@pytest.mark.parametrize('seed', [1, 7, 42])
+def test_numpy_engine_matches_python_engine(monkeypatch, time_phased, seed):
+    pytest.importorskip('numpy')
+    monkeypatch.setattr(Config, 'MRP_INCREMENTAL', False)
+    inputs = make_inputs(seed)
+    assert run(MRPService(), inputs, 'numpy') == run(MRPService(), inputs, 'python')
+
+
+def test_compare_engine_finds_no_mismatches(monkeypatch):
+    pytest.importorskip('numpy')
+    monkeypatch.setattr(Config, 'MRP_INCREMENTAL', False)
+    service = MRPService()
+    inputs = make_inputs()
+    assert run(service, inputs, 'compare') == run(MRPService(), inputs, 'python')
+    assert service.last_engine_comparison['mismatches'] == []
+
+
+def change_component_stock(inputs):
+    inputs['component_inventory']['RM-3']['approved'] += 400
+
+
+def change_order_quantity(inputs):
+    inputs['sales_orders'][10]['Ord Qty - Cur. Level'] += 75
+
+
+def remove_order(inputs):
+    del inputs['sales_orders'][5]
+
+
+def add_urgent_order(inputs):
+    inputs['sales_orders'].append({'SO': 999900, 'Part': 'FG-1', 'Ord Qty - Cur. Level': 120,
+                                   'Due to Ship': '01/01/2026', 'Customer Name': 'Customer 9'})
+
+
+def move_order_earlier(inputs):
+    inputs['sales_orders'][30]['Due to Ship'] = '01/02/2026'
+
+
+def change_purchase_order(inputs):
+    inputs['purchase_orders'][0]['OpenPOQuantity'] += 900
+
+
+def change_finished_good_stock(inputs):
+    inputs['finished_good_inventory'][2]['on_hand_approved'] += 150
+
+
+def change_sub_assembly_bom(inputs):
+    for row in inputs['boms']:
+        if row['Parent Part Number'] == 'SUB-1' and row['Part Number'] == 'RM-2':
+            row['Quantity'] = 3
+            row['Revision ID'] = 2
+
+
+def add_job(inputs):
+    inputs['open_jobs'].append({'so_number': inputs['sales_orders'][20]['SO'], 'jo_jobnum': 9999,
+                                'job_quantity': 80, 'completed_quantity': 0})
+
+
+@pytest.mark.parametrize('change', [
+    change_component_stock, change_order_quantity, remove_order, add_urgent_order, move_order_earlier,
+    change_purchase_order, change_finished_good_stock, change_sub_assembly_bom, add_job,
+])
+def test_incremental_run_matches_full_run(monkeypatch, time_phased, change):
+    monkeypatch.setattr(Config, 'MRP_INCREMENTAL', True)
+    service = MRPService()
+    inputs = make_inputs()
+    run(service, inputs)
+
+    changed = copy.deepcopy(inputs)
+    change(changed)
+    incremental = run(service, changed)
+    recomputed = service.last_run_counts['recomputed']
+
+    assert incremental == run(MRPService(), changed)
+    assert recomputed < len(changed['sales_orders'])
+
+
+def test_unchanged_inputs_recompute_nothing(monkeypatch):
+    monkeypatch.setattr(Config, 'MRP_INCREMENTAL', True)
+    service = MRPService()
+    inputs = make_inputs()
+    first = run(service, inputs)
+    assert run(service, inputs) == first
+    assert service.last_run_counts == {'orders': len(inputs['sales_orders']), 'recomputed': 0}
+
+
+def test_full_flag_recomputes_every_order(monkeypatch):
+    monkeypatch.setattr(Config, 'MRP_INCREMENTAL', True)
+    service = MRPService()
+    inputs = make_inputs()
+    first = run(service, inputs)
+    assert run(service, inputs, full=True) == first
+    assert service.last_run_counts['recomputed'] == len(inputs['sales_orders'])
+
+
+def test_chained_incremental_runs_stay_exact(monkeypatch):
+    monkeypatch.setattr(Config, 'MRP_INCREMENTAL', True)
+    service = MRPService()
+    inputs = make_inputs()
+    run(service, inputs)
+    for change in (change_component_stock, remove_order, add_urgent_order, change_sub_assembly_bom):
+        change(inputs)
+        assert run(service, inputs) == run(MRPService(), inputs)
+
+
+def with_bomless_orders(inputs):
+    """FG-ZERO lists components only at zero quantity; FG-NONE has no BOM rows at all"""
+    inputs['boms'].append({'Parent Part Number': 'FG-ZERO', 'Part Number': 'RM-1', 'Quantity': 0, 'Scrap %': 0,
+                           'Description': 'RM-1', 'Revision ID': 1})
+    for n, part in enumerate(('FG-ZERO', 'FG-NONE')):
+        inputs['sales_orders'].append({'SO': 990000 + n * 100, 'Part': part, 'Ord Qty - Cur. Level': 25,
+                                       'Due to Ship': '01/20/2026', 'Customer Name': 'Customer 9'})
+    return inputs
+
+
+def by_part(results):
+    return {result['sales_order']['Part']: result for result in results}
+
+
+@pytest.mark.parametrize('engine,incremental', [('python', False), ('python', True), ('numpy', False)])
+def test_bom_with_only_zero_quantities_is_not_missing(monkeypatch, engine, incremental):
+    if engine == 'numpy':
+        pytest.importorskip('numpy')
+    monkeypatch.setattr(Config, 'MRP_INCREMENTAL', incremental)
+    results = by_part(run(MRPService(), with_bomless_orders(make_inputs()), engine))
+
+    assert results['FG-ZERO']['status'] == 'ok'
+    assert results['FG-ZERO']['producible_qty'] == 25
+    assert results['FG-ZERO']['components'] == []
+    assert results['FG-NONE']['status'] == 'critical'
+    assert results['FG-NONE']['bottleneck'] == 'No BOM Found'
+
+
+def test_incremental_run_notices_a_zero_quantity_bom_appearing(monkeypatch):
+    monkeypatch.setattr(Config, 'MRP_INCREMENTAL', True)
+    service = MRPService()
+    inputs = with_bomless_orders(make_inputs())
+    run(service, inputs)
+
+    inputs['boms'].append({'Parent Part Number': 'FG-NONE', 'Part Number': 'RM-2', 'Quantity': 0, 'Scrap %': 0,
+                           'Description': 'RM-2', 'Revision ID': 1})
+    incremental = run(service, inputs)
+    assert incremental == run(MRPService(), inputs)
+    assert by_part(incremental)['FG-NONE']['status'] == 'ok'
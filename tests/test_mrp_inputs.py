@@ -0,0 +1,181 @@
+"""Tests for MRP input fetching and the refusal to run without required data"""
+
+import sys
+import threading
+
+import pytest
+
+from config import Config
+from database.mrp_results import MRPResultCache, MRPRunStore
+from database.mrp_service import MRPInputError, MRPService
+
+# `database` re-exports the service instance under the module's name
+service_module = sys.modules['database.mrp_service']
+
+
+DATASETS = {
+    'open_orders': [],
+    'boms': [{'Parent Part Number': 'FG', 'Part Number': 'RM', 'Quantity': 1, 'Scrap': 0}],
+    'purchase_orders': [],
+    'dated_purchase_orders': [],
+    'raw_material_inventory': [{'PartNumber': 'RM', 'on_hand_approved': 5}],
+    'on_hand_inventory': [],
+    'open_jobs': [],
+}
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    """Snapshot datasets the MRP reads; names listed in `failing` raise"""
+    failing = set()
+
+    def read(dataset):
+        if dataset in failing:
+            raise RuntimeError(f'{dataset} unavailable')
+        return list(DATASETS[dataset])
+
+    monkeypatch.setattr(service_module.erp_snapshots, 'read', read)
+    monkeypatch.setattr(service_module.capacity_db, 'get_all', lambda: [])
+    return failing
+
+
+def test_fetch_inputs_reports_no_failures(sources):
+    inputs, failed = MRPService().fetch_inputs()
+    assert failed == []
+    assert inputs['boms'] == DATASETS['boms']
+    assert inputs['component_inventory']['RM']['approved'] == 5
+
+
+def test_all_sources_are_fetched_at_once(sources, monkeypatch):
+    monkeypatch.setattr(Config, 'MRP_TIME_PHASED', True)
+    # Every fetch waits for all the others; one left queued breaks the barrier
+    barrier = threading.Barrier(8, timeout=5)
+
+    def read(dataset):
+        barrier.wait()
+        return list(DATASETS[dataset])
+
+    def get_all():
+        barrier.wait()
+        return []
+
+    monkeypatch.setattr(service_module.erp_snapshots, 'read', read)
+    monkeypatch.setattr(service_module.capacity_db, 'get_all', get_all)
+    inputs, failed = MRPService().fetch_inputs()
+    assert failed == []
+    assert len(inputs) == 8
+
+
+def test_failed_source_comes_back_empty_and_listed(sources):
+    sources.add('purchase_orders')
+    service = MRPService()
+    inputs, failed = service.fetch_inputs()
+    assert failed == ['purchase_orders']
+    assert inputs['purchase_orders'] == []
+    assert service.last_fetch_report['purchase_orders']['status'] == 'error'
+    service.check_inputs(failed)  # Optional source: the run may go ahead
+
+
+@pytest.mark.parametrize('dataset,source', [
+    ('boms', 'boms'),
+    ('open_orders', 'sales_orders'),
+    ('raw_material_inventory', 'component_inventory'),
+    ('on_hand_inventory', 'finished_good_inventory'),
+])
+def test_missing_required_source_refuses_to_compute(sources, dataset, source):
+    sources.add(dataset)
+    with pytest.raises(MRPInputError) as raised:
+        MRPService().calculate_mrp_suggestions()
+    assert raised.value.sources == [source]
+    assert source in str(raised.value)
+
+
+def test_run_cache_keeps_last_result_when_required_source_fails(sources, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'MRP_TIME_PHASED', False)
+    monkeypatch.setattr(Config, 'MRP_RESULT_CHECK_SECONDS', 0)
+    cache = MRPResultCache(service=MRPService(), store=MRPRunStore(path=str(tmp_path / 'runs.db')))
+    good = cache.get(trigger='test')
+    assert cache.last_error is None
+
+    sources.add('boms')
+    assert cache.get(force=True, trigger='test') is good
+    assert 'boms' in cache.last_error
+    history = cache.store.history()
+    assert [run['status'] for run in history] == ['error', 'ok']
+
+    sources.clear()
+    assert cache.get(trigger='test') is good  # Same inputs as the good run
+    assert cache.last_error is None
+
+
+@pytest.fixture
+def cache(sources, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'MRP_TIME_PHASED', False)
+    monkeypatch.setattr(Config, 'MRP_RESULT_CHECK_SECONDS', 0)
+    return MRPResultCache(service=MRPService(), store=MRPRunStore(path=str(tmp_path / 'runs.db')))
+
+
+def test_missing_optional_source_keeps_last_complete_run(sources, cache):
+    good = cache.get(trigger='test')
+    sources.add('purchase_orders')
+
+    assert cache.get(force=True, trigger='test') is good
+    assert cache.current() is good
+    assert cache.last_error == 'Could not fetch purchase_orders'
+    assert cache.stats['degraded'] == 1
+    degraded = cache.store.history()[0]
+    assert degraded['status'] == 'degraded'
+    assert degraded['error'] == 'Could not fetch purchase_orders'
+    assert cache.store.latest()['version'] == good['version']
+
+
+def test_degraded_run_is_served_until_a_complete_one(sources, cache):
+    sources.add('open_jobs')
+    degraded = cache.get(trigger='test')
+    assert degraded['status'] == 'degraded'
+    assert degraded['error'] == 'Could not fetch open_jobs'
+    assert cache.last_error is None  # Served, flagged on the run itself
+
+    sources.clear()
+    complete = cache.get(trigger='test')
+    assert complete['status'] == 'ok'
+    assert complete['version'] > degraded['version']
+
+
+def test_restart_prefers_the_last_complete_run(sources, cache):
+    good = cache.get(trigger='test')
+    sources.add('purchase_orders')
+    cache._latest = None  # Nothing complete in memory: the degraded run is served and stored
+    cache.get(force=True, trigger='test')
+
+    restarted = MRPResultCache(service=cache.service, store=cache.store)
+    assert restarted.current()['version'] == good['version']
+
+
+def test_restored_run_rebuilds_its_time_phased_plan(sources, cache, monkeypatch):
+    monkeypatch.setattr(Config, 'MRP_TIME_PHASED', True)
+    first = cache.get(trigger='test')
+    assert first['time_phased'] is not None
+
+    # Plans are not stored, so the restored run must not be served as up to date
+    restarted = MRPResultCache(service=MRPService(), store=cache.store)
+    rebuilt = restarted.get(trigger='test')  # Same inputs, same day
+    assert rebuilt['time_phased'] is not None
+    assert rebuilt['version'] > first['version']
+    assert restarted.get(trigger='test') is rebuilt
+
+
+def test_create_app_can_skip_background_services(monkeypatch):
+    import app as portal
+    from database.erp_snapshot import erp_snapshots
+    from database.mrp_results import mrp_result_cache
+    from database.open_jobs_index import open_jobs_index
+
+    started = []
+    for service in (erp_snapshots, open_jobs_index, mrp_result_cache):
+        monkeypatch.setattr(service, 'start', lambda service=service: started.append(service))
+
+    portal.create_app(start_background=False)
+    assert started == []
+    portal.create_app()
+    assert started == [erp_snapshots, open_jobs_index, mrp_result_cache]
@@ -0,0 +1,116 @@
+"""Tests for MRP allocation pegging and the lazily built 'shared with' lines"""
+
+import copy
+
+import pytest
+
+from config import Config
+from database.mrp_pegging import AllocationLog
+from database.mrp_results import MRPResultCache
+from database.mrp_service import MRPService
+from tests.test_mrp_engines import make_inputs
+
+
+def make_log():
+    log = AllocationLog()
+    log.add('RM-1', 100, 10)
+    log.add('RM-1', 200, 5)
+    log.add('RM-2', 200, 7)
+    log.add('RM-1', 100, 2.5)
+    log.add('RM-1', 300, 1)
+    return log
+
+
+def test_positions_count_allocations_per_part():
+    log = make_log()
+    assert log.position('RM-1') == 4
+    assert log.position('RM-2') == 1
+    assert log.position('RM-9') == 0
+
+
+def test_allocated_to_others_excludes_the_order_itself():
+    log = make_log()
+    assert log.allocated_to_others('RM-1', 100) == 6
+    assert log.allocated_to_others('RM-1', 300) == 17.5
+    assert log.allocated_to_others('RM-1', 400) == 18.5
+    assert log.allocated_to_others('RM-2', 200) == 0
+    assert log.allocated_to_others('RM-9', 100) == 0
+
+
+def test_shared_with_lists_earlier_orders_up_to_the_position():
+    log = make_log()
+    assert log.shared_with('RM-1', 200, 2) == [
+        'Total Allocated to Prior SOs: 10.00',
+        '  - SO 100: 10.00',
+    ]
+    assert log.shared_with('RM-1', 300, 4) == [
+        'Total Allocated to Prior SOs: 17.50',
+        '  - SO 100: 10.00',
+        '  - SO 200: 5.00',
+        '  - SO 100: 2.50',
+    ]
+
+
+def test_shared_with_ignores_the_order_itself_whatever_its_type():
+    log = make_log()
+    assert log.shared_with('RM-1', '100', 1) == []
+    assert log.shared_with('RM-2', 200, 1) == []
+    assert log.shared_with('RM-9', 100, 3) == []
+
+
+def test_from_results_rebuilds_the_log():
+    log = make_log()
+    results = [
+        {'sales_order': {'SO': 100}, 'components': [
+            {'part_number': 'RM-1', 'allocated_for_this_so': 10, 'pegging_position': 1}]},
+        {'sales_order': {'SO': 200}, 'components': [
+            {'part_number': 'RM-1', 'allocated_for_this_so': 5, 'pegging_position': 2},
+            {'part_number': 'RM-2', 'allocated_for_this_so': 7, 'pegging_position': 1},
+            {'part_number': 'RM-3', 'allocated_for_this_so': 0, 'pegging_position': 0}]},
+        # Results come back sorted by SO, not in allocation order
+        {'sales_order': {'SO': 300}, 'components': [
+            {'part_number': 'RM-1', 'allocated_for_this_so': 1, 'pegging_position': 4}]},
+        {'sales_order': {'SO': 100}, 'components': [
+            {'part_number': 'RM-1', 'allocated_for_this_so': 2.5, 'pegging_position': 3}]},
+    ]
+    rebuilt = AllocationLog.from_results(results)
+    for part, so_number, position in [('RM-1', 300, 4), ('RM-1', 200, 2), ('RM-2', 100, 1)]:
+        assert rebuilt.shared_with(part, so_number, position) == log.shared_with(part, so_number, position)
+    assert rebuilt.position('RM-3') == 0
+
+
+def test_rebuilt_log_matches_the_run_for_every_component_row(monkeypatch):
+    monkeypatch.setattr(Config, 'MRP_TIME_PHASED', False)
+    results = MRPService().calculate_mrp_suggestions(engine='python', inputs=copy.deepcopy(make_inputs()))
+    rebuilt = AllocationLog.from_results(results)
+
+    checked = 0
+    for result in results:
+        so_number = result['sales_order']['SO']
+        for component in result['components']:
+            lines = rebuilt.shared_with(component['part_number'], so_number, component['pegging_position'])
+            if component['allocated_to_prior_sos']:
+                # Summed in a different order than the run's running total
+                total = float(lines[0].split(': ')[1].replace(',', ''))
+                assert total == pytest.approx(component['allocated_to_prior_sos'], abs=0.01)
+                checked += 1
+            else:
+                assert lines == []
+    assert checked > 0
+
+
+def test_result_cache_serves_shared_with_for_the_current_version_only():
+    cache = MRPResultCache(service=object(), store=object())
+    cache._latest = {'version': 3, 'results': [
+        {'sales_order': {'SO': 100}, 'components': [
+            {'part_number': 'RM-1', 'allocated_for_this_so': 10, 'pegging_position': 1}]},
+        {'sales_order': {'SO': 200}, 'components': [
+            {'part_number': 'RM-1', 'allocated_for_this_so': 5, 'pegging_position': 2}]},
+    ]}
+    assert cache.shared_with(3, '200', [('RM-1', 2)]) == [
+        ['Total Allocated to Prior SOs: 10.00', '  - SO 100: 10.00']
+    ]
+    log = cache._latest['allocation_log']
+    cache.shared_with(3, '200', [('RM-1', 2)])
+    assert cache._latest['allocation_log'] is log  # Built once per run
+    assert cache.shared_with(2, '200', [('RM-1', 2)]) is None
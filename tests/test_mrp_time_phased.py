@@ -0,0 +1,141 @@
+"""Tests for time-phased MRP netting"""
+
+from datetime import date
+
+import pytest
+
+from config import Config
+from database.mrp_service import MRPService
+from database.mrp_time_phased import TimePhasedPlan
+
+TODAY = date(2026, 3, 4)  # A Wednesday
+
+
+def plan(bucket='day'):
+    return TimePhasedPlan(bucket, today=TODAY)
+
+
+def test_day_buckets_are_days():
+    day = plan('day')
+    assert day.bucket_of_text('03/05/2026') == date(2026, 3, 5).toordinal()
+    assert day.bucket_of_text('03/05/2026') != day.bucket_of_text('03/06/2026')
+
+
+@pytest.mark.parametrize('text,monday', [
+    ('03/09/2026', date(2026, 3, 9)),   # Monday starts its own week
+    ('03/15/2026', date(2026, 3, 9)),   # Sunday belongs to the week before it
+    ('03/16/2026', date(2026, 3, 16)),
+    ('01/01/2027', date(2026, 12, 28)),  # Weeks cross the year end
+])
+def test_week_buckets_start_on_monday(text, monday):
+    assert plan('week').bucket_of_text(text) == monday.toordinal()
+
+
+def test_past_dates_fall_in_the_current_bucket():
+    assert plan('day').bucket_of_text('01/15/2026') == TODAY.toordinal()
+    # Earlier this week is the current week bucket
+    assert plan('week').bucket_of_text('03/02/2026') == date(2026, 3, 2).toordinal()
+    assert plan('week').bucket_of_text('02/20/2026') == date(2026, 3, 2).toordinal()
+
+
+@pytest.mark.parametrize('text', [None, '', '2026-03-05', '13/45/2026', 'soon', 20260305])
+def test_unparseable_dates_have_no_bucket(text):
+    assert plan().bucket_of_text(text) is None
+
+
+def test_unknown_bucket_size_means_days():
+    assert TimePhasedPlan('month', today=TODAY).bucket == 'day'
+
+
+def test_missing_or_unparseable_promise_dates_count_as_available_now():
+    p = plan()
+    p.add_supply('RM-1', 10, None)
+    p.add_supply('RM-1', 5, 'not a date')
+    p.add_supply('RM-1', 7, '12/31/2025')  # Past due
+    p.build()
+    assert p.supply_through('RM-1', TODAY.toordinal()) == 22
+
+
+def test_net_counts_only_supply_promised_by_the_bucket():
+    p = plan()
+    p.add_supply('RM-1', 10)
+    p.add_supply('RM-1', 50, '03/10/2026')
+    p.build()
+
+    assert p.net('RM-1', p.bucket_of_text('03/05/2026'), 30) == (10, 20)
+    assert p.net('RM-1', p.bucket_of_text('03/12/2026'), 20) == (60, 0)
+
+
+def test_earlier_needs_come_first_including_uncovered_ones():
+    p = plan()
+    p.add_supply('RM-1', 40, '03/10/2026')
+    p.build()
+
+    # Nothing is there on the 5th; the receipt on the 10th covers this order first
+    assert p.net('RM-1', p.bucket_of_text('03/05/2026'), 30) == (0, 30)
+    assert p.net('RM-1', p.bucket_of_text('03/11/2026'), 20) == (40, 10)
+
+
+def test_week_buckets_net_receipts_within_the_same_week():
+    p = plan('week')
+    p.add_supply('RM-1', 25, '03/13/2026')  # Friday
+    p.build()
+    assert p.net('RM-1', p.bucket_of_text('03/09/2026'), 25) == (25, 0)  # Monday, same week
+
+
+def test_undated_demand_sees_all_supply():
+    p = plan()
+    p.add_supply('RM-1', 5)
+    p.add_supply('RM-1', 5, '12/01/2026')
+    p.build()
+    assert p.net('RM-1', p.UNDATED, 12) == (10, 2)
+
+
+def test_unknown_part_has_no_supply():
+    p = plan()
+    p.build()
+    assert p.net('RM-9', TODAY.toordinal(), 3) == (0, 3)
+    assert p.projection('RM-9') == [{'bucket': TODAY, 'receipts': 0, 'demand': 3, 'balance': -3}]
+
+
+def test_projection_lists_buckets_with_activity():
+    p = plan('week')
+    p.add_supply('RM-1', 10)
+    p.add_supply('RM-1', 30, '03/18/2026')
+    p.build()
+    p.net('RM-1', p.bucket_of_text('03/04/2026'), 15)
+    p.net('RM-1', p.bucket_of_text('03/19/2026'), 20)
+    p.net('RM-1', p.UNDATED, 1)
+
+    assert p.projection('RM-1') == [
+        {'bucket': date(2026, 3, 2), 'receipts': 10, 'demand': 15, 'balance': -5},
+        {'bucket': date(2026, 3, 16), 'receipts': 30, 'demand': 20, 'balance': 5},
+        {'bucket': None, 'receipts': 0, 'demand': 1, 'balance': 4},
+    ]
+    assert plan().projection('RM-1') == []
+
+
+def test_mrp_nets_against_dated_pos_and_allocates_against_per_part_pos(monkeypatch):
+    monkeypatch.setattr(Config, 'MRP_TIME_PHASED', True)
+    monkeypatch.setattr(Config, 'MRP_TIME_BUCKET', 'day')
+    inputs = {
+        'sales_orders': [{'SO': 100, 'Part': 'FG-1', 'Ord Qty - Cur. Level': 10, 'Due to Ship': '01/05/2099'}],
+        'boms': [{'Parent Part Number': 'FG-1', 'Part Number': 'RM-1', 'Quantity': 1, 'Scrap %': 0}],
+        'purchase_orders': [{'Part Number': 'RM-1', 'OpenPOQuantity': 30}],
+        'dated_purchase_orders': [
+            {'Part Number': 'RM-1', 'Promise Date': '01/02/2099', 'OpenPOQuantity': 4},
+            {'Part Number': 'RM-1', 'Promise Date': '02/01/2099', 'OpenPOQuantity': 26},
+        ],
+        'component_inventory': {'RM-1': {'approved': 2, 'pending_qc': 0}},
+        'finished_good_inventory': [],
+        'open_jobs': [],
+        'capacities': [],
+    }
+    service = MRPService()
+    component = service.calculate_mrp_suggestions(engine='python', inputs=inputs)[0]['components'][0]
+
+    assert component['open_po_qty'] == 30
+    assert component['shortfall'] == 0
+    assert component['available_by_ship_date'] == 6
+    assert component['shortfall_by_ship_date'] == 4
+    assert [row['receipts'] for row in service.last_time_phased.projection('RM-1')] == [2, 4, 0, 26]
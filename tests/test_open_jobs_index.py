@@ -0,0 +1,91 @@
+"""Tests for the open jobs index behind the downtime job picker"""
+
+import threading
+import time
+
+import pytest
+
+from config import Config
+from database.open_jobs_index import OpenJobsIndex
+
+
+class FakeErp:
+    """Returns one job per load, numbered by load; can be told to block or fail"""
+
+    def __init__(self):
+        self.calls = 0
+        self.gate = None
+        self.fail = False
+
+    def get_all_open_jobs_by_line(self):
+        if self.gate is not None:
+            self.gate.wait(1)
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError('ERP unavailable')
+        return [{'Facility': 'east', 'ProductionLine': ' Line 1 ', 'JobNumber': self.calls}]
+
+
+def wait_for(condition, timeout=1):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(Config, 'OPEN_JOBS_INDEX_MAX_AGE', 600)
+    monkeypatch.setattr(Config, 'OPEN_JOBS_MIN_REFRESH', 15)
+    index = OpenJobsIndex()
+    index.erp = FakeErp()
+    return index
+
+
+def age(index, seconds):
+    index._refreshed = time.monotonic() - seconds
+
+
+def test_first_lookup_loads_the_index(index):
+    assert index.lookup('EAST', 'line 1') == [{'Facility': 'east', 'ProductionLine': ' Line 1 ', 'JobNumber': 1}]
+    assert index.lookup('east', 'Line 2') == []
+    assert index.erp.calls == 1
+
+
+def test_lookup_returns_none_when_the_index_never_loaded(index):
+    index.erp.fail = True
+    assert index.lookup('EAST', 'LINE 1') is None
+    assert index.last_error == 'ERP unavailable'
+
+
+def test_stale_index_is_served_while_one_background_reload_runs(index):
+    index.lookup('EAST', 'LINE 1')
+    age(index, 700)
+    index.erp.gate = threading.Event()
+
+    # Both lookups answer at once from the old index instead of waiting for the ERP
+    assert index.lookup('EAST', 'LINE 1')[0]['JobNumber'] == 1
+    assert index.lookup('EAST', 'LINE 1')[0]['JobNumber'] == 1
+
+    index.erp.gate.set()
+    wait_for(lambda: not index._refreshing)
+    assert index.erp.calls == 2
+    assert index.lookup('EAST', 'LINE 1')[0]['JobNumber'] == 2
+
+
+def test_failed_background_reload_keeps_the_old_index(index):
+    index.lookup('EAST', 'LINE 1')
+    age(index, 700)
+    index.erp.fail = True
+
+    assert index.lookup('EAST', 'LINE 1')[0]['JobNumber'] == 1
+    wait_for(lambda: index.erp.calls == 2 and not index._refreshing)
+    assert index.last_error == 'ERP unavailable'
+    assert index.lookup('EAST', 'LINE 1')[0]['JobNumber'] == 1
+
+
+def test_forced_refresh_reloads_before_answering_but_not_too_often(index):
+    index.lookup('EAST', 'LINE 1')
+    assert index.lookup('EAST', 'LINE 1', force_refresh=True)[0]['JobNumber'] == 1  # Just loaded
+    age(index, 20)
+    assert index.lookup('EAST', 'LINE 1', force_refresh=True)[0]['JobNumber'] == 2
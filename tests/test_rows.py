@@ -0,0 +1,128 @@
+"""Tests for the compact Row result type and its JSON serialization"""
+
+import json
+from decimal import Decimal
+
+import pytest
+from flask import Flask, jsonify, render_template_string
+
+from app import PortalJSONProvider
+from database.connection import Row, RowColumns
+
+
+def make_row(**values):
+    return Row(RowColumns(values.keys()), tuple(values.values()))
+
+
+def test_lookup_ignores_column_case():
+    row = make_row(Part_Number='A-100', Qty=5)
+    assert row['Part_Number'] == 'A-100'
+    assert row['part_number'] == 'A-100'
+    assert row['QTY'] == 5
+    assert row.get('qty') == 5
+    assert row.get('missing') is None
+    assert row.get('missing', 0) == 0
+    with pytest.raises(KeyError):
+        row['missing']
+
+
+def test_columns_share_one_layout():
+    columns = RowColumns(['Part', 'Qty'])
+    first = Row(columns, ('A', 1))
+    second = Row(columns, ('B', 2))
+    assert first._columns is second._columns
+    assert columns.find('PART') == 0
+    assert columns.find('nope') is None
+
+
+def test_membership_ignores_case_and_includes_extra_keys():
+    row = make_row(Part='A')
+    assert 'Part' in row
+    assert 'part' in row
+    assert 'Qty' not in row
+    row['Qty'] = 3
+    assert 'qty' in row
+
+
+def test_assignment_to_column_copies_values():
+    columns = RowColumns(['Part', 'Qty'])
+    values = ('A', 1)
+    row = Row(columns, values)
+    other = Row(columns, values)
+    row['qty'] = 7
+
+    assert row['Qty'] == 7
+    assert other['Qty'] == 1
+    assert row.keys() == ['Part', 'Qty']
+
+
+def test_assignment_of_new_key_keeps_first_casing():
+    row = make_row(Part='A')
+    row['Status'] = 'open'
+    row['STATUS'] = 'closed'
+
+    assert row.keys() == ['Part', 'Status']
+    assert row['status'] == 'closed'
+    assert len(row) == 2
+    del row['status']
+    assert 'Status' not in row
+    with pytest.raises(KeyError):
+        del row['Part']  # Query columns cannot be removed
+
+
+def test_update_and_setdefault():
+    row = make_row(Part='A', Qty=1)
+    row.update({'qty': 2}, Note='x')
+    assert row.setdefault('note', 'y') == 'x'
+    assert row.setdefault('Extra', 0) == 0
+    assert row.to_dict() == {'Part': 'A', 'Qty': 2, 'Note': 'x', 'Extra': 0}
+
+
+def test_equality_with_dict_and_row():
+    row = make_row(Part='A', Qty=1)
+    assert row == {'Part': 'A', 'Qty': 1}
+    assert {'Part': 'A', 'Qty': 1} == row
+    assert row != {'Part': 'A', 'Qty': 2}
+    assert row != {'part': 'A', 'qty': 1}  # Dict keys keep the column casing
+    assert row == make_row(Part='A', Qty=1)
+    assert row != ['A', 1]
+    with pytest.raises(TypeError):
+        hash(row)
+
+
+def test_dict_copy_and_iteration_use_original_casing():
+    row = make_row(Part='A', Qty=1)
+    assert dict(row) == {'Part': 'A', 'Qty': 1}
+    assert list(row) == ['Part', 'Qty']
+    assert row.items() == [('Part', 'A'), ('Qty', 1)]
+    copy = row.copy()
+    copy['Part'] = 'B'
+    assert row['Part'] == 'A'
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.json = PortalJSONProvider(app)
+    return app
+
+
+def test_json_provider_serializes_rows(app):
+    row = make_row(Part='A', Qty=Decimal('2.5'))
+    row['Status'] = 'open'
+
+    data = json.loads(app.json.dumps({'rows': [row]}))
+    assert data == {'rows': [{'Part': 'A', 'Qty': '2.5', 'Status': 'open'}]}
+
+
+def test_jsonify_and_tojson_filter_serialize_rows(app):
+    row = make_row(Part='A', Qty=1)
+    with app.test_request_context():
+        assert jsonify([row]).get_json() == [{'Part': 'A', 'Qty': 1}]
+        rendered = render_template_string('{{ row|tojson }}', row=row)
+        assert json.loads(rendered) == {'Part': 'A', 'Qty': 1}
+
+
+def test_json_provider_still_rejects_unknown_types(app):
+    with pytest.raises(TypeError):
+        app.json.dumps(object())
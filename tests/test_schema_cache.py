@@ -0,0 +1,67 @@
+"""Tests for the schema metadata cache"""
+
+from database.schema_cache import ColumnNames, SchemaCache
+
+
+class FakeDb:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def execute_query(self, query, params=None):
+        self.queries += 1
+        if 'TABLE_CATALOG' in query:
+            return self.rows
+        return [row for row in self.rows if row['TABLE_NAME'].lower() == params[0].lower()]
+
+
+def make_cache(rows):
+    cache = SchemaCache()
+    cache.db = FakeDb(rows)
+    return cache
+
+
+ROWS = [
+    {'TABLE_NAME': 'Downtimes', 'COLUMN_NAME': 'crew_size'},
+    {'TABLE_NAME': 'Downtimes', 'COLUMN_NAME': 'ERP_Job_Number'},
+    {'TABLE_NAME': 'Facilities', 'COLUMN_NAME': 'facility_id'},
+]
+
+
+def test_column_names_keep_casing_but_match_any_case():
+    columns = ColumnNames(['crew_size', 'ERP_Job_Number'])
+    assert set(columns) == {'crew_size', 'ERP_Job_Number'}
+    assert 'CREW_SIZE' in columns
+    assert 'erp_job_number' in columns
+    assert 'missing' not in columns
+    assert None not in columns
+    assert columns.has_all(['Crew_Size', 'erp_JOB_number'])
+    assert not columns.has_all(['crew_size', 'missing'])
+
+
+def test_has_column_ignores_case_of_table_and_column():
+    cache = make_cache(ROWS)
+    cache.load()
+    assert cache.has_column('Downtimes', 'crew_size')
+    assert cache.has_column('downtimes', 'Crew_Size')
+    assert cache.has_columns('DOWNTIMES', 'erp_job_number', 'CREW_SIZE')
+    assert not cache.has_columns('Downtimes', 'crew_size', 'reason')
+    assert cache.db.queries == 1
+
+
+def test_uncached_table_is_loaded_once_and_invalidated_by_any_case():
+    cache = make_cache(ROWS)
+    assert cache.has_column('facilities', 'FACILITY_ID')
+    assert cache.has_column('Facilities', 'facility_id')
+    assert cache.db.queries == 1
+
+    cache.invalidate('FACILITIES')
+    assert cache.has_column('Facilities', 'facility_id')
+    assert cache.db.queries == 2
+
+
+def test_missing_table_is_not_cached():
+    cache = make_cache(ROWS)
+    assert not cache.has_column('NewTable', 'id')
+    cache.db.rows = ROWS + [{'TABLE_NAME': 'NewTable', 'COLUMN_NAME': 'id'}]
+    assert cache.has_column('NewTable', 'ID')